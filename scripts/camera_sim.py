@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Runs camera frames through a bit-accurate emulation of the detection chain in top_level.sv
+# (colour conversion, green screen threshold, k-means, parallax) to try detection changes
+# without a board. Frames are (num_frames, 720, 1280) uint16 RGB565 .npy stacks, e.g. dumped
+# from the frame buffer, or synthetic players in front of a green screen.
+#
+#   python3 camera_sim.py                                   # synthetic "walk" scenario
+#   python3 camera_sim.py --scenario split --depth 50 --frames 200
+#   python3 camera_sim.py --main main.npy --secondary secondary.npy --players 2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'top', 'sim', 'model'))
+from camera_pipeline_model import CB_BOUNDS, CR_BOUNDS, PARALLAX_SCALE, emulate
+from kmeans_sim import SCENARIOS, render_players
+
+GREEN_SCREEN = 0x07E0
+PLAYER_COLORS = [0xF800, 0x001F, 0xFFE0, 0xF81F] # red, blue, yellow, magenta
+NUM_FRAMES = 120
+PLAYER_DEPTH = 60 # inches, sets the disparity between the synthetic cameras
+
+def synthetic_frames(scenario, num_frames, shift=0):
+    """RGB565 frames of the scenario's players on a green screen, moved right by shift pixels
+    as the second camera would see them."""
+    for t in range(num_frames):
+        centers = scenario(t) + np.array([shift, 0])
+        frame = np.full((720, 1280), GREEN_SCREEN, dtype=np.uint16)
+        for p, (_, pixels) in enumerate(zip(centers, render_players(centers)[1])):
+            xs, ys = pixels
+            frame[ys, xs] = PLAYER_COLORS[p % len(PLAYER_COLORS)]
+        yield frame
+
+def parse_bounds(text):
+    lower, upper = (int(v, 0) for v in text.split(","))
+    return lower, upper
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate the camera to centroid to depth pipeline on RGB565 frames.")
+    parser.add_argument("--main", help="RGB565 .npy frames from the MAIN camera, default: synthetic")
+    parser.add_argument("--secondary", help="RGB565 .npy frames from the SECONDARY camera")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="walk", help="synthetic players")
+    parser.add_argument("--frames", type=int, default=NUM_FRAMES, help="synthetic frames")
+    parser.add_argument("--depth", type=float, default=PLAYER_DEPTH, help="synthetic player depth in inches")
+    parser.add_argument("--players", type=int, help="num_players (0-3), default: from the scenario")
+    parser.add_argument("--cr", type=parse_bounds, default=CR_BOUNDS, help="green screen Cr bounds lower,upper")
+    parser.add_argument("--cb", type=parse_bounds, default=CB_BOUNDS, help="green screen Cb bounds lower,upper")
+    parser.add_argument("--every", type=int, default=10, help="print every Nth frame")
+    args = parser.parse_args()
+
+    if args.main:
+        main_frames = np.load(args.main, mmap_mode="r")
+        secondary_frames = np.load(args.secondary, mmap_mode="r") if args.secondary else None
+        num_players = 0 if args.players is None else args.players
+    else:
+        scenario = SCENARIOS[args.scenario]
+        shift = int(round(PARALLAX_SCALE / args.depth))
+        main_frames = list(synthetic_frames(scenario, args.frames))
+        secondary_frames = list(synthetic_frames(scenario, args.frames, shift))
+        num_players = len(scenario(0)) - 1 if args.players is None else args.players
+
+    start = time.perf_counter()
+    count = 0
+    for k, result in enumerate(emulate(main_frames, num_players, secondary_frames, args.cr, args.cb)):
+        count += 1
+        if k % args.every == 0:
+            line = f"frame {k:4d}: {int(result['mask'].sum()):7d} player pixels, centroids {result['centroids'][:num_players + 1].tolist()}"
+            if "depths" in result:
+                line += f", depths {result['depths'][:num_players + 1].tolist()}"
+            print(line)
+    elapsed = time.perf_counter() - start
+    print(f"{count} frames in {elapsed:.2f}s ({count / elapsed:.0f} frames/s)")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import numpy as np
+
+# Disparity -> depth ROM for parallax.sv's USE_DEPTH_LUT mode. Entry d is the depth in inches
+# of an object seen with a disparity of d pixels, so the divider is replaced by one lookup.
+#
+#   python3 gen_depth_lut.py                          # camera parameters from parallax.sv
+#   python3 gen_depth_lut.py --baseline 8 --out depth_lut.mem
+#
+# One entry per line, two hex digits each, for $readmemh.
+
+RESOLUTION_WIDTH = 1280
+SENSOR_WIDTH = 0.334646
+FOCAL_LENGTH = 0.1295276
+BASELINE_DISTANCE = 6
+
+DEPTH_LUT_SIZE = 2048 # every 11-bit disparity, must match parallax.sv
+ZERO_DISPARITY_DEPTH = 0xFF # no disparity: too far away to measure
+MAX_DEPTH = 0xFE # closer objects saturate here instead of wrapping around 8 bits
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'top', 'data')
+
+def depth_lut(resolution_width=RESOLUTION_WIDTH, sensor_width=SENSOR_WIDTH, focal_length=FOCAL_LENGTH,
+              baseline_distance=BASELINE_DISTANCE, size=DEPTH_LUT_SIZE):
+    """8-bit depth for every disparity 0..size-1, the same formula as get_expected_depth in the
+    parallax benches: Z = (Focal Length * Baseline Distance * Pixel Density) / disparity."""
+    scale = focal_length * baseline_distance * (resolution_width / sensor_width)
+    disparity = np.arange(size)
+    depth = np.full(size, ZERO_DISPARITY_DEPTH, dtype=np.int64)
+    depth[1:] = np.minimum((scale / disparity[1:]).astype(np.int64), MAX_DEPTH)
+    return depth.astype(np.uint8)
+
+def write_depth_lut(lut, filename="depth_lut.mem"):
+    """Relative names are written to top/data, where synthesis picks the ROM up."""
+    file_path = os.path.join(DATA_PATH, filename)
+    with open(file_path, 'w') as f:
+        f.write('\n'.join(f"{depth:02x}" for depth in lut))
+    return file_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the disparity to depth ROM for parallax.sv.")
+    parser.add_argument("--resolution-width", type=int, default=RESOLUTION_WIDTH)
+    parser.add_argument("--sensor-width", type=float, default=SENSOR_WIDTH, help="inches")
+    parser.add_argument("--focal-length", type=float, default=FOCAL_LENGTH, help="inches")
+    parser.add_argument("--baseline", type=float, default=BASELINE_DISTANCE, help="inches between the cameras")
+    parser.add_argument("--out", default="depth_lut.mem", help="relative to top/data")
+    args = parser.parse_args()
+
+    lut = depth_lut(args.resolution_width, args.sensor_width, args.focal_length, args.baseline)
+    file_path = write_depth_lut(lut, args.out)
+    saturated = int(np.count_nonzero(lut[1:] == MAX_DEPTH))
+    print(f"Wrote {len(lut)} entries to {file_path} ({saturated} disparities closer than {MAX_DEPTH} inches saturate)")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import argparse
+import sys
+import time
+import numpy as np
+from wall_codec import NUM_X_BITS, NUM_Y_BITS, write_walls
+from wall_library import add_walls
+
+# Headless batch wall generator: rasterizes random player poses into walls, scores every
+# wall with vectorized metrics and picks a difficulty ramped set for the ROM.
+#
+#   python3 gen_wall_batch.py --count 10000 --out walls_batch.mem --library candidates.wlib
+#
+# --out is required, so a run never overwrites the ROM's walls.mem by accident; copy the
+# result over it once the set looks right.
+#
+# Walls use the editor's convention: 1 is solid wall, 0 is a hole players have to fit through.
+
+# Where each num_players setting starts in the wall ROM (see game_logic_controller.sv),
+# every group runs until the next group's first wall and the last one to --num-walls.
+GROUP_STARTS = [0, 3, 6, 7]
+NUM_WALLS = 10 # game_logic_controller's default NUM_WALLS
+
+BATCH_SIZE = 1000 # walls rasterized at once, bounds memory to a few hundred MB
+MIN_HOLE_WIDTH = 3 # narrowest hole (in cells) a player can still fit through
+
+def random_poses(rng, count, num_players):
+    """Pose parameters, each an array of shape (count, num_players). Units are cells."""
+    slot_width = NUM_X_BITS / num_players
+    scale = rng.uniform(0.7, 1.1, (count, num_players)) * min(1.0, 1.6 / num_players ** 0.5)
+    poses = {
+        "x": (np.arange(num_players) + 0.5) * slot_width + rng.uniform(-0.15, 0.15, (count, num_players)) * slot_width,
+        "floor": NUM_Y_BITS - 1 - rng.integers(0, 3, (count, num_players)),
+        "scale": scale,
+        "left_arm": rng.uniform(-0.5, 2.8, (count, num_players)), # angle from straight down, radians
+        "right_arm": rng.uniform(-0.5, 2.8, (count, num_players)),
+        "legs": rng.uniform(0.05, 0.6, (count, num_players)), # half the angle between the legs
+        "margin": rng.uniform(0.5, 2.0, (count, num_players)), # clearance around the body
+    }
+    return {k: v.astype(np.float32) for k, v in poses.items()}
+
+def segment_mask(xx, yy, x0, y0, x1, y1, radius):
+    """Cells within radius of the segment (x0, y0)-(x1, y1). Endpoints are (count, 1, 1) arrays."""
+    dx = x1 - x0
+    dy = y1 - y0
+    t = np.clip(((xx - x0) * dx + (yy - y0) * dy) / np.maximum(dx * dx + dy * dy, 1e-6), 0, 1)
+    return (xx - x0 - t * dx) ** 2 + (yy - y0 - t * dy) ** 2 <= radius ** 2
+
+def rasterize(poses):
+    """Walls of shape (count, NUM_Y_BITS, NUM_X_BITS) with every pose cut out as a hole."""
+    count, num_players = poses["x"].shape
+    yy, xx = np.mgrid[0:NUM_Y_BITS, 0:NUM_X_BITS].astype(np.float32)
+    hole = np.zeros((count, NUM_Y_BITS, NUM_X_BITS), dtype=bool)
+    for p in range(num_players):
+        x, floor, s, m = (poses[k][:, p, None, None] for k in ("x", "floor", "scale", "margin"))
+        # only rasterize the columns this player can reach in any pose of the batch
+        reach = 15 * s.max() + m.max() + 1
+        x0 = max(0, int(x.min() - reach))
+        x1 = min(NUM_X_BITS, int(x.max() + reach) + 1)
+        cols = slice(x0, x1)
+        px, py = xx[:, cols], yy[:, cols]
+        body = np.zeros((count, NUM_Y_BITS, x1 - x0), dtype=bool)
+
+        hip = floor - 14 * s
+        shoulder = hip - 12 * s
+        neck = shoulder - 2 * s
+        head_y = neck - 4 * s
+        body |= (px - x) ** 2 + (py - head_y) ** 2 <= (4 * s + m) ** 2
+        body |= segment_mask(px, py, x, neck, x, hip, 3.5 * s + m)
+        leg = poses["legs"][:, p, None, None]
+        for side in (-1, 1):
+            body |= segment_mask(px, py, x, hip, x + side * 14 * s * np.sin(leg), hip + 14 * s * np.cos(leg), 1.5 * s + m)
+        for side, arm in ((-1, "left_arm"), (1, "right_arm")):
+            angle = poses[arm][:, p, None, None]
+            body |= segment_mask(px, py, x + side * 3 * s, shoulder, x + side * (3 * s + 11 * s * np.sin(angle)),
+                                 shoulder + 11 * s * np.cos(angle), 1.2 * s + m)
+        hole[:, :, cols] |= body
+    return (~hole).astype(np.uint8)
+
+def label_holes(walls):
+    """4-connected labels of the hole cells, -1 on wall cells. A hole's label is the flat index of
+    its first cell. The whole batch is labeled at once with union find over the hole cell edges."""
+    hole = walls == 0
+    cells = np.flatnonzero(hole)
+    compact = np.cumsum(hole.ravel(), dtype=np.int64).reshape(hole.shape) - 1
+    # each hole cell is joined to the hole cells right of and below it
+    right = hole[:, :, :-1] & hole[:, :, 1:]
+    down = hole[:, :-1, :] & hole[:, 1:, :]
+    a = np.concatenate([compact[:, :, :-1][right], compact[:, :-1, :][down]])
+    b = np.concatenate([compact[:, :, 1:][right], compact[:, 1:, :][down]])
+
+    parent = np.arange(len(cells))
+    while True:
+        pa = parent[a]
+        pb = parent[b]
+        merge = pa != pb
+        if not merge.any():
+            break
+        # hook the larger root onto the smaller one, then flatten every tree to its root
+        np.minimum.at(parent, np.maximum(pa, pb)[merge], np.minimum(pa, pb)[merge])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    labels = np.full(hole.shape, -1, dtype=np.int64)
+    labels[hole] = cells[parent]
+    return labels
+
+def score_walls(walls):
+    """Vectorized metrics for a (count, NUM_Y_BITS, NUM_X_BITS) batch of walls."""
+    count = len(walls)
+    hole = walls == 0
+    open_fraction = hole.mean(axis=(1, 2))
+
+    labels = label_holes(walls)
+    is_root = labels == np.arange(labels.size).reshape(labels.shape)
+    components = is_root.sum(axis=(1, 2))
+
+    # largest k such that a k x k square of holes has its top left corner at each cell
+    square = hole
+    side = hole.astype(np.int32)
+    for k in range(2, min(NUM_X_BITS, NUM_Y_BITS) + 1):
+        square = square[:, :-1, :-1] & square[:, 1:, :-1] & square[:, :-1, 1:] & square[:, 1:, 1:]
+        if not square.any():
+            break
+        side[:, :square.shape[1], :square.shape[2]] += square
+
+    # widest square in each hole, then the narrowest hole of each wall
+    hole_labels = labels[hole]
+    widest = np.zeros(labels.size, dtype=np.int32)
+    np.maximum.at(widest, hole_labels, side[hole])
+    wall_of_root = np.arange(labels.size) // (NUM_X_BITS * NUM_Y_BITS)
+    roots = np.flatnonzero(is_root)
+    min_hole_width = np.full(count, 0, dtype=np.int32)
+    narrowest = np.full(count, np.iinfo(np.int32).max, dtype=np.int32)
+    np.minimum.at(narrowest, wall_of_root[roots], widest[roots])
+    min_hole_width[components > 0] = narrowest[components > 0]
+
+    # less open area, narrower holes and more separate holes all make a wall harder
+    difficulty = (0.5 * (1 - open_fraction)
+                  + 0.3 / np.maximum(min_hole_width, 1)
+                  + 0.2 * np.minimum(np.maximum(components - 1, 0), 3) / 3)
+    return {
+        "open_fraction": open_fraction,
+        "components": components,
+        "min_hole_width": min_hole_width,
+        "difficulty": difficulty,
+    }
+
+def generate(rng, count, num_players):
+    """count candidate walls for num_players (1-4) players and their scores."""
+    walls = []
+    scores = []
+    for start in range(0, count, BATCH_SIZE):
+        batch = rasterize(random_poses(rng, min(BATCH_SIZE, count - start), num_players))
+        walls.append(batch)
+        scores.append(score_walls(batch))
+    return np.concatenate(walls), {k: np.concatenate([s[k] for s in scores]) for k in scores[0]}
+
+def select_ramp(scores, num_players, num_walls):
+    """Indices of num_walls playable walls, evenly spaced in difficulty from easiest to hardest."""
+    playable = np.flatnonzero((scores["components"] >= 1) & (scores["components"] <= num_players)
+                              & (scores["min_hole_width"] >= MIN_HOLE_WIDTH))
+    if len(playable) < num_walls:
+        raise ValueError(f"only {len(playable)} playable walls for {num_players} players, generate more")
+    ranked = playable[np.argsort(scores["difficulty"][playable], kind="stable")]
+    return ranked[np.linspace(0, len(ranked) - 1, num_walls).round().astype(int)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and score candidate walls, then pick a ROM set.")
+    parser.add_argument("--count", type=int, default=10000, help="candidates per player count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="wall file to write, relative to top/data")
+    parser.add_argument("--num-walls", type=int, default=NUM_WALLS, help="walls in the ROM, NUM_WALLS of the build")
+    parser.add_argument("--library", help="also append every candidate to this wall library")
+    args = parser.parse_args()
+    if args.num_walls <= GROUP_STARTS[-1]:
+        parser.error(f"--num-walls must leave the {len(GROUP_STARTS)} player group at least one wall, "
+                     f"i.e. be more than {GROUP_STARTS[-1]}")
+
+    rng = np.random.default_rng(args.seed)
+    group_sizes = np.diff(GROUP_STARTS + [args.num_walls])
+    rom = []
+    for num_players, group_size in enumerate(group_sizes, start=1):
+        start = time.perf_counter()
+        walls, scores = generate(rng, args.count, num_players)
+        elapsed = time.perf_counter() - start
+        chosen = select_ramp(scores, num_players, group_size)
+        rom.append(walls[chosen])
+        print(f"{num_players} player(s): {args.count} walls generated and scored in {elapsed:.2f}s")
+        for i in chosen:
+            print(f"    difficulty {scores['difficulty'][i]:.3f}  open {scores['open_fraction'][i]:.2f}  "
+                  f"holes {scores['components'][i]}  min width {scores['min_hole_width'][i]}")
+        if args.library:
+            add_walls(args.library, walls, [f"p{num_players}_{args.seed}_{i}" for i in range(len(walls))])
+
+    write_walls(np.concatenate(rom), args.out)
+    print(f"Wrote {args.num_walls} walls to {args.out}")
+
+if __name__ == "__main__":
+    sys.exit(main())
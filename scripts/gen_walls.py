@@ -1,6 +1,9 @@
 import os
+import random
 import sys
+import numpy as np
 import pygame
+from wall_codec import read_walls, write_walls
 
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
@@ -9,6 +12,8 @@ BIT_MASK_DOWN_SAMPLE_FACTOR = 16
 NUM_X_BITS = SCREEN_WIDTH // BIT_MASK_DOWN_SAMPLE_FACTOR
 NUM_Y_BITS = SCREEN_HEIGHT // BIT_MASK_DOWN_SAMPLE_FACTOR
 PIXEL_SIZE = 12
+FPS = 60
+NUM_BENCHMARK_WALLS = 10 # wall switches in --benchmark cycle through the first few walls
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -24,44 +29,72 @@ def print_wall(wall):
         print('')
 
 def store_wall(walls, filename="walls.mem"):
-    walls_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'top', 'data', filename)
-
-    with open(walls_file_path, 'w') as f:
-        for i in range(len(walls)):
-            wall = walls[i]
-            hex_string = ""
-            for y in range(len(wall)):
-                hex_string += hex(int(''.join(str(wall[y][x]) for x in range(len(wall[y]))), 2))[2:]
-            f.write(hex_string)
-            if i < len(walls) - 1:
-                f.write('\n')
+    write_walls(walls, filename)
 
 def read_wall_file(filename="walls.mem"):
-    walls_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'top', 'data', filename)
-
-    walls = []
-
-    with open(walls_file_path, 'r') as f:
-        for line in f:
-            wall = []
-            for y in range(NUM_Y_BITS):
-                wall.append([])
-                for x in range(NUM_X_BITS//4):
-                    hex_val = int(line[x + NUM_X_BITS//4 * y], 16)
-                    wall[y].extend([
-                        (hex_val>>3) & 1,
-                        (hex_val>>2) & 1,
-                        (hex_val>>1) & 1,
-                        (hex_val>>0) & 1
-                    ])
-            walls.append(wall)
-    
-    return walls
-
-def main():
+    return read_walls(filename, NUM_Y_BITS, NUM_X_BITS)
+
+def make_grid_overlay():
+    """Cell outlines, drawn once and blitted over repainted cells."""
+    overlay = pygame.Surface((NUM_X_BITS * PIXEL_SIZE, NUM_Y_BITS * PIXEL_SIZE), pygame.SRCALPHA)
+    for y in range(NUM_Y_BITS):
+        for x in range(NUM_X_BITS):
+            pygame.draw.rect(overlay, BLACK, (x * PIXEL_SIZE, y * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE), 1)
+    return overlay
+
+def render_cells(wall_surface, grid_overlay, wall, x0, y0, x1, y1):
+    """Repaint cells x0 <= x < x1, y0 <= y < y1 of the cached wall surface. Returns the dirty rect."""
+    block = np.asarray(wall[y0:y1, x0:x1])
+    colors = np.where(block[..., None] == 1, np.array(PINK, dtype=np.uint8), np.array(WHITE, dtype=np.uint8))
+    cells = pygame.surfarray.make_surface(colors.transpose(1, 0, 2)) # surfarray is indexed [x][y]
+    rect = pygame.Rect(x0 * PIXEL_SIZE, y0 * PIXEL_SIZE, (x1 - x0) * PIXEL_SIZE, (y1 - y0) * PIXEL_SIZE)
+    wall_surface.blit(pygame.transform.scale(cells, rect.size), rect)
+    wall_surface.blit(grid_overlay, rect, rect)
+    return rect
+
+def draw_menu(screen, labels, save_button_rect, dropdown_rect, dropdown_selected, dropdown_open, num_options):
+    """Redraw the save button and dropdown. Returns the rect covering the menu at its largest."""
+    menu_rect = pygame.Rect(dropdown_rect.x, save_button_rect.y, dropdown_rect.width,
+                            dropdown_rect.bottom + num_options * 30 - save_button_rect.y)
+    screen.fill(WHITE, menu_rect)
+
+    # Draw the dropdown menu
+    pygame.draw.rect(screen, BLACK, dropdown_rect, 1)
+    screen.blit(labels[dropdown_selected], (dropdown_rect.x + 10, dropdown_rect.y + 10))
+    if dropdown_open:
+        for i in range(num_options):
+            option_rect = pygame.Rect(dropdown_rect.x, dropdown_rect.y + (i + 1) * 30, dropdown_rect.width, 30)
+            pygame.draw.rect(screen, BLACK, option_rect, 1)
+            screen.blit(labels[i], (option_rect.x + 10, option_rect.y + 10))
+
+    # Draw save button
+    pygame.draw.rect(screen, BLACK, save_button_rect, 1)
+    screen.blit(labels["save"], (save_button_rect.x + 10, save_button_rect.y + 10))
+    return menu_rect
+
+def benchmark_events(frame, dropdown_rect):
+    """Synthetic input for headless benchmarking: a drag toggle every frame and a wall switch every 100."""
+    rng = random.Random(frame)
+    if frame % 100 == 99:
+        option_pos = (dropdown_rect.x + 5, dropdown_rect.y + (frame // 100 % NUM_BENCHMARK_WALLS + 1) * 30 + 5)
+        return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=dropdown_rect.center, button=1),
+                pygame.event.Event(pygame.MOUSEMOTION, pos=option_pos, rel=(0, 0), buttons=(0, 0, 0)),
+                pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=option_pos, button=1)]
+    down = (rng.randrange(NUM_X_BITS * PIXEL_SIZE), rng.randrange(NUM_Y_BITS * PIXEL_SIZE))
+    up = (min(down[0] + rng.randrange(5 * PIXEL_SIZE), NUM_X_BITS * PIXEL_SIZE - 1),
+          min(down[1] + rng.randrange(5 * PIXEL_SIZE), NUM_Y_BITS * PIXEL_SIZE - 1))
+    return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=down, button=1),
+            pygame.event.Event(pygame.MOUSEBUTTONUP, pos=up, button=1)]
+
+def main(benchmark_frames=None):
+    """Wall editor. With benchmark_frames it runs that many frames of synthetic edits
+    unthrottled (under the SDL dummy driver if there is no display) and reports the frame rate."""
+    if benchmark_frames is not None:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     font = pygame.font.Font(None, 24)
+    clock = pygame.time.Clock()
 
     walls = read_wall_file("walls.mem")
     wall = walls[0]
@@ -69,23 +102,48 @@ def main():
     mouse_down_pos = None
 
     dropdown_rect = pygame.Rect(1000, 100, 200, 30)
-    dropdown_options = [f"Wall {i+1}" for i in range(10)]
+    dropdown_options = [f"Wall {i+1}" for i in range(len(walls))]
     dropdown_selected = 0
     dropdown_open = False
 
     save_button_rect = pygame.Rect(1000, 50, 200, 30)
 
-    while True:
-        for event in pygame.event.get():
+    # Text never changes so render it once
+    labels = {i: font.render(option, True, BLACK) for i, option in enumerate(dropdown_options)}
+    labels["save"] = font.render("Save", True, BLACK)
+
+    grid_overlay = make_grid_overlay()
+    wall_surface = pygame.Surface(grid_overlay.get_size())
+
+    screen.fill(WHITE)
+    render_cells(wall_surface, grid_overlay, wall, 0, 0, NUM_X_BITS, NUM_Y_BITS)
+    screen.blit(wall_surface, (0, 0))
+    draw_menu(screen, labels, save_button_rect, dropdown_rect, dropdown_selected, dropdown_open, len(dropdown_options))
+    pygame.display.flip()
+
+    frame = 0
+    start_ticks = pygame.time.get_ticks()
+    while benchmark_frames is None or frame < benchmark_frames:
+        dirty_rects = []
+        menu_dirty = False
+
+        events = pygame.event.get()
+        if benchmark_frames is not None:
+            events += benchmark_events(frame, dropdown_rect)
+
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if dropdown_rect.collidepoint(event.pos):
                     dropdown_open = not dropdown_open
+                    menu_dirty = True
                 elif dropdown_open:
                     dropdown_open = False
+                    menu_dirty = True
                     wall = walls[dropdown_selected]
+                    dirty_rects.append(render_cells(wall_surface, grid_overlay, wall, 0, 0, NUM_X_BITS, NUM_Y_BITS))
                 elif save_button_rect.collidepoint(event.pos):
                     store_wall(walls, "walls.mem")
                 elif event.pos[0] < NUM_X_BITS * PIXEL_SIZE and event.pos[1] < NUM_Y_BITS * PIXEL_SIZE:
@@ -93,42 +151,38 @@ def main():
             elif event.type == pygame.MOUSEMOTION and dropdown_open:
                 for i, option in enumerate(dropdown_options):
                     option_rect = pygame.Rect(dropdown_rect.x, dropdown_rect.y + (i + 1) * 30, dropdown_rect.width, 30)
-                    if option_rect.collidepoint(event.pos):
+                    if option_rect.collidepoint(event.pos) and dropdown_selected != i:
                         dropdown_selected = i
+                        menu_dirty = True
             elif event.type == pygame.MOUSEBUTTONUP and mouse_down_pos != None:
                 mouse_down_x, mouse_down_y = mouse_down_pos
                 mouse_up_x, mouse_up_y = event.pos
-                for y in range(min(mouse_down_y, mouse_up_y)//PIXEL_SIZE, (max(mouse_down_y, mouse_up_y))//PIXEL_SIZE + 1):
-                    for x in range(min(mouse_down_x, mouse_up_x)//PIXEL_SIZE, (max(mouse_down_x, mouse_up_x))//PIXEL_SIZE + 1):
-                        wall[y][x] = 1 - wall[y][x]
+                x0 = min(mouse_down_x, mouse_up_x) // PIXEL_SIZE
+                y0 = min(mouse_down_y, mouse_up_y) // PIXEL_SIZE
+                x1 = min(max(mouse_down_x, mouse_up_x) // PIXEL_SIZE + 1, NUM_X_BITS)
+                y1 = min(max(mouse_down_y, mouse_up_y) // PIXEL_SIZE + 1, NUM_Y_BITS)
+                wall[y0:y1, x0:x1] = 1 - wall[y0:y1, x0:x1]
+                dirty_rects.append(render_cells(wall_surface, grid_overlay, wall, x0, y0, x1, y1))
                 mouse_down_pos = None
-                
-
-        screen.fill(WHITE)
-        for y in range(NUM_Y_BITS):
-            for x in range(NUM_X_BITS):
-                if wall[y][x] == 1:
-                    pygame.draw.rect(screen, PINK, (x * PIXEL_SIZE, y * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE))
-                pygame.draw.rect(screen, BLACK, (x * PIXEL_SIZE, y * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE), 1)
-
-        # Draw the dropdown menu
-        pygame.draw.rect(screen, BLACK, dropdown_rect, 1)
-        text = font.render(dropdown_options[dropdown_selected], True, BLACK)
-        screen.blit(text, (dropdown_rect.x + 10, dropdown_rect.y + 10))
-        if dropdown_open:
-            for i, option in enumerate(dropdown_options):
-                option_rect = pygame.Rect(dropdown_rect.x, dropdown_rect.y + (i + 1) * 30, dropdown_rect.width, 30)
-                pygame.draw.rect(screen, BLACK, option_rect, 1)
-                text = font.render(option, True, BLACK)
-                screen.blit(text, (option_rect.x + 10, option_rect.y + 10))
-
-        # Draw save button
-        pygame.draw.rect(screen, BLACK, save_button_rect, 1)
-        text = font.render("Save", True, BLACK)
-        screen.blit(text, (save_button_rect.x + 10, save_button_rect.y + 10))
-
-        pygame.display.flip()
-        pygame.time.Clock().tick(10)
+
+        for rect in dirty_rects:
+            screen.blit(wall_surface, rect, rect)
+        if menu_dirty:
+            dirty_rects.append(draw_menu(screen, labels, save_button_rect, dropdown_rect, dropdown_selected, dropdown_open, len(dropdown_options)))
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+
+        frame += 1
+        if benchmark_frames is None:
+            clock.tick(FPS)
+
+    elapsed = (pygame.time.get_ticks() - start_ticks) / 1000
+    print(f"{frame} frames in {elapsed:.2f}s ({frame / max(elapsed, 1e-3):.0f} fps)")
+    pygame.quit()
     
 if __name__ == "__main__":
-    main()
+    # python3 gen_walls.py [--benchmark FRAMES]
+    if len(sys.argv) == 3 and sys.argv[1] == "--benchmark":
+        main(int(sys.argv[2]))
+    else:
+        main()
@@ -1,77 +1,177 @@
-import random
-
-WIDTH = 100
-HEIGHT = 100
-
-class Point:
-	def __init__(self, x, y):
-		self.x = x
-		self.y = y
-
-	def __eq__(self, other):
-		return self.x == other.x and self.y == other.y
-	
-	def __repr__(self):
-		return f"({self.x}, {self.y})"
-
-def kmeans_iter(points, centroids):
-	k = len(centroids)
-	
-	new_centroids = [Point(0,0) for _ in range(k)]
-	num_points = [0 for _ in range(k)]
-
-	for p in points:
-		minDist = float('inf')
-		minDistCentroid = -1
-		for i in range(k):
-			dist = abs(p.x - centroids[i].x) + abs(p.y - centroids[i].y)
-			if dist < minDist:
-				minDist = dist
-				minDistCentroid = i
-
-		num_points[minDistCentroid] += 1
-		new_centroids[minDistCentroid].x += p.x
-		new_centroids[minDistCentroid].y += p.y			
-
-	for i in range(k):
-		if num_points[i] == 0:
-			# Break out of local minima by randomly reassigning empty centroids
-			# Helps converge pretty quickly ~<20 iters when one centroid gets 0 assignments
-			new_centroids[i].x = random.randint(0, WIDTH)
-			new_centroids[i].y = random.randint(0, HEIGHT)
-
-		else:
-			new_centroids[i].x //= num_points[i]
-			new_centroids[i].y //= num_points[i]
-
-	return new_centroids
-
-centers = [Point(10,10), Point(40, 10)]
-centroids = [Point(30, 10), Point(40,30)]
-for num_iter in range(50):
-
-	centers[0].x += 1
-	centers[0].y += 1
-	centers[1].y += 1
-
-	player_points = []
-	for k in range(len(centers)):
-		player_points.extend([Point(i,j) for i in range(WIDTH) for j in range(HEIGHT) if (i-centers[k].x)**2 + (j-centers[k].y)**2 <= 10])
-
-	centroids = kmeans_iter(player_points, centroids)
-	print(centroids)
-
-	print("-------------------------------------------------------")
-	print("iteration number:", num_iter)
-	print("-------------------------------------------------------")
-	for y in range(HEIGHT):
-		for x in range(WIDTH):
-			if Point(x,y) in centroids:
-				print("O", end="")
-			elif Point(x,y) in player_points:
-				print("x", end="")
-			else:
-				print(".", end="")
-		print("")
-	print("\n\n\n")
+import argparse
+import itertools
+import os
+import sys
+import numpy as np
 
+# Full resolution k-means simulation that behaves like moving_frame_k_means.sv, used to
+# compare centroid update policies on scripted player motion before touching the RTL.
+#
+#   python3 kmeans_sim.py                       # every scenario with every policy
+#   python3 kmeans_sim.py --scenario cross --policy hardware --ascii
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'top', 'sim', 'model'))
+from kmeans_model import NUM_CENTROIDS, X_BITS, Y_BITS, cluster_sums, frame_points, initial_centroids
+
+WIDTH = 1280
+HEIGHT = 720
+NUM_FRAMES = 120
+
+CONVERGED_PX = 8 # a centroid within this Manhattan distance of its player is on target
+ASCII_DOWN_SAMPLE = 16
+
+BODY_HALF_WIDTH = 60
+BODY_HALF_HEIGHT = 150
+
+# Scripted trajectories: each returns the (num_players, 2) body centers at frame t.
+def walk(t):
+	return np.array([[200 + 5 * t, 300 + t], [1000, 200 + 2 * t]])
+
+def cross(t):
+	# two players swap sides, passing through each other half way
+	return np.array([[250 + 6 * t, 400], [1030 - 6 * t, 380]])
+
+def split(t):
+	# three players start huddled together and spread out
+	spread = min(t * 4, 350)
+	return np.array([[640 - spread, 380], [640, 380], [640 + spread, 380]])
+
+def jump(t):
+	# four players, each bobbing up and down at its own rate
+	x = np.array([200, 500, 800, 1100])
+	y = 400 + (80 * np.sin(t * np.array([0.2, 0.3, 0.25, 0.15]))).astype(int)
+	return np.stack([x, y], axis=1)
+
+SCENARIOS = {"walk": walk, "cross": cross, "split": split, "jump": jump}
+
+def render_players(centers):
+	"""Frame mask with an upright, roughly person sized ellipse per player, plus each
+	player's own (xs, ys) pixels. Only the pixels around each player are evaluated."""
+	mask = np.zeros((HEIGHT, WIDTH), dtype=bool)
+	pixels = []
+	for cx, cy in centers:
+		x0, x1 = max(cx - BODY_HALF_WIDTH, 0), min(cx + BODY_HALF_WIDTH + 1, WIDTH)
+		y0, y1 = max(cy - BODY_HALF_HEIGHT, 0), min(cy + BODY_HALF_HEIGHT + 1, HEIGHT)
+		yy, xx = np.mgrid[y0:y1, x0:x1]
+		body = ((xx - cx) / BODY_HALF_WIDTH) ** 2 + ((yy - cy) / BODY_HALF_HEIGHT) ** 2 <= 1
+		mask[y0:y1, x0:x1] |= body
+		pixels.append((xx[body], yy[body]))
+	return mask, pixels
+
+# Centroid update policies: (previous centroids, pixel counts, sums of x, sums of y, rng) -> new centroids.
+def floor_means(totals, sum_x, sum_y):
+	has_points = totals > 0
+	means = np.zeros((NUM_CENTROIDS, 2), dtype=np.int64)
+	means[has_points, 0] = (sum_x[has_points] // totals[has_points]) & ((1 << X_BITS) - 1)
+	means[has_points, 1] = (sum_y[has_points] // totals[has_points]) & ((1 << Y_BITS) - 1)
+	return means, has_points
+
+def hardware(prev, totals, sum_x, sum_y, rng):
+	# what the RTL does: the divider returns 0 for an empty cluster
+	return floor_means(totals, sum_x, sum_y)[0]
+
+def hold(prev, totals, sum_x, sum_y, rng):
+	# empty clusters keep their previous centroid
+	means, has_points = floor_means(totals, sum_x, sum_y)
+	means[~has_points] = prev[~has_points]
+	return means
+
+def reseed(prev, totals, sum_x, sum_y, rng):
+	# the original script: jump empty clusters somewhere random to escape local minima
+	means, has_points = floor_means(totals, sum_x, sum_y)
+	means[~has_points] = np.stack([rng.integers(0, WIDTH, NUM_CENTROIDS), rng.integers(0, HEIGHT, NUM_CENTROIDS)], axis=1)[~has_points]
+	return means
+
+def spread(prev, totals, sum_x, sum_y, rng):
+	# empty clusters restart from evenly spaced columns across the screen
+	means, has_points = floor_means(totals, sum_x, sum_y)
+	defaults = np.stack([(2 * np.arange(NUM_CENTROIDS) + 1) * WIDTH // (2 * NUM_CENTROIDS), np.full(NUM_CENTROIDS, HEIGHT // 2)], axis=1)
+	means[~has_points] = defaults[~has_points]
+	return means
+
+def smooth(prev, totals, sum_x, sum_y, rng):
+	# move half way to the new mean (a shift in hardware), holding empty clusters
+	means = hold(prev, totals, sum_x, sum_y, rng)
+	return (prev + means) >> 1
+
+POLICIES = {"hardware": hardware, "hold": hold, "reseed": reseed, "spread": spread, "smooth": smooth}
+
+def truth_centroids(pixels):
+	"""Floor center of mass of each player's own pixels."""
+	return np.array([[xs.sum() // max(len(xs), 1), ys.sum() // max(len(ys), 1)] for xs, ys in pixels])
+
+def match_error(centroids, truth):
+	"""Per-player Manhattan error under the centroid to player assignment that minimizes the worst one.
+	Returns (errors, matched centroids) with both ordered like truth."""
+	num_players = len(truth)
+	candidates = centroids[:num_players]
+	best = None
+	for perm in itertools.permutations(range(num_players)):
+		errors = np.abs(candidates[list(perm)] - truth).sum(axis=1)
+		if best is None or errors.max() < best[0].max():
+			best = (errors, candidates[list(perm)])
+	return best
+
+def render_ascii(mask, centroids, num_players):
+	"""Down sampled view: x for player pixels, O for the active centroids."""
+	h, w = HEIGHT // ASCII_DOWN_SAMPLE, WIDTH // ASCII_DOWN_SAMPLE
+	blocks = mask[:h * ASCII_DOWN_SAMPLE, :w * ASCII_DOWN_SAMPLE].reshape(h, ASCII_DOWN_SAMPLE, w, ASCII_DOWN_SAMPLE).any(axis=(1, 3))
+	chars = np.where(blocks, "x", ".")
+	cells = centroids[:num_players + 1] // ASCII_DOWN_SAMPLE
+	chars[np.clip(cells[:, 1], 0, h - 1), np.clip(cells[:, 0], 0, w - 1)] = "O"
+	return "\n".join("".join(row) for row in chars)
+
+def simulate(scenario, policy, num_frames=NUM_FRAMES, seed=0, ascii=False):
+	"""Run one scenario under one policy. Returns the first frame all players are tracked within
+	CONVERGED_PX, the final error and the jitter (centroid motion the players did not make) after that."""
+	rng = np.random.default_rng(seed)
+	num_players = len(scenario(0))
+	centroids = initial_centroids()
+	converged_at = None
+	prev_matched = prev_truth = None
+	jitter = []
+	for t in range(num_frames):
+		mask, pixels = render_players(scenario(t))
+		xs, ys = frame_points(mask)
+		# pixels are labeled with the centroids tabulated at the end of the previous frame
+		totals, sum_x, sum_y = cluster_sums(xs, ys, centroids, num_players - 1)
+		centroids = POLICIES[policy](centroids, totals, sum_x, sum_y, rng)
+
+		truth = truth_centroids(pixels)
+		errors, matched = match_error(centroids, truth)
+		# jitter counts from the frame after convergence, not the jump that converged
+		if converged_at is not None:
+			jitter.append(np.abs((matched - prev_matched) - (truth - prev_truth)).sum(axis=1).max())
+		if converged_at is None and errors.max() <= CONVERGED_PX:
+			converged_at = t + 1
+		prev_matched, prev_truth = matched, truth
+
+		if ascii:
+			print(f"frame {t}: centroids {centroids[:num_players].tolist()} truth {truth.tolist()}")
+			print(render_ascii(mask, centroids, num_players - 1))
+	jitter = np.array(jitter)
+	return {
+		"frames_to_converge": converged_at,
+		"final_error": int(errors.max()),
+		"jitter_mean": float(jitter.mean()) if len(jitter) else 0.0,
+		"jitter_max": int(jitter.max()) if len(jitter) else 0,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description="Compare k-means centroid update policies on scripted player motion.")
+	parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="default: all")
+	parser.add_argument("--policy", choices=POLICIES, action="append", help="default: all")
+	parser.add_argument("--frames", type=int, default=NUM_FRAMES)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--ascii", action="store_true", help="print every frame")
+	args = parser.parse_args()
+
+	print(f"{'scenario':<8} {'policy':<9} {'converge':>8} {'final err':>9} {'jitter mean':>11} {'jitter max':>10}")
+	for name in args.scenario or SCENARIOS:
+		for policy in args.policy or POLICIES:
+			stats = simulate(SCENARIOS[name], policy, args.frames, args.seed, args.ascii)
+			converge = "never" if stats["frames_to_converge"] is None else stats["frames_to_converge"]
+			print(f"{name:<8} {policy:<9} {converge:>8} {stats['final_error']:>9} {stats['jitter_mean']:>11.2f} {stats['jitter_max']:>10}")
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+# How much lag the SECONDARY -> MAIN centroid link adds at MAIN's parallax_over input, and how
+# far its baud rate can drop before the link rather than the frame rate sets the lag. Sweeps
+# BAUD_RATE, coordinate width and the packing of the 8 coordinates onto UART lanes, using the
+# word timing of the real uart_transmit/uart_receive (centroid_link_model.word_timing, which
+# --measure re-checks by simulating test_uart_sim_test.py at every bit period and width).
+#
+#   python3 link_analyzer.py
+#   python3 link_analyzer.py --packing separate packed_xy --coord-bits 11 8 --bauds 9600 115200 1000000
+#   python3 link_analyzer.py --measure
+
+ROOT = Path(__file__).resolve().parent.parent
+SIM_PATH = ROOT / "top" / "sim"
+sys.path.append(str(SIM_PATH / "model"))
+from centroid_link_model import NUM_FRAMES, NUM_PHASES, PACKINGS, X_BITS, bit_period, link_stats, word_timing
+
+BAUD_RATES = [9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600, 2_000_000, 4_000_000]
+# the link stops being the bottleneck once a whole set of coordinates arrives this fast, in frames:
+# MAIN's own once-a-frame sampling already costs half a frame on average
+NEGLIGIBLE_LATENCY_FRAMES = 0.05
+MEASURE_DIR = SIM_PATH / "link_timing"
+# the command each SIM the runners take is installed as
+SIMULATOR_COMMANDS = {"icarus": "iverilog", "verilator": "verilator"}
+
+def measure_timing(period, data_width):
+    """Run test_uart_sim_test.py's test_word_timing on the RTL and return what it measured."""
+    run_dir = MEASURE_DIR / f"p{period}_w{data_width}"
+    (run_dir / "sim_build").mkdir(parents=True, exist_ok=True)
+    timing_file = run_dir / "sim_build" / "uart_timing.json"
+    timing_file.unlink(missing_ok=True)
+    env = dict(os.environ, UART_BIT_PERIOD=str(period), UART_DATA_WIDTH=str(data_width), TESTCASE="test_word_timing")
+    with open(run_dir / "log.txt", "w") as log:
+        subprocess.run([sys.executable, str(SIM_PATH / "test_uart_sim_test.py")], cwd=run_dir, env=env,
+                       stdout=log, stderr=subprocess.STDOUT)
+    if not timing_file.is_file():
+        raise RuntimeError(f"no timing measured for {period} cycles per bit, {data_width} bits, see {run_dir / 'log.txt'}")
+    measured = json.loads(timing_file.read_text())
+    return {key: measured[key] for key in word_timing(period, data_width)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Centroid link lag and bandwidth across baud rates and packings.")
+    parser.add_argument("--bauds", type=int, nargs="+", default=BAUD_RATES, help="BAUD_RATE parameters to sweep")
+    parser.add_argument("--packing", nargs="+", choices=PACKINGS, default=list(PACKINGS), help="lane packings")
+    parser.add_argument("--coord-bits", type=int, nargs="+", default=[X_BITS], help="bits per coordinate")
+    parser.add_argument("--phases", type=int, default=NUM_PHASES, help="MAIN/SECONDARY frame phases to average over")
+    parser.add_argument("--measure", action="store_true", help="check the word timing against the RTL first")
+    parser.add_argument("--json", help="also write every row to this file")
+    args = parser.parse_args()
+
+    configs = [(PACKINGS[name], bits, baud) for name in args.packing for bits in args.coord_bits for baud in args.bauds]
+    if args.measure:
+        sim = os.getenv("SIM", "icarus")
+        simulator = SIMULATOR_COMMANDS.get(sim, sim)
+        if not shutil.which(simulator):
+            print(f"--measure needs {simulator} to simulate the UARTs (SIM={sim})")
+            return 1
+        for key in sorted({(bit_period(baud), packing.data_width(bits)) for packing, bits, baud in configs}):
+            measured, model = measure_timing(*key), word_timing(*key)
+            status = "ok" if measured == model else f"MISMATCH, model has {model}"
+            print(f"{key[0]:6d} cycles/bit, {key[1]:2d} bits: measured {measured} {status}")
+            if measured != model:
+                return 1
+
+    rows = []
+    print(f"{'packing':<14} {'bits':>4} {'baud':>8} {'line baud':>10} {'set':>7} {'age min':>8} {'mean':>6} "
+          f"{'max':>6} {'torn':>6}  (frames; torn = parallax reads a word mid-shift)")
+    for packing, bits, baud in configs:
+        stats = link_stats(bit_period(baud), packing, bits, args.phases, NUM_FRAMES)
+        rows.append({"packing": packing.name, "coord_bits": bits, "baud": baud, **stats})
+        note = "" if stats["keeps_up"] else "  cannot send a set every frame"
+        print(f"{packing.name:<14} {bits:4d} {baud:8d} {stats['line_baud']:10.0f} {stats['set_frames']:7.4f} "
+              f"{stats['age_min']:8.3f} {stats['age_mean']:6.3f} {stats['age_max']:6.3f} {100 * stats['torn']:5.1f}%{note}")
+
+    print()
+    for packing in (PACKINGS[name] for name in args.packing):
+        for bits in args.coord_bits:
+            ok = [row["baud"] for row in rows if row["packing"] == packing.name and row["coord_bits"] == bits
+                  and row["keeps_up"] and row["latency_frames"] <= NEGLIGIBLE_LATENCY_FRAMES]
+            verdict = (f"the link is not the bottleneck from BAUD_RATE {min(ok)}" if ok
+                       else "the link is the bottleneck at every swept baud rate")
+            print(f"{packing.name} ({packing.description}), {bits}-bit coordinates: {verdict}")
+    print("Line baud is the bit rate on the wire: the UARTs divide clk_pixel by INPUT_CLOCK_FREQ / BAUD_RATE "
+          "with INPUT_CLOCK_FREQ at its 100 MHz default.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+# Generates regression corpora for the benches' test_replay_trace: stimulus plus the golden
+# model's expected outputs, computed once here so replays never run a model. Each bench's own
+# transaction generator is used, so a corpus exercises exactly what the bench's random tests do.
+#
+#   python3 make_traces.py kmeans --frames 500
+#   python3 make_traces.py parallax --count 10000
+#   python3 make_traces.py game --games 200
+#   cd ../top/sim && TRACE_REPLAY=traces/kmeans_corpus.trace python3 test_moving_frame_k_means.py
+
+ROOT = Path(__file__).resolve().parent.parent
+SIM_PATH = ROOT / "top" / "sim"
+sys.path.append(str(SIM_PATH))
+sys.path.append(str(SIM_PATH / "model"))
+from stimulus_trace import TRACE_DIR, TraceWriter
+
+WALLS_MEM = SIM_PATH / "sim_build" / "walls.mem" # the copy the game logic bench's simulator reads
+
+def kmeans_corpus(args, rng):
+    import test_moving_frame_k_means as bench
+    with TraceWriter(args.out, bench.trace_fields(args.stride), bench.trace_info(args.stride, seed=args.seed),
+                     bench.TRACE_CHUNK_FRAMES) as trace:
+        # a reset every frames_per_reset frames, so a long corpus does not only test steady state
+        for start in range(0, args.frames, args.frames_per_reset):
+            trials = min(args.frames_per_reset, args.frames - start)
+            for transaction in bench.kmeans_transactions(rng, trials, lambda trial: int(rng.integers(0, 4)), args.stride):
+                trace.append(**transaction)
+    return trace.count
+
+def parallax_corpus(args, rng):
+    import test_parallax_over as bench
+    with TraceWriter(args.out, bench.TRACE_FIELDS, dict(bench.TRACE_INFO, seed=args.seed)) as trace:
+        for transaction in bench.parallax_transactions(rng, args.count):
+            trace.append(**transaction)
+    return trace.count
+
+def game_corpus(args, rng):
+    import test_game_logic_controller as bench
+    densities = rng.uniform(0.0, args.max_density, size=args.games)
+    with TraceWriter(args.out, bench.TRACE_FIELDS, bench.trace_info(args.walls, seed=args.seed)) as trace:
+        for _, transactions in bench.play_games(rng, densities, args.walls):
+            for transaction in transactions:
+                trace.append(**transaction)
+    return trace.count
+
+def main():
+    parser = argparse.ArgumentParser(description="Record stimulus and expected outputs for trace replay.")
+    parser.add_argument("--seed", type=int, default=205, help="numpy seed for the stimulus")
+    parser.add_argument("--out", type=Path, help="trace directory (default traces/<bench>_corpus.trace in top/sim)")
+    benches = parser.add_subparsers(dest="bench", required=True)
+
+    kmeans = benches.add_parser("kmeans", help="moving_frame_k_means frames")
+    kmeans.add_argument("--frames", type=int, default=100)
+    kmeans.add_argument("--frames-per-reset", type=int, default=20)
+    kmeans.add_argument("--stride", type=int, default=4, help="KMEANS_STRIDE the frames are sampled at")
+    kmeans.set_defaults(make=kmeans_corpus)
+
+    parallax = benches.add_parser("parallax", help="parallax_over centroid sets")
+    parallax.add_argument("--count", type=int, default=1000)
+    parallax.set_defaults(make=parallax_corpus)
+
+    game = benches.add_parser("game", help="game_logic_controller games on the 3x3 bench")
+    game.add_argument("--games", type=int, default=50)
+    game.add_argument("--max-density", type=float, default=0.4, help="largest fraction of is_person_in pixels set")
+    game.add_argument("--walls", type=Path, default=WALLS_MEM, help="walls.mem the bench's BRAM loads")
+    game.set_defaults(make=game_corpus)
+
+    args = parser.parse_args()
+    args.out = args.out or TRACE_DIR / f"{args.bench}_corpus.trace"
+    start = time.perf_counter()
+    count = args.make(args, np.random.default_rng(args.seed))
+    print(f"{count} transactions in {args.out} ({time.perf_counter() - start:.1f} s)")
+
+if __name__ == "__main__":
+    sys.exit(main())
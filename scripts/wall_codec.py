@@ -0,0 +1,61 @@
+import os
+import numpy as np
+
+# Wall bit masks as NumPy arrays <-> the $readmemh format of walls.mem.
+#
+# A wall is a (NUM_Y_BITS, NUM_X_BITS) uint8 array of 0/1, a wall file is a stack of them
+# with shape (num_walls, NUM_Y_BITS, NUM_X_BITS). In walls.mem every wall is one line of hex,
+# MSB first, starting at the top left cell and going row by row. That is also the bit order
+# game_logic_controller indexes: cell (x, y) is bit (y * NUM_X_BITS + x) counting from the MSB.
+
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 720
+BIT_MASK_DOWN_SAMPLE_FACTOR = 16
+NUM_X_BITS = SCREEN_WIDTH // BIT_MASK_DOWN_SAMPLE_FACTOR
+NUM_Y_BITS = SCREEN_HEIGHT // BIT_MASK_DOWN_SAMPLE_FACTOR
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'top', 'data')
+
+def num_hex_digits(height=NUM_Y_BITS, width=NUM_X_BITS):
+    assert (height * width) % 4 == 0, "walls.mem lines are whole hex digits"
+    return height * width // 4
+
+def decode_walls(lines, height=NUM_Y_BITS, width=NUM_X_BITS):
+    """Hex lines (one per wall) to a (num_walls, height, width) uint8 array."""
+    n_hex = num_hex_digits(height, width)
+    # $readmemh right aligns short words, so restore any dropped leading zeros
+    lines = [line.strip().zfill(n_hex) for line in lines if line.strip()]
+    if not lines:
+        return np.zeros((0, height, width), dtype=np.uint8)
+    # an odd digit count gets a leading 0 so every wall is a whole number of bytes
+    pad = n_hex % 2
+    packed = np.frombuffer(bytes.fromhex(''.join('0' * pad + line for line in lines)), dtype=np.uint8)
+    bits = np.unpackbits(packed.reshape(len(lines), -1), axis=1)[:, pad * 4:]
+    return bits.reshape(len(lines), height, width)
+
+def encode_walls(walls):
+    """(num_walls, height, width) array of 0/1 to a list of hex lines."""
+    walls = np.asarray(walls, dtype=np.uint8)
+    num_walls, height, width = walls.shape
+    n_hex = num_hex_digits(height, width)
+    pad = n_hex % 2
+    bits = walls.reshape(num_walls, -1)
+    if pad:
+        bits = np.concatenate([np.zeros((num_walls, 4), dtype=np.uint8), bits], axis=1)
+    hex_string = np.packbits(bits, axis=1).tobytes().hex()
+    row_len = n_hex + pad
+    return [hex_string[i * row_len + pad:(i + 1) * row_len] for i in range(num_walls)]
+
+def read_walls(filename="walls.mem", height=NUM_Y_BITS, width=NUM_X_BITS):
+    """Load a wall file. Relative names are looked up in top/data."""
+    with open(os.path.join(DATA_PATH, filename), 'r') as f:
+        return decode_walls(f.read().split('\n'), height, width)
+
+def write_walls(walls, filename="walls.mem"):
+    """Store walls in the same layout as the existing files: one line per wall, no trailing newline."""
+    with open(os.path.join(DATA_PATH, filename), 'w') as f:
+        f.write('\n'.join(encode_walls(walls)))
+
+def wall_to_int(wall):
+    """The wall as the integer the BRAM holds, i.e. the value of wall_bit_mask in simulation."""
+    return int(encode_walls(np.asarray(wall)[None])[0], 16)
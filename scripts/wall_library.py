@@ -0,0 +1,170 @@
+import argparse
+import math
+import os
+import sys
+import numpy as np
+from wall_codec import DATA_PATH, NUM_X_BITS, NUM_Y_BITS, SCREEN_WIDTH, SCREEN_HEIGHT, encode_walls, read_walls
+
+# Wall library: any number of walls in one indexed binary file, plus the tooling to turn a
+# playlist of them into the BRAM init file wall_bit_mask.sv loads.
+#
+#   python3 wall_library.py add walls.wlib ../top/data/walls.mem     # import a .mem file
+#   python3 wall_library.py list walls.wlib
+#   python3 wall_library.py export walls.wlib playlist.txt           # write walls.mem
+#   python3 wall_library.py plan --walls 40 --down-sample 16         # BRAM usage only
+#
+# File layout (little endian):
+#   8 byte magic, uint32 count, uint16 height, uint16 width, uint32 name table size
+#   count fixed size records of packed wall bits (row major, MSB first)
+#   name table: one utf-8 name per line, in record order
+
+MAGIC = b"WALLLIB1"
+HEADER = np.dtype([("magic", "S8"), ("count", "<u4"), ("height", "<u2"), ("width", "<u2"), ("names_size", "<u4")])
+
+RAMB36_BITS = 36864
+RAMB36_PER_DEVICE = 75 # xc7s50
+# (depth, width) aspect ratios of a RAMB36E1; 512x72 is simple dual port
+RAMB36_CONFIGS = [(32768, 1), (16384, 2), (8192, 4), (4096, 9), (2048, 18), (1024, 36), (512, 72)]
+
+def record_size(height, width):
+    return (height * width + 7) // 8
+
+def save_library(path, walls, names=None):
+    walls = np.asarray(walls, dtype=np.uint8)
+    count, height, width = walls.shape
+    if names is None:
+        names = [f"wall_{i}" for i in range(count)]
+    name_table = "\n".join(names).encode()
+    header = np.array([(MAGIC, count, height, width, len(name_table))], dtype=HEADER)
+    with open(path, "wb") as f:
+        f.write(header.tobytes())
+        f.write(np.packbits(walls.reshape(count, -1), axis=1).tobytes())
+        f.write(name_table)
+
+def read_header(path):
+    header = np.fromfile(path, dtype=HEADER, count=1)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a wall library")
+    return int(header["count"]), int(header["height"]), int(header["width"]), int(header["names_size"])
+
+def load_names(path):
+    count, height, width, names_size = read_header(path)
+    with open(path, "rb") as f:
+        f.seek(HEADER.itemsize + count * record_size(height, width))
+        names = f.read(names_size).decode()
+    return names.split("\n") if count else []
+
+def load_walls(path, indices=None):
+    """(len(indices), height, width) walls. Only the requested records are read from disk."""
+    count, height, width, _ = read_header(path)
+    records = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER.itemsize, shape=(count, record_size(height, width)))
+    if indices is not None:
+        records = records[np.asarray(indices, dtype=np.int64)]
+    bits = np.unpackbits(np.asarray(records), axis=1)[:, :height * width]
+    return bits.reshape(-1, height, width)
+
+def add_walls(path, walls, names=None):
+    """Append walls to a library, creating it if needed. Returns the new wall count."""
+    walls = np.asarray(walls, dtype=np.uint8)
+    if names is None:
+        start = read_header(path)[0] if os.path.exists(path) else 0
+        names = [f"wall_{start + i}" for i in range(len(walls))]
+    if os.path.exists(path):
+        walls = np.concatenate([load_walls(path), walls])
+        names = load_names(path) + list(names)
+    save_library(path, walls, names)
+    return len(walls)
+
+def resolve_playlist(path, playlist):
+    """Playlist entries are wall names or indices into the library."""
+    names = load_names(path)
+    index = {name: i for i, name in enumerate(names)}
+    resolved = []
+    for entry in playlist:
+        if entry in index:
+            resolved.append(index[entry])
+        elif entry.isdigit() and int(entry) < len(names):
+            resolved.append(int(entry))
+        else:
+            raise ValueError(f"{entry} is not in {path}")
+    return resolved
+
+def export_walls(walls, out_dir=DATA_PATH):
+    """Write walls as the one $readmemh init file of wall_bit_mask.sv, a line per wall."""
+    walls = np.asarray(walls, dtype=np.uint8)
+    file_path = os.path.join(out_dir, "walls.mem")
+    with open(file_path, "w") as f:
+        f.write("\n".join(encode_walls(walls)))
+    return file_path
+
+def ramb36_tiles(depth, width):
+    """RAMB36 primitives Vivado needs for a depth x width memory, in its best aspect ratio."""
+    return min(math.ceil(depth / d) * math.ceil(width / w) for d, w in RAMB36_CONFIGS)
+
+def plan_bram(num_walls, down_sample_factor):
+    """BRAM usage of num_walls walls at a given BIT_MASK_DOWN_SAMPLE_FACTOR."""
+    width = SCREEN_WIDTH // down_sample_factor
+    height = SCREEN_HEIGHT // down_sample_factor
+    bits = width * height
+    # wall_bit_mask is one NUM_WALLS deep memory a wall wide, so its width, not the
+    # number of bits stored, sets the block count
+    return {
+        "down_sample_factor": down_sample_factor,
+        "bit_mask": f"{width}x{height}",
+        "bits_per_wall": bits,
+        "num_walls": num_walls,
+        "total_bits": bits * num_walls,
+        "ideal_36kb_blocks": math.ceil(bits * num_walls / RAMB36_BITS),
+        "mapped_ramb36": ramb36_tiles(num_walls, bits),
+        "device_ramb36": RAMB36_PER_DEVICE,
+    }
+
+def print_plan(plan):
+    print(f"Down sample factor {plan['down_sample_factor']}: {plan['bit_mask']} bit masks, {plan['bits_per_wall']} bits each")
+    print(f"  {plan['num_walls']} walls = {plan['total_bits']} bits = {plan['ideal_36kb_blocks']} x 36Kb blocks if perfectly packed")
+    print(f"  {plan['mapped_ramb36']} RAMB36 once the {plan['bits_per_wall']} bit wide, {plan['num_walls']} deep memory is tiled "
+          f"({100 * plan['mapped_ramb36'] / plan['device_ramb36']:.0f}% of {plan['device_ramb36']})")
+    if plan["mapped_ramb36"] > plan["device_ramb36"]:
+        print("  does not fit: use a larger --down-sample or fewer walls")
+    print(f"  set NUM_WALLS = {plan['num_walls']} on game_logic_controller")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the wall library and generate BRAM init files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="append the walls in a .mem file to a library")
+    add.add_argument("library")
+    add.add_argument("mem_file")
+
+    listing = commands.add_parser("list", help="list the walls in a library")
+    listing.add_argument("library")
+
+    export = commands.add_parser("export", help="write walls.mem for a playlist")
+    export.add_argument("library")
+    export.add_argument("playlist", help="file with one wall name or index per line")
+    export.add_argument("--out", default=DATA_PATH)
+
+    plan = commands.add_parser("plan", help="report BRAM usage")
+    plan.add_argument("--walls", type=int, required=True)
+    plan.add_argument("--down-sample", type=int, default=SCREEN_WIDTH // NUM_X_BITS)
+
+    args = parser.parse_args()
+    if args.command == "add":
+        walls = read_walls(os.path.abspath(args.mem_file), NUM_Y_BITS, NUM_X_BITS)
+        total = add_walls(args.library, walls)
+        print(f"Added {len(walls)} walls, {total} in {args.library}")
+    elif args.command == "list":
+        for i, name in enumerate(load_names(args.library)):
+            print(f"{i:4d} {name}")
+    elif args.command == "export":
+        with open(args.playlist) as f:
+            playlist = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        walls = load_walls(args.library, resolve_playlist(args.library, playlist))
+        print(f"Wrote {export_walls(walls, args.out)}")
+        down_sample = SCREEN_WIDTH // walls.shape[2]
+        print_plan(plan_bram(len(walls), down_sample))
+    elif args.command == "plan":
+        print_plan(plan_bram(args.walls, args.down_sample))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Questions about a finished run's FST/VCD dump without opening GTKWave, via top/sim/waveform.py.
+#
+#   python3 wave_query.py ../top/sim/fixtures/wall_bit_mask.fst --list
+#   python3 wave_query.py dump.fst --clk clk_in --per-frame is_collision_out --frame-start new_frame
+#   python3 wave_query.py dump.fst --clk clk_in --spacing valid_out data_valid_out
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "top" / "sim"))
+from waveform import FrameCounts, PulseSpacing, open_waveform, scan
+
+def summary(values):
+    if not len(values):
+        return "none"
+    return f"{len(values)} values, min {values.min()} mean {values.mean():.1f} max {values.max()}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame and pulse spacing queries on a waveform dump.")
+    parser.add_argument("dump", type=Path, help=".fst or .vcd file")
+    parser.add_argument("--list", action="store_true", help="list the dumped signals")
+    parser.add_argument("--clk", default="clk_in", help="clock the signals are sampled on")
+    parser.add_argument("--per-frame", nargs="*", default=[], help="signals to count high cycles of per frame")
+    parser.add_argument("--frame-start", default="new_frame", help="signal whose rising edge starts a frame")
+    parser.add_argument("--spacing", nargs="*", default=[], help="signals to measure pulse spacing of")
+    parser.add_argument("--all", action="store_true", help="print every value, not just a summary")
+    args = parser.parse_args()
+
+    wave = open_waveform(args.dump)
+    if args.list:
+        for signal in wave.signals.values():
+            print(f"{signal.name} [{signal.width}]")
+        return
+    queries = [FrameCounts(name, args.frame_start) for name in args.per_frame]
+    queries += [PulseSpacing(name) for name in args.spacing]
+    for query in scan(wave, args.clk, queries):
+        if isinstance(query, FrameCounts):
+            label = f"{query.signal} high cycles per frame"
+        else:
+            label = f"{query.signal} pulse spacing in cycles"
+        result = query.result()
+        print(f"{label}: {result.tolist() if args.all else summary(result)}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,8 @@ module game_logic_controller #(
     parameter MAX_FRAMES_PER_WALL_TICK = 15, // slowest speed of wall movement
     parameter BIT_MASK_DOWN_SAMPLE_FACTOR = 16,
     parameter MAX_ROUNDS = 5,
-    parameter COLLISION_THRESHOLD = 65536
+    parameter COLLISION_THRESHOLD = 65536,
+    parameter NUM_WALLS = 10 // walls in the BRAM, set from the scripts/wall_library.py report
 )
 (
     input  wire                clk_in,
@@ -45,7 +46,8 @@ module game_logic_controller #(
     assign new_frame = (hcount_in == SCREEN_WIDTH - 1 && vcount_in == SCREEN_HEIGHT - 1 && data_valid_in);
 
     // Wall and collision info
-    logic [3:0] curr_wall_idx;
+    localparam WALL_IDX_BITS = ($clog2(NUM_WALLS) < 1) ? 1 : $clog2(NUM_WALLS);
+    logic [WALL_IDX_BITS-1:0] curr_wall_idx;
     logic[$clog2(BIT_MASK_WIDTH):0] bitmask_x; // index into wall bit mask computed over 2 cycles
     logic [$clog2(BIT_MASK_HEIGHT)*2:0] bitmask_y;
     logic is_wall;
@@ -88,7 +90,8 @@ module game_logic_controller #(
         .DOWN_SAMPLE_FACTOR(BIT_MASK_DOWN_SAMPLE_FACTOR),
         .BIT_MASK_WIDTH(BIT_MASK_WIDTH),
         .BIT_MASK_HEIGHT(BIT_MASK_HEIGHT),
-        .BIT_MASK_SIZE(BIT_MASK_SIZE)
+        .BIT_MASK_SIZE(BIT_MASK_SIZE),
+        .NUM_WALLS(NUM_WALLS)
         ) wall_bit_mask_storage (
         .clk_in(clk_in),
         .rst_in(rst_in),
@@ -158,7 +161,7 @@ module game_logic_controller #(
                 new_round_pulse <= 0;
                 wall_depth_rst <= 0;
                 curr_round <= curr_round + 1;
-                curr_wall_idx <= (curr_wall_idx == 9) ? 0 : curr_wall_idx + 1;
+                curr_wall_idx <= (curr_wall_idx == NUM_WALLS - 1) ? 0 : curr_wall_idx + 1;
             end
             else if(wall_tick_pulse && wall_depth == MAX_WALL_DEPTH - 1) begin
                 // Wall reached end of depth
@@ -5,13 +5,18 @@
 // Focal length and baseline distance in inches
 // Resolution is assuming 1280x720
 // Sensor width of the camera in inches
-// Takes two cycles to compute
-module parallax #(parameter RESOLUTION_WIDTH = 1280, parameter SENSOR_WIDTH = 0.334646, parameter FOCAL_LENGTH = 0.1295276, parameter BASELINE_DISTANCE = 6)(
+// Takes two cycles plus the divider's latency (about PARALLAX_SCALE / disparity cycles) to compute,
+// depth_valid_out pulses for one cycle when depth_out updates
+// With USE_DEPTH_LUT the depth is read from a ROM generated by scripts/gen_depth_lut.py for the same
+// camera parameters instead, and is ready one cycle after data_valid_in
+module parallax #(parameter RESOLUTION_WIDTH = 1280, parameter SENSOR_WIDTH = 0.334646, parameter FOCAL_LENGTH = 0.1295276, parameter BASELINE_DISTANCE = 6,
+                  parameter USE_DEPTH_LUT = 0, parameter DEPTH_LUT_FILE = "depth_lut.mem")(
   input wire clk_in,
   input wire rst_in,
   input wire data_valid_in,
   input wire [11:0] x_1_in, x_2_in,
-  output logic [7:0] depth_out
+  output logic [7:0] depth_out,
+  output logic depth_valid_out
 );
   // TODO: Parallax scale can be >8 bits and disparity can be as low as 1 so depth can be 
   // more than 8 bits. Need to handle by tuning parameters well to avoid overflow or something else.
@@ -28,41 +33,67 @@ module parallax #(parameter RESOLUTION_WIDTH = 1280, parameter SENSOR_WIDTH = 0.
   logic [11:0] disparity;
   assign disparity = (x_1_in > x_2_in) ? (x_1_in - x_2_in) : (x_2_in - x_1_in); // absolute value
 
-  logic div_valid_in;
-  logic [11:0] div_data_out;
-  logic div_valid_out;
-  divider disparity_divider(
-    .clk_in(clk_in),
-    .rst_in(rst_in),
-    .dividend_in(PARALLAX_SCALE),
-    .divisor_in(disparity),
-    .data_valid_in(div_valid_in),
-    .quotient_out(div_data_out),
-    .remainder_out(),
-    .data_valid_out(div_valid_out),
-    .error_out(),
-    .busy_out()
-  );
-  
-  always_ff @(posedge clk_in)begin
-    if (rst_in)begin
-      depth_out <= 0;
-      div_valid_in <= 0;
-    end else begin      
-      if (data_valid_in && disparity != 0) begin
-        div_valid_in <= 1'b1;
-      end else if (data_valid_in && disparity == 0) begin
-        div_valid_in <= 1'b0;
-        depth_out <= 8'hFF;
-      end else begin
-        div_valid_in <= 1'b0;
+  localparam DEPTH_LUT_SIZE = 2048; // every 11-bit disparity
+
+  generate
+    if (USE_DEPTH_LUT) begin : lookup
+      logic [7:0] depth_lut [DEPTH_LUT_SIZE-1:0];
+      initial $readmemh(DEPTH_LUT_FILE, depth_lut);
+
+      always_ff @(posedge clk_in) begin
+        if (rst_in) begin
+          depth_out <= 0;
+          depth_valid_out <= 0;
+        end else begin
+          depth_valid_out <= data_valid_in;
+          if (data_valid_in) begin
+            // disparities past the table are further than the screen is wide, use the last entry
+            depth_out <= depth_lut[(disparity >= DEPTH_LUT_SIZE) ? DEPTH_LUT_SIZE - 1 : disparity];
+          end
+        end
       end
+    end else begin : iterative
+      logic div_valid_in;
+      logic [11:0] div_data_out;
+      logic div_valid_out;
+      divider disparity_divider(
+        .clk_in(clk_in),
+        .rst_in(rst_in),
+        .dividend_in(PARALLAX_SCALE),
+        .divisor_in(disparity),
+        .data_valid_in(div_valid_in),
+        .quotient_out(div_data_out),
+        .remainder_out(),
+        .data_valid_out(div_valid_out),
+        .error_out(),
+        .busy_out()
+      );
+
+      always_ff @(posedge clk_in)begin
+        if (rst_in)begin
+          depth_out <= 0;
+          depth_valid_out <= 0;
+          div_valid_in <= 0;
+        end else begin      
+          depth_valid_out <= 1'b0;
+          if (data_valid_in && disparity != 0) begin
+            div_valid_in <= 1'b1;
+          end else if (data_valid_in && disparity == 0) begin
+            div_valid_in <= 1'b0;
+            depth_out <= 8'hFF;
+            depth_valid_out <= 1'b1;
+          end else begin
+            div_valid_in <= 1'b0;
+          end
 
-      if (div_valid_out) begin
-        depth_out <= div_data_out;
+          if (div_valid_out) begin
+            depth_out <= div_data_out;
+            depth_valid_out <= 1'b1;
+          end
+        end
       end
     end
-  end
+  endgenerate
 endmodule
 
 
@@ -51,7 +51,8 @@ module stacker
 
         if (count == 7) begin
           chunk_tdata  <= { pixel_tdata[15:0], data_recent[127:16] };
-          chunk_tlast <= (tlast_recent > 0);
+          // tlast_recent[0] still holds the last pixel of the previous chunk
+          chunk_tlast <= pixel_tlast || (tlast_recent[7:1] > 0);
           chunk_tvalid <= 1'b1;
         end
         
@@ -1,26 +1,29 @@
-module uart_sim_test (
+module uart_sim_test #(
+    parameter INPUT_CLOCK_FREQ = 100_000_000,
+    parameter BAUD_RATE = 115200,
+    parameter DATA_WIDTH = 11
+) (
     input  wire          clk_in,
     input  wire          rst_in,
 
-    input  wire [10:0]   tx_data_in,
+    input  wire [DATA_WIDTH-1:0] tx_data_in,
     input  wire          tx_trigger_in,
     output logic         busy_out,
     // output logic         tx_wire_out,
 
     // input  wire          rx_wire_in,
     output logic         rx_trigger_out,
-    output logic [10:0]  rx_data_out
+    output logic [DATA_WIDTH-1:0] rx_data_out
 );
 
-    localparam UART_BAUD_RATE = 115200;
     logic line;
 
-    uart_transmit #(.BAUD_RATE(UART_BAUD_RATE), .DATA_WIDTH(11)) uart_tx_y (
+    uart_transmit #(.INPUT_CLOCK_FREQ(INPUT_CLOCK_FREQ), .BAUD_RATE(BAUD_RATE), .DATA_WIDTH(DATA_WIDTH)) uart_tx_y (
         .clk_in(clk_in),
         .rst_in(rst_in),
         .data_byte_in(tx_data_in),
         .trigger_in(tx_trigger_in),
-        .busy_out(),
+        .busy_out(busy_out),
         .tx_wire_out(line)
     );
 
@@ -30,8 +33,8 @@ module uart_sim_test (
         uart_rx_buf[0] = uart_rx_buf[1];
     end
 
-    logic [10:0] rx_data;
-    uart_receive #(.BAUD_RATE(UART_BAUD_RATE), .DATA_WIDTH(11)) uart_rx_x (
+    logic [DATA_WIDTH-1:0] rx_data;
+    uart_receive #(.INPUT_CLOCK_FREQ(INPUT_CLOCK_FREQ), .BAUD_RATE(BAUD_RATE), .DATA_WIDTH(DATA_WIDTH)) uart_rx_x (
         .clk_in(clk_in),
         .rst_in(rst_in),
         .rx_wire_in(uart_rx_buf[0]),
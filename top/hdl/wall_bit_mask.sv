@@ -7,24 +7,24 @@ module wall_bit_mask #(
     parameter DOWN_SAMPLE_FACTOR = 16,
     parameter BIT_MASK_WIDTH = SCREEN_WIDTH/DOWN_SAMPLE_FACTOR,
     parameter BIT_MASK_HEIGHT = SCREEN_HEIGHT/DOWN_SAMPLE_FACTOR, 
-    parameter BIT_MASK_SIZE = BIT_MASK_WIDTH * BIT_MASK_HEIGHT
+    parameter BIT_MASK_SIZE = BIT_MASK_WIDTH * BIT_MASK_HEIGHT,
+    parameter NUM_WALLS = 36000 / BIT_MASK_SIZE // default is what fits in one 36Kb block
     )
     (
     input wire 	       clk_in,
     input wire 	       rst_in,
     
-    input wire [$clog2(NUM_BITMASKS_PER_BRAM)-1:0] bitmask_idx,
+    input wire [(NUM_WALLS > 1 ? $clog2(NUM_WALLS) : 1)-1:0] bitmask_idx, // 1 bit for a single wall
     output logic [BIT_MASK_SIZE - 1:0] wall_bit_mask
 );
-    localparam BRAM_MEMORY = 36000;
-    localparam NUM_BITMASKS_PER_BRAM = BRAM_MEMORY / (BIT_MASK_SIZE);
-
     // Bit masks are down sampled by 16 i.e. 80x45 = 3600 bits. 
-    // We can store 36kb/3600 = 10 bit masks in BRAM.
+    // All walls are one BIT_MASK_SIZE wide memory, initialized from walls.mem as written by
+    // scripts/wall_library.py. Vivado tiles it 72 bits per RAMB36, so the width sets the
+    // block count (50 at 3600 bits) and depth is free up to 512 walls.
     xilinx_single_port_ram_read_first
         #(
         .RAM_WIDTH(BIT_MASK_SIZE),
-        .RAM_DEPTH(NUM_BITMASKS_PER_BRAM),
+        .RAM_DEPTH(NUM_WALLS),
         .RAM_PERFORMANCE("HIGH_PERFORMANCE"),
         .INIT_FILE("walls.mem")
         ) bit_masks
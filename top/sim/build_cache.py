@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import cocotb
+
+# Content-hashed replacement for runner.build(..., always=True).
+# Each parameter set gets its own build directory under build_root and a stamp file
+# holding the hash of everything that goes into the compile. If the stamp matches,
+# the previous build is reused and the simulator compile is skipped entirely.
+
+STAMP_FILE = "build_key"
+
+def config_key(runner, hdl_toplevel, parameters, build_args, build_kwargs):
+    """Hash of everything except the source contents, used to name the build directory."""
+    config = {
+        "simulator": type(runner).__name__,
+        "cocotb": cocotb.__version__,
+        "hdl_toplevel": hdl_toplevel,
+        "parameters": {name: str(value) for name, value in parameters.items()},
+        "build_args": [str(arg) for arg in build_args],
+        "build_kwargs": {name: str(value) for name, value in sorted(build_kwargs.items())},
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+def sources_key(config, sources):
+    """Hash of the build config plus the path and contents of every HDL source."""
+    h = hashlib.sha256(config.encode())
+    for source in sources:
+        source = Path(source)
+        h.update(str(source.resolve()).encode())
+        h.update(source.read_bytes())
+    return h.hexdigest()
+
+def cached_build(runner, sources, hdl_toplevel, parameters=None, build_args=None, build_root="sim_build", **build_kwargs):
+    """Build hdl_toplevel with runner unless an identical build already exists.
+
+    Takes the same arguments as runner.build (minus always/build_dir) and returns the
+    build directory, which stays set on the runner for the following runner.test call.
+    """
+    parameters = dict(parameters or {})
+    build_args = list(build_args or [])
+    config = config_key(runner, hdl_toplevel, parameters, build_args, build_kwargs)
+    key = sources_key(config, sources)
+    build_dir = Path(build_root).resolve() / f"{hdl_toplevel}_{config[:12]}"
+    stamp = build_dir / STAMP_FILE
+
+    hit = stamp.is_file() and stamp.read_text() == key
+    if hit:
+        # simulators still compare mtimes, so make the old build look newer than the sources
+        for path in build_dir.rglob("*"):
+            if path.is_file():
+                os.utime(path)
+    else:
+        stamp.unlink(missing_ok=True)
+
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        parameters=parameters,
+        build_args=build_args,
+        build_dir=build_dir,
+        always=not hit,
+        **build_kwargs
+    )
+
+    if not hit:
+        stamp.write_text(key)
+    print(f"INFO: {'Reusing' if hit else 'Built'} {hdl_toplevel} in {build_dir}")
+    return build_dir
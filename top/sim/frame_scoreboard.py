@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+import numpy as np
+
+# Whole-frame checking for modules that output a pixel stream. FrameCapture fills a
+# preallocated NumPy frame from the DUT output as video_source drives the raster, and
+# check_frame compares it against a golden frame in top/sim/golden: first by hash, which
+# is all a passing frame costs, and only on a mismatch by loading the golden and writing
+# <name>_got.png, <name>_golden.png and <name>_diff.png next to results.xml.
+#
+#   UPDATE_GOLDEN=1   (re)record the goldens from this run instead of checking them; without
+#                     it a frame with no golden fails
+#
+# Goldens are <name>.npy, or <name>.png for 24-bit 0xRRGGBB frames, and their hashes are
+# kept in golden/hashes.json so a match never has to read the golden itself.
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+HASH_FILE = "hashes.json"
+UPDATE_GOLDEN = os.getenv("UPDATE_GOLDEN", "0") == "1"
+
+UNRESOLVED = -1 # captured for pixels whose output had X or Z bits
+DIFF_COLOR = (255, 0, 0)
+
+class FrameCapture:
+    """Output stream -> frame buffer. Pass it as drive_frame's capture argument.
+
+    latency is the number of clk_edge's between driving a pixel and reading its output, 0 for
+    combinational outputs read on the same edge type the inputs are driven on. It has to fit
+    in the horizontal blanking, which is where the last pixels of each line come out."""
+
+    def __init__(self, handle, width, height, latency=0):
+        self.handle = handle
+        self.latency = latency
+        self.frame = np.zeros((height, width), dtype=np.int64)
+
+    def read(self):
+        try:
+            return self.handle.value.integer
+        except ValueError:
+            return UNRESOLVED
+
+    def store_line(self, y, values):
+        """values are the reads of every cycle from the line's first active pixel on."""
+        self.frame[y] = values[self.latency:self.latency + self.frame.shape[1]]
+
+def frame_hash(frame):
+    frame = np.ascontiguousarray(frame, dtype=np.int64)
+    return hashlib.sha1(str(frame.shape).encode() + frame.tobytes()).hexdigest()
+
+def to_rgb(frame):
+    """0xRRGGBB frame -> (height, width, 3) uint8, unresolved pixels black."""
+    frame = np.where(frame < 0, 0, frame)
+    return np.stack([(frame >> 16) & 0xFF, (frame >> 8) & 0xFF, frame & 0xFF], axis=-1).astype(np.uint8)
+
+def from_rgb(rgb):
+    rgb = rgb.astype(np.int64)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+def write_png(filename, rgb):
+    """(height, width, 3) uint8 to an 8-bit RGB PNG, no filtering."""
+    height, width, _ = rgb.shape
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, -1)], axis=1)
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        f.write(png_chunk(b"IEND", b""))
+
+def read_png(filename):
+    """8-bit RGB or RGBA PNG to (height, width, 3) uint8. Uses Pillow when it is installed,
+    otherwise only reads rows filtered with None, Sub or Up, which covers write_png's files."""
+    try:
+        from PIL import Image
+        return np.asarray(Image.open(filename).convert("RGB"))
+    except ImportError:
+        pass
+    data = Path(filename).read_bytes()
+    pos, idat = 8, b""
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", body)
+            assert depth == 8 and color in (2, 6) and not interlace, f"{filename}: only 8-bit RGB(A) PNGs without Pillow"
+        elif kind == b"IDAT":
+            idat += body
+        pos += 12 + length
+    channels = 3 if color == 2 else 4
+    raw = np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(height, 1 + width * channels)
+    rows = raw[:, 1:].astype(np.int64)
+    for y, kind in enumerate(raw[:, 0]):
+        if kind == 1: # Sub: running sum of each channel along the row
+            rows[y] = np.cumsum(rows[y].reshape(width, channels), axis=0).ravel() & 0xFF
+        elif kind == 2 and y: # Up
+            rows[y] = (rows[y] + rows[y - 1]) & 0xFF
+        elif kind > 2:
+            raise ValueError(f"{filename}: PNG filter {kind} needs Pillow")
+    return rows.reshape(height, width, channels)[..., :3].astype(np.uint8)
+
+def golden_hashes(golden_dir):
+    hash_file = Path(golden_dir) / HASH_FILE
+    return json.loads(hash_file.read_text()) if hash_file.is_file() else {}
+
+def golden_file(name, golden_dir):
+    for suffix in (".npy", ".png"):
+        path = Path(golden_dir) / f"{name}{suffix}"
+        if path.is_file():
+            return path
+    return None
+
+def load_golden(path):
+    return np.load(path) if path.suffix == ".npy" else from_rgb(read_png(path))
+
+def record_golden(name, frame, golden_dir, rgb=True):
+    """Store frame as the golden for name, PNG if it is a 24-bit colour frame."""
+    golden_dir = Path(golden_dir)
+    golden_dir.mkdir(exist_ok=True)
+    for suffix in (".npy", ".png"):
+        (golden_dir / f"{name}{suffix}").unlink(missing_ok=True)
+    if rgb and frame.min() >= 0 and frame.max() <= 0xFFFFFF:
+        write_png(golden_dir / f"{name}.png", to_rgb(frame))
+    else:
+        np.save(golden_dir / f"{name}.npy", frame)
+    hashes = golden_hashes(golden_dir)
+    hashes[name] = frame_hash(frame)
+    (golden_dir / HASH_FILE).write_text(json.dumps(hashes, indent=2, sort_keys=True) + "\n")
+
+def write_diff_images(name, frame, golden, mismatch, out_dir="."):
+    """<name>_got.png, <name>_golden.png, and <name>_diff.png: the golden at quarter
+    brightness with every mismatching pixel in DIFF_COLOR."""
+    out_dir = Path(out_dir)
+    write_png(out_dir / f"{name}_got.png", to_rgb(frame))
+    write_png(out_dir / f"{name}_golden.png", to_rgb(golden))
+    diff = to_rgb(golden) // 4
+    diff[mismatch] = DIFF_COLOR
+    write_png(out_dir / f"{name}_diff.png", diff)
+
+def check_frame(log, name, frame, golden_dir=GOLDEN_DIR, out_dir=".", rgb=True):
+    """Assert frame matches the golden called name. A missing golden fails the check too,
+    a new check sets its baseline with one UPDATE_GOLDEN=1 run."""
+    digest = frame_hash(frame)
+    if UPDATE_GOLDEN:
+        record_golden(name, frame, golden_dir, rgb)
+        log.warning(f"Recorded golden frame {name} in {golden_dir}, commit it if it looks right")
+        return
+    path = golden_file(name, golden_dir)
+    assert path is not None, f"no golden for {name}, run with UPDATE_GOLDEN=1"
+    if golden_hashes(golden_dir).get(name) == digest:
+        log.info(f"Frame {name} matches its golden (hash {digest[:12]})")
+        return
+
+    golden = load_golden(path)
+    if golden.shape == frame.shape and np.array_equal(golden, frame):
+        log.info(f"Frame {name} matches its golden")
+        return
+    assert golden.shape == frame.shape, f"Frame {name} is {frame.shape}, golden is {golden.shape}"
+    mismatch = golden != frame
+    ys, xs = np.nonzero(mismatch)
+    write_diff_images(name, frame, golden, mismatch, out_dir)
+    raise AssertionError(
+        f"Frame {name}: {len(ys)} pixels differ from the golden in x {xs.min()}..{xs.max()}, y {ys.min()}..{ys.max()}, "
+        f"first at ({xs[0]}, {ys[0]}): got {frame[ys[0], xs[0]]:#08x}, expected {golden[ys[0], xs[0]]:#08x}. "
+        f"See {name}_diff.png")
@@ -0,0 +1,67 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+/*
+ * ddr_fifo_sim_test
+ *
+ * One ddr_fifo_wrap between two free-running clocks generated here, for sweeping clock
+ * ratios without waking cocotb on every edge. Periods and the receiver clock's offset are in
+ * ps; keep the periods even so both clocks stay on whole ps.
+ */
+
+module ddr_fifo_sim_test
+  #(parameter SENDER_PERIOD_PS = 5000,
+    parameter RECEIVER_PERIOD_PS = 12308,
+    parameter RECEIVER_PHASE_PS = 0,
+    parameter DEPTH = 128,
+    parameter PROGFULL_DEPTH = 12)
+  (
+   output logic         sender_clk,
+   output logic         receiver_clk,
+   input wire           sender_rst,
+
+   input wire           sender_axis_tvalid,
+   output logic         sender_axis_tready,
+   input wire [127:0]   sender_axis_tdata,
+   input wire           sender_axis_tlast,
+   output logic         sender_axis_prog_full,
+
+   output logic         receiver_axis_tvalid,
+   input wire           receiver_axis_tready,
+   output logic [127:0] receiver_axis_tdata,
+   output logic         receiver_axis_tlast,
+   output logic         receiver_axis_prog_empty
+   );
+
+  initial begin
+    sender_clk = 0;
+    receiver_clk = 0;
+  end
+
+  initial begin
+    forever #(SENDER_PERIOD_PS / 2000.0) sender_clk = ~sender_clk;
+  end
+
+  initial begin
+    #(RECEIVER_PHASE_PS / 1000.0);
+    forever #(RECEIVER_PERIOD_PS / 2000.0) receiver_clk = ~receiver_clk;
+  end
+
+  ddr_fifo_wrap #(.DEPTH(DEPTH), .PROGFULL_DEPTH(PROGFULL_DEPTH)) fifo(
+    .sender_rst(sender_rst),
+    .sender_clk(sender_clk),
+    .sender_axis_tvalid(sender_axis_tvalid),
+    .sender_axis_tready(sender_axis_tready),
+    .sender_axis_tdata(sender_axis_tdata),
+    .sender_axis_tlast(sender_axis_tlast),
+    .sender_axis_prog_full(sender_axis_prog_full),
+    .receiver_clk(receiver_clk),
+    .receiver_axis_tvalid(receiver_axis_tvalid),
+    .receiver_axis_tready(receiver_axis_tready),
+    .receiver_axis_tdata(receiver_axis_tdata),
+    .receiver_axis_tlast(receiver_axis_tlast),
+    .receiver_axis_prog_empty(receiver_axis_prog_empty));
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,230 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+/*
+ * frame_buffer_sim_test
+ *
+ * top_level's DRAM frame buffer path with the MIG taken out: stacker -> ddr_fifo_wrap ->
+ * traffic_generator -> (MIG UI ports) -> ddr_fifo_wrap -> unstacker, wired and clocked as in
+ * top_level, with video_sig_gen and the same frame_buff_tready logic on the HDMI side. The
+ * MIG UI is left on the ports for a cocotb stand-in to drive.
+ *
+ * The three clocks are generated here rather than from cocotb, which would wake Python on
+ * every edge of all three. Periods are in ps; the defaults are top_level's 200 MHz camera,
+ * 81.25 MHz MIG UI and 74.25 MHz pixel clocks, and *_PHASE_PS delays each clock's first edge.
+ */
+
+module frame_buffer_sim_test
+  #(parameter CAMERA_PERIOD_PS = 5000,
+    parameter UI_PERIOD_PS = 12308,
+    parameter PIXEL_PERIOD_PS = 13468,
+    parameter CAMERA_PHASE_PS = 0,
+    parameter UI_PHASE_PS = 0,
+    parameter PIXEL_PHASE_PS = 0,
+    parameter FIFO_DEPTH = 128,
+    parameter PROGFULL_DEPTH = 12)
+  (
+   output logic         clk_camera,
+   output logic         clk_ui,
+   output logic         clk_pixel,
+   input wire           rst_in, // btn[0]: camera and pixel side reset
+
+   // camera pixels into the stacker, the way pixel_reconstruct hands them over
+   input wire           camera_valid,
+   input wire [15:0]    camera_pixel,
+   input wire           camera_tlast,
+   output logic         camera_tready, // left unconnected in top_level
+
+   // MIG UI, driven by the stand-in
+   input wire           ui_clk_sync_rst,
+   input wire           init_calib_complete,
+   input wire           app_rdy,
+   input wire           app_wdf_rdy,
+   input wire [127:0]   app_rd_data,
+   input wire           app_rd_data_end,
+   input wire           app_rd_data_valid,
+   output logic [26:0]  app_addr,
+   output logic [2:0]   app_cmd,
+   output logic         app_en,
+   output logic [127:0] app_wdf_data,
+   output logic         app_wdf_end,
+   output logic         app_wdf_wren,
+
+   // the traffic generator's streams, for stall accounting
+   output logic         write_axis_valid,
+   output logic         write_axis_ready,
+   output logic         read_axis_ready,
+
+   // HDMI side
+   output logic [10:0]  hcount_hdmi,
+   output logic [9:0]   vcount_hdmi,
+   output logic         active_draw_hdmi,
+   output logic         frame_buff_tvalid,
+   output logic         frame_buff_tready,
+   output logic [15:0]  frame_buff_tdata,
+   output logic         frame_buff_tlast
+   );
+
+  initial begin
+    clk_camera = 0;
+    clk_ui = 0;
+    clk_pixel = 0;
+  end
+
+  initial begin
+    #(CAMERA_PHASE_PS / 1000.0);
+    forever #(CAMERA_PERIOD_PS / 2000.0) clk_camera = ~clk_camera;
+  end
+
+  initial begin
+    #(UI_PHASE_PS / 1000.0);
+    forever #(UI_PERIOD_PS / 2000.0) clk_ui = ~clk_ui;
+  end
+
+  initial begin
+    #(PIXEL_PHASE_PS / 1000.0);
+    forever #(PIXEL_PERIOD_PS / 2000.0) clk_pixel = ~clk_pixel;
+  end
+
+  logic [127:0] camera_axis_tdata;
+  logic         camera_axis_tlast;
+  logic         camera_axis_tready;
+  logic         camera_axis_tvalid;
+
+  stacker stacker_inst(
+    .clk_in(clk_camera),
+    .rst_in(rst_in),
+    .pixel_tvalid(camera_valid),
+    .pixel_tready(camera_tready),
+    .pixel_tdata(camera_pixel),
+    .pixel_tlast(camera_tlast),
+    .chunk_tvalid(camera_axis_tvalid),
+    .chunk_tready(camera_axis_tready),
+    .chunk_tdata(camera_axis_tdata),
+    .chunk_tlast(camera_axis_tlast));
+
+  logic [127:0] camera_ui_axis_tdata;
+  logic         camera_ui_axis_tlast;
+  logic         camera_ui_axis_tready;
+  logic         camera_ui_axis_tvalid;
+  logic         camera_ui_axis_prog_empty;
+
+  ddr_fifo_wrap #(.DEPTH(FIFO_DEPTH), .PROGFULL_DEPTH(PROGFULL_DEPTH)) camera_data_fifo(
+    .sender_rst(rst_in),
+    .sender_clk(clk_camera),
+    .sender_axis_tvalid(camera_axis_tvalid),
+    .sender_axis_tready(camera_axis_tready),
+    .sender_axis_tdata(camera_axis_tdata),
+    .sender_axis_tlast(camera_axis_tlast),
+    .sender_axis_prog_full(),
+    .receiver_clk(clk_ui),
+    .receiver_axis_tvalid(camera_ui_axis_tvalid),
+    .receiver_axis_tready(camera_ui_axis_tready),
+    .receiver_axis_tdata(camera_ui_axis_tdata),
+    .receiver_axis_tlast(camera_ui_axis_tlast),
+    .receiver_axis_prog_empty(camera_ui_axis_prog_empty));
+
+  assign write_axis_valid = camera_ui_axis_tvalid;
+  assign write_axis_ready = camera_ui_axis_tready;
+
+  logic [127:0] display_ui_axis_tdata;
+  logic         display_ui_axis_tlast;
+  logic         display_ui_axis_tready;
+  logic         display_ui_axis_tvalid;
+  logic         display_ui_axis_prog_full;
+
+  assign read_axis_ready = display_ui_axis_tready;
+
+  traffic_generator readwrite_looper(
+    .app_addr         (app_addr[26:0]),
+    .app_cmd          (app_cmd[2:0]),
+    .app_en           (app_en),
+    .app_wdf_data     (app_wdf_data[127:0]),
+    .app_wdf_end      (app_wdf_end),
+    .app_wdf_wren     (app_wdf_wren),
+    .app_wdf_mask     (),
+    .app_sr_req       (),
+    .app_ref_req      (),
+    .app_zq_req       (),
+    .write_axis_ready (camera_ui_axis_tready),
+    .read_axis_data   (display_ui_axis_tdata),
+    .read_axis_tlast  (display_ui_axis_tlast),
+    .read_axis_valid  (display_ui_axis_tvalid),
+    .clk_in           (clk_ui),
+    .rst_in           (ui_clk_sync_rst),
+    .app_rd_data      (app_rd_data[127:0]),
+    .app_rd_data_end  (app_rd_data_end),
+    .app_rd_data_valid(app_rd_data_valid),
+    .app_rdy          (app_rdy),
+    .app_wdf_rdy      (app_wdf_rdy),
+    .app_sr_active    (1'b0),
+    .app_ref_ack      (1'b0),
+    .app_zq_ack       (1'b0),
+    .init_calib_complete(init_calib_complete),
+    .write_axis_data  (camera_ui_axis_tdata),
+    .write_axis_tlast (camera_ui_axis_tlast),
+    .write_axis_valid (camera_ui_axis_tvalid),
+    .write_axis_smallpile(camera_ui_axis_prog_empty),
+    .read_axis_af     (display_ui_axis_prog_full),
+    .read_axis_ready  (display_ui_axis_tready)
+  );
+
+  logic [127:0] display_axis_tdata;
+  logic         display_axis_tlast;
+  logic         display_axis_tready;
+  logic         display_axis_tvalid;
+  logic         display_axis_prog_empty;
+
+  ddr_fifo_wrap #(.DEPTH(FIFO_DEPTH), .PROGFULL_DEPTH(PROGFULL_DEPTH)) pdfifo(
+    .sender_rst(ui_clk_sync_rst),
+    .sender_clk(clk_ui),
+    .sender_axis_tvalid(display_ui_axis_tvalid),
+    .sender_axis_tready(display_ui_axis_tready),
+    .sender_axis_tdata(display_ui_axis_tdata),
+    .sender_axis_tlast(display_ui_axis_tlast),
+    .sender_axis_prog_full(display_ui_axis_prog_full),
+    .receiver_clk(clk_pixel),
+    .receiver_axis_tvalid(display_axis_tvalid),
+    .receiver_axis_tready(display_axis_tready),
+    .receiver_axis_tdata(display_axis_tdata),
+    .receiver_axis_tlast(display_axis_tlast),
+    .receiver_axis_prog_empty(display_axis_prog_empty));
+
+  unstacker unstacker_inst(
+    .clk_in(clk_pixel),
+    .rst_in(rst_in),
+    .chunk_tvalid(display_axis_tvalid),
+    .chunk_tready(display_axis_tready),
+    .chunk_tdata(display_axis_tdata),
+    .chunk_tlast(display_axis_tlast),
+    .pixel_tvalid(frame_buff_tvalid),
+    .pixel_tready(frame_buff_tready),
+    .pixel_tdata(frame_buff_tdata),
+    .pixel_tlast(frame_buff_tlast));
+
+  video_sig_gen vsg
+    (
+    .pixel_clk_in(clk_pixel),
+    .rst_in(rst_in),
+    .hcount_out(hcount_hdmi),
+    .vcount_out(vcount_hdmi),
+    .vs_out(),
+    .hs_out(),
+    .nf_out(),
+    .ad_out(active_draw_hdmi),
+    .fc_out()
+  );
+
+  always_comb begin
+    if (active_draw_hdmi) begin
+      if(frame_buff_tlast && (hcount_hdmi != 1279 || vcount_hdmi != 719))
+        frame_buff_tready = 1'b0;
+      else
+        frame_buff_tready = 1'b1;
+    end else
+      frame_buff_tready = 1'b0;
+  end
+
+endmodule
+
+`default_nettype wire
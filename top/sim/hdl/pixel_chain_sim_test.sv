@@ -0,0 +1,151 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+/*
+ * pixel_chain_sim_test
+ *
+ * The clk_pixel detection and game chain of top_level, wired the same way and with the same
+ * instance names, for measuring stage latencies against the raster:
+ *
+ *   frame_buff_raw -> fb_red/green/blue -> rgb_to_ycrcb -> cr/cb threshold -> is_player
+ *   -> moving_frame_k_means, game_logic_controller
+ *
+ * hcount_in/vcount_in/data_valid_in stand in for video_sig_gen, and nf_hdmi is decoded from
+ * them as video_sig_gen does. The game window is a parameter so the chain can run on a small
+ * raster; top_level's is 65 to 1279-85 by 0 to 719-85.
+ */
+
+module pixel_chain_sim_test
+  #(parameter SCREEN_WIDTH = 160,
+    parameter SCREEN_HEIGHT = 96,
+    parameter WINDOW_LEFT = 8,
+    parameter WINDOW_RIGHT = SCREEN_WIDTH - 1 - 8,
+    parameter WINDOW_BOTTOM = SCREEN_HEIGHT - 1 - 8,
+    parameter GOAL_DEPTH = 60,
+    parameter GOAL_DEPTH_DELTA = 10,
+    parameter MAX_WALL_DEPTH = GOAL_DEPTH + GOAL_DEPTH_DELTA + 5,
+    parameter BIT_MASK_DOWN_SAMPLE_FACTOR = 16,
+    parameter NUM_WALLS = 10)
+  (
+   input wire          clk_in,
+   input wire          rst_in,
+   input wire [10:0]   hcount_in,
+   input wire [9:0]    vcount_in,
+   input wire          data_valid_in,
+   input wire [15:0]   frame_buff_raw,
+   input wire [1:0]    num_players,
+   input wire [15:0]   start_game_in,
+   input wire [7:0]    player_depth_in,
+
+   output logic        is_player,
+   output logic        com_valid_out,
+   output logic [1:0]  pixel_player_num,
+   output logic [10:0] hcount_out,
+   output logic [9:0]  vcount_out,
+   output logic        data_valid_out,
+   output logic [7:0]  wall_depth,
+   output logic [7:0]  player_depth_out,
+   output logic        pixel_is_wall,
+   output logic        is_person_out,
+   output logic        pixel_is_collision,
+   output logic [2:0]  game_state
+   );
+
+  logic nf_hdmi;
+  assign nf_hdmi = (hcount_in == SCREEN_WIDTH) && (vcount_in == SCREEN_HEIGHT);
+
+  logic [7:0] fb_red, fb_green, fb_blue;
+  always_ff @(posedge clk_in)begin
+    fb_red <= {frame_buff_raw[15:11],3'b0};
+    fb_green <= {frame_buff_raw[10:5], 2'b0};
+    fb_blue <= {frame_buff_raw[4:0],3'b0};
+  end
+
+  logic [9:0] y_full, cr_full, cb_full;
+  logic [7:0] y, cr, cb;
+  rgb_to_ycrcb rgbtoycrcb_m(
+    .clk_in(clk_in),
+    .r_in(fb_red),
+    .g_in(fb_green),
+    .b_in(fb_blue),
+    .y_out(y_full),
+    .cr_out(cr_full),
+    .cb_out(cb_full)
+  );
+  assign y = y_full[7:0];
+  assign cr = {!cr_full[7],cr_full[6:0]};
+  assign cb = {!cb_full[7],cb_full[6:0]};
+
+  logic cr_mask, cb_mask;
+  logic is_green_screen, is_in_game_window;
+  threshold cr_mt(
+    .clk_in(clk_in),
+    .rst_in(rst_in),
+    .pixel_in(cr),
+    .lower_bound_in(8'h00),
+    .upper_bound_in(8'h90),
+    .mask_out(cr_mask)
+  );
+  threshold cb_mt(
+    .clk_in(clk_in),
+    .rst_in(rst_in),
+    .pixel_in(cb),
+    .lower_bound_in(8'h00),
+    .upper_bound_in(8'h90),
+    .mask_out(cb_mask)
+  );
+  assign is_green_screen = cr_mask & cb_mask;
+  assign is_in_game_window = (hcount_in >= WINDOW_LEFT) & (hcount_in <= WINDOW_RIGHT) & (vcount_in >= 0) & (vcount_in <= WINDOW_BOTTOM);
+  assign is_player = ~is_green_screen & is_in_game_window;
+
+  logic [10:0] x_com_out [3:0];
+  logic [9:0] y_com_out [3:0];
+  moving_frame_k_means kmeans (
+    .clk_in(clk_in),
+    .rst_in(rst_in),
+    .x_in(hcount_in),
+    .y_in(vcount_in),
+    .valid_in(is_player & data_valid_in),
+    .tabulate_in(nf_hdmi),
+    .num_players(num_players),
+    .x_out(x_com_out),
+    .y_out(y_com_out),
+    .valid_out(com_valid_out),
+    .player_out(pixel_player_num)
+  );
+
+  game_logic_controller #(
+    .SCREEN_WIDTH(SCREEN_WIDTH),
+    .SCREEN_HEIGHT(SCREEN_HEIGHT),
+    .GOAL_DEPTH(GOAL_DEPTH),
+    .GOAL_DEPTH_DELTA(GOAL_DEPTH_DELTA),
+    .MAX_WALL_DEPTH(MAX_WALL_DEPTH),
+    .MAX_FRAMES_PER_WALL_TICK(15),
+    .BIT_MASK_DOWN_SAMPLE_FACTOR(BIT_MASK_DOWN_SAMPLE_FACTOR),
+    .MAX_ROUNDS(3),
+    .COLLISION_THRESHOLD(256),
+    .NUM_WALLS(NUM_WALLS)
+  ) game_controller (
+    .clk_in(clk_in),
+    .rst_in(rst_in),
+    .start_game_in(start_game_in),
+    .hcount_in(hcount_in),
+    .vcount_in(vcount_in),
+    .num_players(num_players),
+    .data_valid_in(data_valid_in),
+    .is_person_in(is_player),
+    .player_depth_in(player_depth_in),
+    .hcount_out(hcount_out),
+    .vcount_out(vcount_out),
+    .data_valid_out(data_valid_out),
+    .wall_depth_out(wall_depth),
+    .player_depth_out(player_depth_out),
+    .is_wall_out(pixel_is_wall),
+    .is_person_out(is_person_out),
+    .is_collision_out(pixel_is_collision),
+    .game_state(game_state)
+  );
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,52 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+/*
+ * wall_bit_mask_dump
+ *
+ * Reads every wall of walls.mem out of wall_bit_mask, three cycles each, and dumps the
+ * module: the fixtures waveform_test.py decodes. Run from top/sim/fixtures so $readmemh
+ * finds the walls.mem kept there, once per format (--trace-fst makes Verilator write FST):
+ *
+ *   verilator --binary --trace -Wno-fatal --top-module wall_bit_mask_dump \
+ *       ../hdl/wall_bit_mask_dump.sv ../../hdl/wall_bit_mask.sv ../../hdl/xilinx_single_port_ram_read_first.sv
+ *   obj_dir/Vwall_bit_mask_dump
+ *   (the same with --trace-fst) obj_dir/Vwall_bit_mask_dump +dumpfile=wall_bit_mask.fst
+ *
+ * The wires here are named apart from the module's ports so every dumped name stays unique.
+ */
+
+module wall_bit_mask_dump
+  #(parameter NUM_WALLS = 10)
+  ();
+  logic clk = 0;
+  logic rst = 1;
+  logic [$clog2(NUM_WALLS)-1:0] idx = 0;
+  logic [3599:0] mask;
+
+  always #5 clk = ~clk;
+
+  wall_bit_mask #(.NUM_WALLS(NUM_WALLS)) dut (
+    .clk_in(clk),
+    .rst_in(rst),
+    .bitmask_idx(idx),
+    .wall_bit_mask(mask)
+  );
+
+  string dumpfile = "wall_bit_mask.vcd";
+
+  initial begin
+    void'($value$plusargs("dumpfile=%s", dumpfile));
+    $dumpfile(dumpfile);
+    $dumpvars(0, dut);
+    repeat (3) @(posedge clk);
+    @(negedge clk) rst = 0;
+    for (int k = 0; k < NUM_WALLS; k++) begin
+      idx = k;
+      repeat (3) @(negedge clk);
+    end
+    $finish;
+  end
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,176 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+/*
+ * xpm_fifo_axis
+ *
+ * Simulation-only stand-in for the Xilinx XPM macro of the same name, covering the
+ * independent-clock configuration ddr_fifo_wrap uses: first-word fall-through, gray-coded
+ * pointers crossed over CDC_SYNC_STAGES flops, and prog_full/prog_empty computed from each
+ * side's delayed view of the other side's pointer, so both flags are pessimistic the way the
+ * real ones are. Only for iverilog benches; Vivado builds use the real macro.
+ *
+ * The tdest/tid/tkeep/tstrb/tuser side channels are not modelled. ddr_fifo_wrap ties all of
+ * them, including the m_axis outputs, to 0, so they are all inputs here.
+ *
+ * occupancy, peak_occupancy, prog_full_count and blocked_count are not on the real macro;
+ * the benches read them through the hierarchy.
+ */
+
+module xpm_fifo_axis
+  #(parameter CASCADE_HEIGHT = 0,
+    parameter CDC_SYNC_STAGES = 2,
+    parameter CLOCKING_MODE = "common_clock",
+    parameter ECC_MODE = "no_ecc",
+    parameter FIFO_DEPTH = 2048,
+    parameter FIFO_MEMORY_TYPE = "auto",
+    parameter PACKET_FIFO = "false",
+    parameter PROG_EMPTY_THRESH = 10,
+    parameter PROG_FULL_THRESH = 10,
+    parameter RELATED_CLOCKS = 0,
+    parameter SIM_ASSERT_CHK = 0,
+    parameter TDATA_WIDTH = 32,
+    parameter USE_ADV_FEATURES = "1000")
+  (
+   input wire                    s_aclk,
+   input wire                    s_aresetn,
+   input wire                    s_axis_tvalid,
+   output logic                  s_axis_tready,
+   input wire [TDATA_WIDTH-1:0]  s_axis_tdata,
+   input wire                    s_axis_tlast,
+   input wire                    s_axis_tdest,
+   input wire                    s_axis_tid,
+   input wire [TDATA_WIDTH/8-1:0] s_axis_tkeep,
+   input wire [TDATA_WIDTH/8-1:0] s_axis_tstrb,
+   input wire                    s_axis_tuser,
+   output logic                  prog_full_axis,
+
+   input wire                    m_aclk,
+   output logic                  m_axis_tvalid,
+   input wire                    m_axis_tready,
+   output logic [TDATA_WIDTH-1:0] m_axis_tdata,
+   output logic                  m_axis_tlast,
+   input wire                    m_axis_tdest,
+   input wire                    m_axis_tid,
+   input wire [TDATA_WIDTH/8-1:0] m_axis_tkeep,
+   input wire [TDATA_WIDTH/8-1:0] m_axis_tstrb,
+   input wire                    m_axis_tuser,
+   output logic                  prog_empty_axis
+   );
+
+  localparam ADDR_WIDTH = $clog2(FIFO_DEPTH);
+
+  function automatic [ADDR_WIDTH:0] to_gray(input [ADDR_WIDTH:0] bin);
+    to_gray = bin ^ (bin >> 1);
+  endfunction
+
+  function automatic [ADDR_WIDTH:0] from_gray(input [ADDR_WIDTH:0] gray);
+    from_gray = gray;
+    for (int i = ADDR_WIDTH - 1; i >= 0; i--)
+      from_gray[i] = from_gray[i + 1] ^ gray[i];
+  endfunction
+
+  logic [TDATA_WIDTH:0] mem [FIFO_DEPTH-1:0]; // {tlast, tdata}
+
+  logic                  wr_rst;
+  logic [ADDR_WIDTH:0]   wr_ptr;
+  logic [ADDR_WIDTH:0]   wr_ptr_gray;
+  logic [ADDR_WIDTH:0]   rd_ptr_gray_sync [CDC_SYNC_STAGES-1:0];
+  logic [ADDR_WIDTH:0]   wr_count;
+  logic                  accept_in;
+
+  logic [CDC_SYNC_STAGES-1:0] rd_rst_sync;
+  logic                  rd_rst;
+  logic [ADDR_WIDTH:0]   rd_ptr;
+  logic [ADDR_WIDTH:0]   rd_ptr_gray;
+  logic [ADDR_WIDTH:0]   wr_ptr_gray_sync [CDC_SYNC_STAGES-1:0];
+  logic [ADDR_WIDTH:0]   rd_count;
+  logic                  accept_out;
+
+  // write side, s_aclk
+  assign wr_rst = ~s_aresetn;
+  assign wr_count = wr_ptr - from_gray(rd_ptr_gray_sync[CDC_SYNC_STAGES-1]);
+  assign s_axis_tready = !wr_rst && wr_count < FIFO_DEPTH;
+  assign accept_in = s_axis_tvalid && s_axis_tready;
+
+  always_ff @(posedge s_aclk) begin
+    if (wr_rst) begin
+      wr_ptr         <= 0;
+      wr_ptr_gray    <= 0;
+      prog_full_axis <= 1'b1;
+    end else begin
+      if (accept_in) begin
+        mem[wr_ptr[ADDR_WIDTH-1:0]] <= {s_axis_tlast, s_axis_tdata};
+        wr_ptr      <= wr_ptr + 1;
+        wr_ptr_gray <= to_gray(wr_ptr + 1);
+      end
+      prog_full_axis <= (wr_count + accept_in >= PROG_FULL_THRESH);
+    end
+    for (int i = 0; i < CDC_SYNC_STAGES; i++)
+      rd_ptr_gray_sync[i] <= wr_rst ? 0 : (i == 0 ? rd_ptr_gray : rd_ptr_gray_sync[i - 1]);
+  end
+
+  // read side, m_aclk, reset by s_aresetn through a synchronizer like the macro does
+  assign rd_rst = rd_rst_sync[CDC_SYNC_STAGES-1];
+  assign rd_count = from_gray(wr_ptr_gray_sync[CDC_SYNC_STAGES-1]) - rd_ptr;
+  assign m_axis_tvalid = !rd_rst && rd_count != 0;
+  assign {m_axis_tlast, m_axis_tdata} = mem[rd_ptr[ADDR_WIDTH-1:0]];
+  assign accept_out = m_axis_tvalid && m_axis_tready;
+
+  always_ff @(posedge m_aclk or posedge wr_rst) begin
+    if (wr_rst)
+      rd_rst_sync <= '1;
+    else
+      rd_rst_sync <= {rd_rst_sync[CDC_SYNC_STAGES-2:0], 1'b0};
+  end
+
+  always_ff @(posedge m_aclk) begin
+    if (rd_rst) begin
+      rd_ptr          <= 0;
+      rd_ptr_gray     <= 0;
+      prog_empty_axis <= 1'b1;
+    end else begin
+      if (accept_out) begin
+        rd_ptr      <= rd_ptr + 1;
+        rd_ptr_gray <= to_gray(rd_ptr + 1);
+      end
+      prog_empty_axis <= (rd_count - accept_out <= PROG_EMPTY_THRESH);
+    end
+    for (int i = 0; i < CDC_SYNC_STAGES; i++)
+      wr_ptr_gray_sync[i] <= rd_rst ? 0 : (i == 0 ? wr_ptr_gray : wr_ptr_gray_sync[i - 1]);
+  end
+
+  // bench observability: true occupancy across both pointers, its peak, how many times
+  // prog_full went high, and write-side cycles with tvalid held off by a full FIFO
+  logic [ADDR_WIDTH:0]   occupancy;
+  logic [ADDR_WIDTH:0]   peak_occupancy;
+  logic [31:0]           prog_full_count;
+  logic [31:0]           blocked_count;
+  logic                  prog_full_prev;
+
+  assign occupancy = wr_ptr - rd_ptr;
+
+  always @(occupancy or wr_rst) begin
+    if (wr_rst)
+      peak_occupancy = 0;
+    else if (occupancy > peak_occupancy)
+      peak_occupancy = occupancy;
+  end
+
+  always_ff @(posedge s_aclk) begin
+    if (wr_rst) begin
+      prog_full_count <= 0;
+      blocked_count   <= 0;
+      prog_full_prev  <= 1'b1; // prog_full is held high through reset
+    end else begin
+      prog_full_prev <= prog_full_axis;
+      if (prog_full_axis && !prog_full_prev)
+        prog_full_count <= prog_full_count + 1;
+      if (s_axis_tvalid && !s_axis_tready)
+        blocked_count <= blocked_count + 1;
+    end
+  end
+
+endmodule
+
+`default_nettype wire
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+import numpy as np
+from cocotb.triggers import RisingEdge, ReadOnly
+
+# Handshake-based waits and latency bookkeeping for benches whose result time depends on the
+# operands (e.g. anything behind divider.sv). Instead of a fixed ClockCycles(...) after every
+# stimulus, wait for the DUT's own valid signal, count the cycles, and fail if it never comes.
+
+async def wait_for_valid(clk, valid, timeout_cycles, mask=1):
+    """Wait until every bit of `mask` has been seen high on `valid` (bits may arrive on different
+    cycles). Call right after the rising edge that sampled the stimulus, which counts as cycle 1,
+    so a registered output has a latency of 1. Returns the cycles to the last bit and leaves the
+    sim in the ReadOnly phase of that edge so the outputs can be checked directly."""
+    clk_edge = RisingEdge(clk)
+    seen = 0
+    for cycle in range(1, timeout_cycles + 1):
+        if cycle > 1:
+            await clk_edge
+        await ReadOnly()
+        seen |= valid.value.integer & mask
+        if seen == mask:
+            return cycle
+    raise AssertionError(f"{valid._name} not seen within {timeout_cycles} cycles (got {seen:#x} of {mask:#x})")
+
+def latency_summary(cycles):
+    """min/mean/p99/max of a list of latencies in cycles."""
+    cycles = np.asarray(cycles)
+    return {
+        "count": int(cycles.size),
+        "min": int(cycles.min()),
+        "mean": float(cycles.mean()),
+        "p99": float(np.percentile(cycles, 99)),
+        "max": int(cycles.max()),
+    }
+
+def report_latency(log, name, samples, out_dir="."):
+    """Log a latency histogram and write it to <name>_latency.json next to results.xml.
+    samples is a list of (operands, cycles)."""
+    cycles = [c for _, c in samples]
+    summary = latency_summary(cycles)
+    log.info(f"{name} latency over {summary['count']} results: min {summary['min']} mean {summary['mean']:.1f} "
+             f"p99 {summary['p99']:.1f} max {summary['max']} cycles")
+    counts, edges = np.histogram(cycles, bins=min(10, len(set(cycles))))
+    for count, lo, hi in zip(counts, edges[:-1], edges[1:]):
+        log.info(f"  {lo:7.0f} - {hi:7.0f} cycles | {'#' * int(40 * count / counts.max())} {count}")
+    with open(Path(out_dir) / f"{name}_latency.json", "w") as f:
+        json.dump({"summary": summary, "samples": [{"operands": list(op), "cycles": c} for op, c in samples]}, f, indent=2)
+    return summary
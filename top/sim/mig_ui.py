@@ -0,0 +1,181 @@
+import random
+from collections import deque
+import cocotb
+from cocotb.triggers import First, FallingEdge, ReadOnly, RisingEdge
+from cocotb.utils import get_sim_time
+
+# Cocotb stand-in for the ddr3_mig IP's user interface, over a sparse Python memory, so the
+# traffic_generator side of the frame buffer can be simulated without the DDR3 model. It
+# implements the handshakes traffic_generator relies on:
+#
+#   a command is taken on a cycle with app_en and app_rdy, write data with app_wdf_wren and
+#   app_wdf_rdy (traffic_generator always gives both together), and read data comes back in
+#   order on app_rd_data_valid, read_latency cycles after its command, with no backpressure
+#
+# plus the stalls that make a real MIG slower than one command per cycle: app_rdy and
+# app_wdf_rdy drop for refresh_cycles every refresh_interval, app_rdy drops while
+# max_pending_reads reads are in flight, and both drop at random with stall_probability.
+#
+# Inputs are driven on the falling edge and the DUT's requests read in the ReadOnly phase
+# after it, which is what the next rising edge samples. While nothing is in flight and the
+# traffic generator has nothing to ask for, it sleeps until app_en or write_axis_valid rises.
+
+UI_CLOCK_FREQ = 81_250_000 # ddr3_mig's ui_clk, 4:1 to the 325 MHz DDR3 clock
+CMD_WRITE = 0
+CMD_READ = 1
+READ_LATENCY = 24
+REFRESH_INTERVAL = 634 # tREFI, 7.8 us
+REFRESH_CYCLES = 24
+MAX_PENDING_READS = 32
+CALIB_CYCLES = 64
+BYTES_PER_BEAT = 16
+
+class MigStandIn:
+    """MIG UI on dut's app_* ports, clocked by clk with the given period in ps.
+
+    memory maps app_addr to (data, tag): tag is whatever tag_writes returns for the write,
+    the write's index by default. Every accepted write and read is logged as
+    (cycle, app_addr, data, tag) in writes/reads, and stall cycles are counted in stats."""
+
+    def __init__(self, dut, clk, period_ps, read_latency=READ_LATENCY, refresh_interval=REFRESH_INTERVAL,
+                 refresh_cycles=REFRESH_CYCLES, max_pending_reads=MAX_PENDING_READS, stall_probability=0.0,
+                 unwritten=0, seed=None):
+        self.dut = dut
+        self.clk = clk
+        self.period_ps = period_ps
+        self.read_latency = read_latency
+        self.refresh_interval = refresh_interval
+        self.refresh_cycles = refresh_cycles
+        self.max_pending_reads = max_pending_reads
+        self.stall_probability = stall_probability
+        self.unwritten = unwritten # read back from addresses never written
+        self.rng = random.Random(seed)
+        self.memory = {}
+        self.tag_writes = lambda index, addr, data: index
+        self.writes = []
+        self.reads = []
+        self.pending = deque() # (cycle the data is due, data, tag)
+        self.stats = {
+            "random_stall_cycles": 0, # counted while awake, it sleeps through idle stretches
+            "read_queue_full_cycles": 0, # app_rdy low because max_pending_reads were in flight
+            "write_wait_cycles": 0, # write data waiting: write_axis_valid without write_axis_ready
+            "write_refresh_wait_cycles": 0, # of those, while the MIG was stalled
+            "read_request_stall_cycles": 0, # read app_en held off by app_rdy
+            "dropped_reads": 0, # read data the read FIFO was not ready for
+            "unwritten_reads": 0,
+        }
+
+    def cycle(self):
+        """Cycles since time 0; exact at falling edges for an even period_ps."""
+        return int(get_sim_time("ps") // self.period_ps)
+
+    def refreshing(self, cycle):
+        return self.refresh_interval and cycle % self.refresh_interval < self.refresh_cycles
+
+    async def reset(self, cycles=16):
+        """Hold ui_clk_sync_rst, then calibrate for CALIB_CYCLES like the IP does after power up."""
+        dut = self.dut
+        dut.ui_clk_sync_rst.value = 1
+        dut.init_calib_complete.value = 0
+        dut.app_rdy.value = 0
+        dut.app_wdf_rdy.value = 0
+        dut.app_rd_data_valid.value = 0
+        dut.app_rd_data_end.value = 0
+        dut.app_rd_data.value = 0
+        for _ in range(cycles):
+            await FallingEdge(self.clk)
+        dut.ui_clk_sync_rst.value = 0
+        for _ in range(CALIB_CYCLES):
+            await FallingEdge(self.clk)
+        dut.init_calib_complete.value = 1
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        self._task.kill()
+
+    async def _run(self):
+        dut = self.dut
+        clk_edge = FallingEdge(self.clk)
+        app_rdy, app_wdf_rdy = dut.app_rdy, dut.app_wdf_rdy
+        rd_valid, rd_end, rd_data = dut.app_rd_data_valid, dut.app_rd_data_end, dut.app_rd_data
+        app_en, app_cmd, app_addr = dut.app_en, dut.app_cmd, dut.app_addr
+        wdf_wren, wdf_data = dut.app_wdf_wren, dut.app_wdf_data
+        write_valid, write_ready, read_ready = dut.write_axis_valid, dut.write_axis_ready, dut.read_axis_ready
+        stats = self.stats
+        while True:
+            await clk_edge
+            cycle = self.cycle()
+            refresh = self.refreshing(cycle)
+            stalled = refresh or (self.stall_probability and self.rng.random() < self.stall_probability)
+            queue_full = len(self.pending) >= self.max_pending_reads
+            ready = not stalled and not queue_full
+            app_rdy.value = ready
+            app_wdf_rdy.value = not stalled
+            stats["random_stall_cycles"] += bool(stalled and not refresh)
+            stats["read_queue_full_cycles"] += bool(queue_full and not stalled)
+
+            returning = bool(self.pending) and self.pending[0][0] <= cycle
+            if returning:
+                _, data, _ = self.pending.popleft()
+                rd_data.value = data
+            rd_valid.value = returning
+            rd_end.value = returning
+
+            await ReadOnly()
+            # what the coming rising edge will sample
+            if returning and not read_ready.value.integer:
+                stats["dropped_reads"] += 1
+            requesting = app_en.value.integer
+            writing = write_valid.value.integer
+            waiting = writing and not write_ready.value.integer
+            stats["write_wait_cycles"] += bool(waiting)
+            stats["write_refresh_wait_cycles"] += bool(waiting and stalled)
+            if requesting:
+                cmd = app_cmd.value.integer
+                addr = app_addr.value.integer
+                if cmd == CMD_READ and not ready:
+                    stats["read_request_stall_cycles"] += 1
+                elif cmd == CMD_WRITE and ready:
+                    assert wdf_wren.value.integer, f"cycle {cycle}: write command to {addr:#x} without app_wdf_wren"
+                    data = wdf_data.value.integer
+                    tag = self.tag_writes(len(self.writes), addr, data)
+                    self.memory[addr] = (data, tag)
+                    self.writes.append((cycle, addr, data, tag))
+                elif cmd == CMD_READ:
+                    data, tag = self.memory.get(addr, (self.unwritten, None))
+                    stats["unwritten_reads"] += tag is None
+                    self.reads.append((cycle, addr, data, tag))
+                    # the rising edge after this one is cycle + 1
+                    self.pending.append((cycle + 1 + self.read_latency, data, tag))
+            elif wdf_wren.value.integer:
+                raise AssertionError(f"cycle {cycle}: app_wdf_wren without a write command")
+
+            if ready and not (returning or self.pending or requesting or writing):
+                await First(RisingEdge(app_en), RisingEdge(write_valid))
+
+    def bandwidth(self, log, clock_freq=UI_CLOCK_FREQ):
+        """Log and return bytes/s over the span of the writes and of the reads, and how busy
+        the UI was over the whole run."""
+        report = {}
+        for name, beats in (("write", self.writes), ("read", self.reads)):
+            if len(beats) < 2:
+                continue
+            span = beats[-1][0] - beats[0][0] + 1
+            report[name] = {
+                "beats": len(beats),
+                "cycles": span,
+                "beats_per_cycle": len(beats) / span,
+                "bytes_per_second": len(beats) * BYTES_PER_BEAT * clock_freq / span,
+            }
+            log.info(f"MIG {name}s: {len(beats)} beats over {span} UI cycles, {len(beats) / span:.3f} per cycle, "
+                     f"{report[name]['bytes_per_second'] / 1e6:.1f} MB/s")
+        run_cycles = self.cycle()
+        report["utilization"] = (len(self.writes) + len(self.reads)) / max(run_cycles, 1)
+        refresh = self.refresh_cycles / self.refresh_interval if self.refresh_interval else 0
+        report["stats"] = dict(self.stats, refresh_cycles=int(run_cycles * refresh))
+        log.info(f"MIG UI busy {100 * report['utilization']:.1f}% of {run_cycles} cycles; "
+                 + ", ".join(f"{name} {value}" for name, value in report["stats"].items()))
+        return report
@@ -0,0 +1,124 @@
+import numpy as np
+from kmeans_model import NUM_CENTROIDS, frame_points, initial_centroids, kmeans_step
+
+# Bit-accurate model of top_level.sv's detection chain, one function per stage so each can
+# be checked against its own RTL:
+#
+#   RGB565 frame buffer -> fb_red/green/blue -> rgb_to_ycrcb -> Cr/Cb threshold -> is_player
+#   -> moving_frame_k_means -> UART to the MAIN board -> parallax_over -> player_depths
+#
+# The colour stages are a pure function of the 16-bit pixel, so they are folded into a 64K
+# entry table once and a frame costs one lookup. emulate() runs the whole chain over frame
+# sequences from both cameras.
+
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 720
+
+RGB_TO_YCRCB_LATENCY = 3
+THRESHOLD_LATENCY = 1
+# fb_red/green/blue register + rgb_to_ycrcb + threshold: is_player at hcount x is the colour
+# test of the frame buffer pixel read at x - PIXEL_LAG, while the game window uses x itself
+PIXEL_LAG = 1 + RGB_TO_YCRCB_LATENCY + THRESHOLD_LATENCY
+
+# top_level's thresholds: green screen when both Cr and Cb are in (lower, upper]
+CR_BOUNDS = (0x00, 0x90)
+CB_BOUNDS = (0x00, 0x90)
+# pixels outside this window are never players
+GAME_WINDOW_X = (65, 1279 - 85)
+GAME_WINDOW_Y = (0, 719 - 85)
+
+# parallax_over as instantiated in top_level: integer parameters, so 1280 / 1 * 1 * 1
+PARALLAX_SCALE = 1280
+ZERO_DISPARITY_DEPTH = 0xFF
+# the SECONDARY board starts sending its centroids when they are tabulated, which is also when
+# MAIN samples the receivers, so MAIN pairs its centroids with the secondary's from a frame earlier
+LINK_DELAY_FRAMES = 1
+
+def rgb565_channels(pixels):
+    """top_level's fb_red, fb_green, fb_blue: each field shifted up to 8 bits, zero filled."""
+    pixels = np.asarray(pixels, dtype=np.int64)
+    return (pixels >> 11 & 0x1F) << 3, (pixels >> 5 & 0x3F) << 2, (pixels & 0x1F) << 3
+
+def rgb888_channels(pixels):
+    """0xRRGGBB pixels as 8-bit channels, which rgb_to_ycrcb zero extends like fb_red/green/blue."""
+    pixels = np.asarray(pixels, dtype=np.int64)
+    return pixels >> 16 & 0xFF, pixels >> 8 & 0xFF, pixels & 0xFF
+
+def rgb_to_ycrcb(r, g, b):
+    """rgb_to_ycrcb's y_out, cr_out, cb_out for 10-bit inputs, RGB_TO_YCRCB_LATENCY cycles
+    after they are sampled. Cr and Cb wrap through 22 bits and keep bits [19:10], so
+    negative values come out as two's complement."""
+    r, g, b = (np.asarray(c, dtype=np.int64) for c in (r, g, b))
+    y1 = 0x132 * r + 0x259 * g + 0x074 * b
+    cr1 = (r << 9) - 0x1AD * g - 0x053 * b
+    cb1 = (b << 9) - 0x0AD * r - 0x153 * g
+    return (y1 >> 10) & 0x3FF, (cr1 >> 10) & 0x3FF, (cb1 >> 10) & 0x3FF
+
+def chroma_bytes(y_full, cr_full, cb_full):
+    """top_level's y, cr, cb: the low byte, with the sign bit of Cr and Cb flipped so
+    [-128, 128) maps to [0, 256)."""
+    return y_full & 0xFF, (cr_full & 0xFF) ^ 0x80, (cb_full & 0xFF) ^ 0x80
+
+def threshold(pixel, lower, upper):
+    """threshold's mask_out, THRESHOLD_LATENCY cycles after pixel_in: lower exclusive, upper inclusive."""
+    pixel = np.asarray(pixel)
+    return (pixel > lower) & (pixel <= upper)
+
+def green_screen_table(cr_bounds=CR_BOUNDS, cb_bounds=CB_BOUNDS):
+    """is_green_screen for every RGB565 value, indexed by the pixel."""
+    _, cr, cb = chroma_bytes(*rgb_to_ycrcb(*rgb565_channels(np.arange(1 << 16))))
+    return threshold(cr, *cr_bounds) & threshold(cb, *cb_bounds)
+
+def player_mask(frame, not_green_table):
+    """is_player & active_draw_hdmi for a (height, width) RGB565 frame, from the inverse of
+    green_screen_table. Only the game window can hold players, and there the colour test
+    trails hcount by PIXEL_LAG; the pixels it would take from the blanking are all left of it."""
+    assert GAME_WINDOW_X[0] >= PIXEL_LAG
+    height, width = frame.shape
+    x0, x1 = GAME_WINDOW_X[0], min(GAME_WINDOW_X[1] + 1, width)
+    y0, y1 = GAME_WINDOW_Y[0], min(GAME_WINDOW_Y[1] + 1, height)
+    mask = np.zeros((height, width), dtype=bool)
+    if x1 > x0:
+        mask[y0:y1, x0:x1] = not_green_table.take(frame[y0:y1, x0 - PIXEL_LAG:x1 - PIXEL_LAG])
+    return mask
+
+def parallax_depth(x_1, x_2, scale=PARALLAX_SCALE):
+    """parallax's depth_out: scale // disparity in the low 8 bits, 0xFF for no disparity."""
+    disparity = np.abs(np.asarray(x_1, dtype=np.int64) - np.asarray(x_2, dtype=np.int64))
+    return np.where(disparity == 0, ZERO_DISPARITY_DEPTH, round(scale) // np.maximum(disparity, 1) & 0xFF)
+
+def match_depths(centroids_1, centroids_2, num_players, scale=PARALLAX_SCALE):
+    """parallax_over's depth_out: each of this camera's centroids against the closest (Manhattan,
+    lowest index on ties) of the other camera's first num_players + 1 centroids."""
+    c1 = np.asarray(centroids_1, dtype=np.int64)
+    c2 = np.asarray(centroids_2, dtype=np.int64)[:num_players + 1]
+    dist = np.abs(c1[:, None, 0] - c2[None, :, 0]) + np.abs(c1[:, None, 1] - c2[None, :, 1])
+    return parallax_depth(c1[:, 0], c2[np.argmin(dist, axis=1), 0], scale)
+
+def emulate(frames, num_players, secondary_frames=None, cr_bounds=CR_BOUNDS, cb_bounds=CB_BOUNDS,
+            scale=PARALLAX_SCALE, link_delay=LINK_DELAY_FRAMES):
+    """Run MAIN's camera (and optionally SECONDARY's) through the chain, yielding a dict per
+    frame with the player mask, the (NUM_CENTROIDS, 2) centroids k-means outputs at the end of
+    the frame, and with a secondary camera its centroids and MAIN's player_depths.
+    y is zeroed before parallax_over, as in top_level."""
+    not_green_table = ~green_screen_table(cr_bounds, cb_bounds)
+    centroids = initial_centroids()
+    secondary_centroids = initial_centroids()
+    # what the UART receivers hold, oldest first: reset to 0 until the first words arrive
+    link = [initial_centroids() for _ in range(link_delay)]
+    secondary_frames = iter(secondary_frames) if secondary_frames is not None else None
+    for frame in frames:
+        mask = player_mask(np.asarray(frame), not_green_table)
+        centroids = kmeans_step(*frame_points(mask), centroids, num_players)
+        result = {"mask": mask, "centroids": centroids}
+
+        if secondary_frames is not None:
+            secondary_mask = player_mask(np.asarray(next(secondary_frames)), not_green_table)
+            secondary_centroids = kmeans_step(*frame_points(secondary_mask), secondary_centroids, num_players)
+            link.append(secondary_centroids)
+            received = link.pop(0)
+            zero_y = np.zeros(NUM_CENTROIDS, dtype=np.int64)
+            result["secondary_centroids"] = secondary_centroids
+            result["depths"] = match_depths(np.stack([centroids[:, 0], zero_y], axis=1),
+                                            np.stack([received[:, 0], zero_y], axis=1), num_players, scale)
+        yield result
@@ -0,0 +1,127 @@
+import numpy as np
+
+# Frame level model of the SECONDARY -> MAIN centroid link in top_level.sv. SECONDARY
+# triggers its uart_transmit lanes on com_valid_out, once per frame, and MAIN's
+# parallax_over samples what its uart_receive lanes hold on its own com_valid_out. The two
+# boards run the same 720p raster from separate clocks, so the phase between their frames
+# is arbitrary and every figure is taken over a sweep of it.
+#
+# word_timing gives the cycle counts of one word through uart_transmit/uart_receive, as
+# test_uart_sim_test.py's test_word_timing measures them on the RTL; everything else
+# follows from those, the frame period and the packing of the 8 coordinates onto lanes.
+#
+#   stats = link_stats(bit_period(115200), PACKINGS["separate"], coord_bits=11)
+
+PIXEL_CLOCK_FREQ = 74_250_000 # clk_pixel, which also clocks the UARTs
+UART_CLOCK_FREQ = 100_000_000 # INPUT_CLOCK_FREQ the UARTs are built with, left at its default in top_level
+FRAME_CYCLES = 1650 * 750
+NUM_PLAYERS = 4
+X_BITS = 11 # top_level sends y in words of the same width
+NUM_PHASES = 64
+NUM_FRAMES = 48
+
+class Packing:
+    """How the 4 players' x and y get onto the wires: lanes in parallel, each sending
+    words_per_lane words back to back, with coords_per_word coordinates packed per word."""
+
+    def __init__(self, name, lanes, coords_per_word, description):
+        self.name = name
+        self.lanes = lanes
+        self.coords_per_word = coords_per_word
+        self.description = description
+
+    @property
+    def words_per_lane(self):
+        return 2 * NUM_PLAYERS // (self.lanes * self.coords_per_word)
+
+    def data_width(self, coord_bits):
+        return self.coords_per_word * coord_bits
+
+PACKINGS = {p.name: p for p in [
+    Packing("separate", 8, 1, "x and y on their own lane, what top_level does"),
+    Packing("packed_xy", 4, 2, "x and y of a player in one word on 4 lanes"),
+    Packing("serial", 1, 1, "all 8 coordinates one after the other on one lane"),
+    Packing("serial_packed", 1, 2, "4 words of packed x and y on one lane"),
+]}
+
+def bit_period(baud_rate, clock_freq=UART_CLOCK_FREQ):
+    """BAUD_BIT_PERIOD for a BAUD_RATE parameter."""
+    return clock_freq // baud_rate
+
+def line_baud_rate(period, clock_freq=PIXEL_CLOCK_FREQ):
+    """Bits per second actually on the wire for a bit period in clk_pixel cycles."""
+    return clock_freq / period
+
+def word_timing(period, data_width):
+    """Cycles from the clock edge that samples trigger_in, for a transmitter and receiver
+    with the same BAUD_BIT_PERIOD:
+
+    busy          the transmitter takes its next trigger this many edges later
+    new_data      uart_receive's new_data_out goes high
+    first_sample  data_byte_out shifts in its first bit
+    last_sample   and its last, so a read in between sees a mix of two words
+    """
+    first_sample = period + period // 2 + 2 # the start bit is a cycle long, then half a bit in
+    return {
+        "busy": (data_width + 2) * period + 2,
+        "new_data": (data_width + 2) * period + 2,
+        "first_sample": first_sample,
+        "last_sample": first_sample + (data_width - 1) * period,
+    }
+
+def link_timeline(period, packing, coord_bits, phase, num_frames=NUM_FRAMES, frame_cycles=FRAME_CYCLES):
+    """Follow one lane (all lanes of a packing are identical) over num_frames triggers.
+
+    SECONDARY's trigger for frame k is at k * frame_cycles and is dropped if the lane is still
+    busy. MAIN samples at k * frame_cycles + phase. Returns per sample (age, torn): the age in
+    frames of the oldest coordinate in the stored registers (inf before the first arrives), and
+    whether the live data_byte_out that parallax_over reads was mid-word.
+    """
+    timing = word_timing(period, packing.data_width(coord_bits))
+    words = packing.words_per_lane
+    free_at = 0
+    sends = [] # (trigger time, word index, word start)
+    for k in range(num_frames):
+        trigger = k * frame_cycles
+        if trigger < free_at:
+            continue
+        for w in range(words):
+            sends.append((trigger, w, trigger + w * timing["busy"]))
+        free_at = trigger + words * timing["busy"]
+
+    triggers, word_idx, starts = (np.array(v) for v in zip(*sends))
+    samples = []
+    for k in range(num_frames):
+        t = k * frame_cycles + phase
+        arrived = starts + timing["new_data"] <= t
+        torn = bool(((starts + timing["first_sample"] <= t) & (t <= starts + timing["last_sample"])).any())
+        # sends are in time order, so the last arrival of each word is what its register holds
+        stored = [triggers[arrived & (word_idx == w)] for w in range(words)]
+        age = max((t - held[-1]) / frame_cycles if len(held) else np.inf for held in stored)
+        samples.append((age, torn))
+    return samples
+
+def link_stats(period, packing, coord_bits=X_BITS, num_phases=NUM_PHASES, num_frames=NUM_FRAMES,
+               frame_cycles=FRAME_CYCLES):
+    """Figures for one link configuration over num_phases evenly spread frame phases, taken
+    once the link has settled (after the first half of num_frames)."""
+    timing = word_timing(period, packing.data_width(coord_bits))
+    set_cycles = packing.words_per_lane * timing["busy"]
+    ages, torn = [], []
+    for phase in np.linspace(0, frame_cycles, num_phases, endpoint=False).astype(int):
+        samples = link_timeline(period, packing, coord_bits, phase, num_frames, frame_cycles)[num_frames // 2:]
+        ages += [age for age, _ in samples]
+        torn += [t for _, t in samples]
+    ages = np.array(ages)
+    return {
+        "bit_period": period,
+        "line_baud": line_baud_rate(period),
+        "data_width": packing.data_width(coord_bits),
+        "set_frames": set_cycles / frame_cycles, # a whole set of coordinates on the wire
+        "keeps_up": set_cycles <= frame_cycles,
+        "latency_frames": (set_cycles - timing["busy"] + timing["new_data"]) / frame_cycles,
+        "age_min": float(ages.min()),
+        "age_mean": float(ages.mean()),
+        "age_max": float(ages.max()),
+        "torn": float(np.mean(torn)),
+    }
@@ -0,0 +1,172 @@
+import numpy as np
+
+# Frame granular model of game_logic_controller.sv for tuning the game without simulating
+# every pixel. Everything the controller decides only changes at frame boundaries: the wall
+# ticks, depth, round and wall index all update in the blanking after new_frame, and the
+# collision count only matters at the end of each frame. So a game reduces to a schedule of
+# frames plus one collision count per frame, and only frames where the wall is inside the
+# goal window need a count at all.
+#
+#   model = GameLogicModel(walls, collision_threshold=256, max_rounds=3)
+#   game_state, end_frame = model.play(masks, num_players)
+#
+# For many games, tabulate the collisions of a library of player masks against every wall
+# once and play games as sequences of mask indices:
+#
+#   table = model.collision_table(masks)                    # (num_masks, num_walls)
+#   walls = model.frame_schedule(num_players)[1]
+#   game_state, end_frame = model.play_batch(table[poses, walls[:poses.shape[1]]])
+
+LOSE = 0
+PLAYING = 1 # also the state after reset, before the first game
+WIN = 2
+
+# first wall of a game for each value of num_players
+START_WALL = {0: 0, 1: 3, 2: 6, 3: 7}
+
+PLAY_CHUNK_FRAMES = 16
+
+def clog2(n):
+    return max(int(n) - 1, 0).bit_length()
+
+class GameLogicModel:
+    """Parameters are the RTL's, plus the total width and height of the raster including
+    blanking (video_sig_gen's 720p timing by default). walls is a (num_walls, height, width)
+    array of 0/1 in the wall_codec layout, i.e. what the BRAM holds for curr_wall_idx."""
+
+    def __init__(self, walls, screen_width=1280, screen_height=720, goal_depth=60, goal_depth_delta=10,
+                 max_wall_depth=None, max_frames_per_wall_tick=15, bit_mask_down_sample_factor=16,
+                 max_rounds=5, collision_threshold=65536, h_total=1650, v_total=750):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.goal_depth = goal_depth
+        self.goal_depth_delta = goal_depth_delta
+        self.max_wall_depth = goal_depth + goal_depth_delta + 5 if max_wall_depth is None else max_wall_depth
+        self.max_rounds = max_rounds
+        self.collision_threshold = collision_threshold
+        self.h_total = h_total
+        self.v_total = v_total
+        self.bit_mask_width = screen_width // bit_mask_down_sample_factor
+        self.bit_mask_height = screen_height // bit_mask_down_sample_factor
+        self.bit_mask_size = self.bit_mask_width * self.bit_mask_height
+        self.down_sample_bits = clog2(bit_mask_down_sample_factor)
+
+        # the wall moves every wall_tick_frequency frames, set to MAX - 4 on start
+        freq_bits = max(clog2(max_frames_per_wall_tick), 1)
+        self.wall_tick_frequency = (max_frames_per_wall_tick - 4) & ((1 << freq_bits) - 1)
+        assert self.wall_tick_frequency > 0, "a wall tick frequency of 0 never moves the wall"
+        self.wall_idx_bits = max(clog2(len(walls)), 1)
+        self.num_walls = len(walls)
+
+        # walls as they are indexed in hardware: LSB index i is bit i of bit_mask_wall
+        walls = np.asarray(walls, dtype=np.uint8).reshape(len(walls), -1)
+        assert walls.shape[1] == self.bit_mask_size, "walls do not match the bit mask size"
+        self.wall_bits = walls[:, ::-1].astype(np.int64)
+        self.pixel_cells = self._pixel_cells()
+
+    @property
+    def round_frames(self):
+        return self.max_wall_depth * self.wall_tick_frequency
+
+    @property
+    def game_frames(self):
+        """Frames in a game that is won."""
+        return self.max_rounds * self.round_frames
+
+    def _pixel_cells(self):
+        """Bit of bit_mask_wall each active pixel is checked against, flattened in raster order.
+
+        bitmask_x/y are registered, so a pixel is checked against the wall cell of the pixel
+        before it: the one to its left, or for the first pixel of a line the last blanking
+        pixel of the line above. That index wraps through the register widths, and the ones
+        that land outside the bit mask (X in simulation) are marked bit_mask_size, as is the
+        last pixel of the frame, whose collision is dropped because new_frame clears the count.
+        """
+        w, h = self.screen_width, self.screen_height
+        ys, xs = np.mgrid[0:h, 0:w]
+        prev_x = np.where(xs > 0, xs - 1, self.h_total - 1)
+        prev_y = np.where(xs > 0, ys, np.where(ys > 0, ys - 1, self.v_total - 1))
+        s = self.down_sample_bits
+        x_bits = clog2(self.bit_mask_width) + 1
+        y_bits = clog2(self.bit_mask_height) * 2 + 1
+        bitmask_x = (self.bit_mask_width - 1 - ((prev_x & 0x7FF) >> s)) & ((1 << x_bits) - 1)
+        bitmask_y = ((self.bit_mask_height - 1 - ((prev_y & 0x3FF) >> s)) * self.bit_mask_width) & ((1 << y_bits) - 1)
+        cells = (bitmask_x + bitmask_y) & ((1 << max(x_bits, y_bits)) - 1)
+        cells[cells >= self.bit_mask_size] = self.bit_mask_size
+        cells[h - 1, w - 1] = self.bit_mask_size
+        return cells.ravel()
+
+    def cell_histograms(self, masks):
+        """(num_masks, bit_mask_size) player pixels checked against each wall bit, from
+        (num_masks, screen_height, screen_width) is_person_in masks."""
+        masks = np.asarray(masks, dtype=bool).reshape(-1, self.screen_width * self.screen_height)
+        mask_idx, pixel = np.nonzero(masks)
+        bins = mask_idx * (self.bit_mask_size + 1) + self.pixel_cells[pixel]
+        hist = np.bincount(bins, minlength=len(masks) * (self.bit_mask_size + 1))
+        return hist.reshape(len(masks), -1)[:, :self.bit_mask_size]
+
+    def collision_table(self, masks):
+        """(num_masks, num_walls) collisions each mask counts in one frame against each wall."""
+        return self.cell_histograms(masks) @ self.wall_bits.T
+
+    def wall_sequence(self, num_players):
+        """curr_wall_idx for every round, plus the one it holds after the last."""
+        mask = (1 << self.wall_idx_bits) - 1
+        idx = START_WALL[num_players] & mask
+        sequence = [idx]
+        for _ in range(self.max_rounds):
+            idx = 0 if idx == self.num_walls - 1 else (idx + 1) & mask
+            sequence.append(idx)
+        return sequence
+
+    def frame_schedule(self, num_players):
+        """(wall_depth, curr_wall_idx, checked) for frames 1..game_frames, index 0 being frame 1.
+        checked frames have the wall inside the goal window, where collisions lose the game."""
+        frame = np.arange(self.game_frames)
+        depth = (frame % self.round_frames) // self.wall_tick_frequency
+        walls = np.array(self.wall_sequence(num_players))[frame // self.round_frames]
+        checked = (depth >= self.goal_depth - self.goal_depth_delta) & (depth <= self.goal_depth + self.goal_depth_delta)
+        return depth, walls, checked
+
+    def play_batch(self, counts):
+        """Play many games from their collision counts, (num_games, num_frames) with frame 1
+        first and each frame counted against that frame's wall (frames past the end count 0).
+        Returns (game_state, end_frame) arrays: the frame a game was lost on, or game_frames."""
+        counts = np.atleast_2d(counts)[:, :self.game_frames]
+        checked = self.frame_schedule(0)[2][:counts.shape[1]]
+        lost = (counts >= self.collision_threshold) & checked
+        any_lost = lost.any(axis=1)
+        end_frame = np.where(any_lost, lost.argmax(axis=1) + 1, self.game_frames)
+        return np.where(any_lost, LOSE, WIN), end_frame
+
+    def play(self, masks, num_players):
+        """Play one game with masks[k] as the player in frame k + 1, frames past the end of
+        masks being empty. Only frames inside the goal window are counted. Returns
+        (game_state, end_frame) like play_batch."""
+        masks = np.asarray(masks, dtype=bool)
+        _, walls, checked = self.frame_schedule(num_players)
+        frames = np.nonzero(checked[:len(masks)])[0]
+        # a few frames at a time, so a game lost early stops early
+        for start in range(0, len(frames), PLAY_CHUNK_FRAMES):
+            chunk = frames[start:start + PLAY_CHUNK_FRAMES]
+            hist = self.cell_histograms(masks[chunk])
+            counts = (hist * self.wall_bits[walls[chunk]]).sum(axis=1)
+            lost = np.nonzero(counts >= self.collision_threshold)[0]
+            if len(lost):
+                return LOSE, int(chunk[lost[0]]) + 1
+        return WIN, self.game_frames
+
+    def trace(self, game_state, end_frame, num_players):
+        """What the controller shows in the blanking after each frame 1..end_frame of a game
+        that ended in game_state: (game_state, wall_depth_out, curr_round, curr_wall_idx)."""
+        sequence = self.wall_sequence(num_players)
+        rows = []
+        for k in range(1, end_frame + 1):
+            if k < end_frame:
+                rows.append((PLAYING, (k % self.round_frames) // self.wall_tick_frequency, k // self.round_frames,
+                             sequence[k // self.round_frames]))
+            elif game_state == WIN:
+                rows.append((WIN, 0, self.max_rounds, sequence[self.max_rounds]))
+            else:
+                rows.append((LOSE, 0, (k - 1) // self.round_frames, sequence[(k - 1) // self.round_frames]))
+        return rows
@@ -0,0 +1,57 @@
+import numpy as np
+
+# Golden model for moving_frame_k_means.sv.
+# Works on whole frames at once instead of one pixel at a time so the
+# reference cost is negligible next to the simulation itself.
+
+NUM_CENTROIDS = 4 # the RTL always has 4 center_of_mass units
+X_BITS = 11 # x_in / x_out width
+Y_BITS = 10 # y_in / y_out width
+SUM_BITS = 32 # center_of_mass accumulator width
+
+def frame_points(valid, stride=1):
+    """Turn a (rows, cols) valid mask sampled every `stride` pixels into the x and y
+    coordinates of the valid points, in the raster order they are fed to the DUT."""
+    # flatnonzero + divmod is several times faster than nonzero on a 2D mask
+    ys, xs = np.divmod(np.flatnonzero(valid), valid.shape[1])
+    return xs * stride, ys * stride
+
+def assign_clusters(xs, ys, centroids, num_players):
+    """Closest centroid for every point.
+
+    Matches the RTL: Manhattan distance, only the first num_players+1 centroids
+    are candidates, and a strict < comparison so the lowest index wins ties
+    (np.argmin returns the first minimum).
+    """
+    k = num_players + 1
+    cx = centroids[:k, 0]
+    cy = centroids[:k, 1]
+    dist = np.abs(xs[:, None] - cx[None, :]) + np.abs(ys[:, None] - cy[None, :])
+    return np.argmin(dist, axis=1)
+
+def cluster_sums(xs, ys, centroids, num_players):
+    """Per-centroid (pixel count, sum of x, sum of y) accumulated by the center_of_mass units
+    over one frame, wrapped to the accumulator width like the RTL."""
+    labels = assign_clusters(xs, ys, np.asarray(centroids, dtype=np.int64), num_players)
+    totals = np.bincount(labels, minlength=NUM_CENTROIDS)
+    sum_x = np.bincount(labels, weights=xs, minlength=NUM_CENTROIDS).astype(np.int64)
+    sum_y = np.bincount(labels, weights=ys, minlength=NUM_CENTROIDS).astype(np.int64)
+    mask = (1 << SUM_BITS) - 1
+    return totals & mask, sum_x & mask, sum_y & mask
+
+def kmeans_step(xs, ys, centroids, num_players):
+    """One tabulate of the DUT: returns the (NUM_CENTROIDS, 2) centroids it will output.
+
+    Each cluster's new centroid is the floor of its mean. An empty cluster divides 0 by 0,
+    which the divider reports as a quotient of 0, so its centroid resets to (0, 0).
+    """
+    totals, sum_x, sum_y = cluster_sums(xs, ys, centroids, num_players)
+    new_centroids = np.zeros((NUM_CENTROIDS, 2), dtype=np.int64)
+    has_points = totals > 0
+    new_centroids[has_points, 0] = (sum_x[has_points] // totals[has_points]) & ((1 << X_BITS) - 1)
+    new_centroids[has_points, 1] = (sum_y[has_points] // totals[has_points]) & ((1 << Y_BITS) - 1)
+    return new_centroids
+
+def initial_centroids():
+    """Centroids right after reset."""
+    return np.zeros((NUM_CENTROIDS, 2), dtype=np.int64)
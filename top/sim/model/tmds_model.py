@@ -0,0 +1,198 @@
+import numpy as np
+
+# Reference TMDS encoder and decoder for tmds_encoder.sv (and the OSERDESE2 bit order of
+# tmds_serializer.sv). The encoder's running disparity is a 5-bit register, so every
+# (disparity, data) pair is tabulated once from the RTL's own logic, and a stream is
+# encoded a column at a time across all lines of the raster at once: every line starts
+# after blanking, which resets the disparity. decode_frame goes the other way for the
+# three channels of a whole 1650x750 raster and checks everything a monitor relies on.
+#
+#   symbols = encode_frame(frame, timing)                   # (3, total_lines, total_pixels)
+#   frame = decode_frame(symbols, timing)                   # 0xRRGGBB, asserts on bad symbols
+#   bits = serialize(symbols[BLUE])                         # tmds_serializer's bit stream
+#   symbols = deserialize(bits, symbol_alignment(bits))     # back to symbols, from any bit offset
+
+SYMBOL_BITS = 10
+ENCODER_LATENCY = 1 # tmds_out is registered
+COUNT_BITS = 5 # tmds_encoder's prev_count
+
+# control_in -> tmds_out outside the active area
+CONTROL_SYMBOLS = np.array([0b1101010100, 0b0010101011, 0b0101010100, 0b1010101011])
+
+# tmds_10b index of each channel; only blue carries {vsync, hsync}
+BLUE, GREEN, RED = 0, 1, 2
+CHANNEL_SHIFTS = {BLUE: 0, GREEN: 8, RED: 16} # position in a 0xRRGGBB pixel
+
+def popcount(values, bits):
+    values = np.asarray(values, dtype=np.int64)
+    return sum((values >> i) & 1 for i in range(bits))
+
+def tm_choice(data):
+    """tm_choice's qm_out: the XOR (or XNOR, bit 8 clear) transition minimised code of data."""
+    data = np.asarray(data, dtype=np.int64)
+    ones = popcount(data, 8)
+    xnor = (ones > 4) | ((ones == 4) & ((data & 1) == 0))
+    qm = data & 1
+    for i in range(1, 8):
+        bit = ((data >> i) ^ (qm >> (i - 1))) & 1
+        qm = qm | ((bit ^ xnor) << i)
+    return qm | ((~xnor & 1) << 8)
+
+TM_CHOICE = tm_choice(np.arange(256))
+
+def encoder_step(count, data):
+    """One active cycle of tmds_encoder, exactly as the RTL computes it: (tmds_out, next
+    prev_count) for a prev_count (as its unsigned 5-bit value) and 8-bit data."""
+    qm = int(TM_CHOICE[data])
+    qm8, qm_low = qm >> 8, qm & 0xFF
+    n1 = bin(qm_low).count("1")
+    n0 = 8 - n1
+    negative = count >> (COUNT_BITS - 1)
+    if count == 0 or n0 == n1:
+        symbol = ((1 - qm8) << 9) | (qm8 << 8) | (qm_low if qm8 else ~qm_low & 0xFF)
+        count += n1 - n0 if qm8 else n0 - n1
+    elif (not negative and n1 > n0) or (negative and n1 < n0):
+        symbol = (1 << 9) | (qm8 << 8) | (~qm_low & 0xFF)
+        count += 2 * qm8 + n0 - n1
+    else:
+        symbol = (qm8 << 8) | qm_low
+        count += -2 * (1 - qm8) + n1 - n0
+    return symbol, count & ((1 << COUNT_BITS) - 1)
+
+def encoder_tables():
+    """(symbol, next_count) arrays indexed by prev_count * 256 + data."""
+    steps = [encoder_step(count, data) for count in range(1 << COUNT_BITS) for data in range(256)]
+    symbols, counts = zip(*steps)
+    return np.array(symbols), np.array(counts)
+
+ENCODE_SYMBOL, ENCODE_NEXT_COUNT = encoder_tables()
+
+def symbol_disparity(symbols):
+    """Ones minus zeros of each 10-bit symbol, which is what prev_count accumulates."""
+    return 2 * popcount(symbols, SYMBOL_BITS) - SYMBOL_BITS
+
+def decoder_tables():
+    """(data, is_data) for every 10-bit symbol: the 8 bits it decodes to, and whether the
+    encoder can produce it at all (its q_m must be tm_choice of that data)."""
+    symbols = np.arange(1 << SYMBOL_BITS)
+    qm8 = (symbols >> 8) & 1
+    qm_low = np.where(symbols >> 9, ~symbols, symbols) & 0xFF
+    # undo the XOR / XNOR chain: bit i is q_m[i] ^ q_m[i-1], inverted for XNOR
+    data = qm_low ^ ((qm_low << 1) & 0xFE) ^ (np.where(qm8, 0, 0xFE))
+    is_data = TM_CHOICE[data] == ((qm8 << 8) | qm_low)
+    is_data[CONTROL_SYMBOLS] = False
+    return data, is_data
+
+DECODE_DATA, IS_DATA_SYMBOL = decoder_tables()
+CONTROL_CODE = np.full(1 << SYMBOL_BITS, -1)
+CONTROL_CODE[CONTROL_SYMBOLS] = np.arange(len(CONTROL_SYMBOLS))
+
+def max_disparity():
+    """Largest |prev_count| the encoder can reach from 0, as a signed value."""
+    reached, frontier = {0}, {0}
+    while frontier:
+        frontier = {int(ENCODE_NEXT_COUNT[count * 256 + data]) for count in frontier for data in range(256)} - reached
+        reached |= frontier
+    signed = [count - (1 << COUNT_BITS) if count >> (COUNT_BITS - 1) else count for count in reached]
+    return max(abs(count) for count in signed)
+
+MAX_DISPARITY = max_disparity()
+
+def encode(data, control, ve):
+    """tmds_out for (lines, cycles) arrays of data_in, control_in and ve_in, output k being
+    the symbol for input k (ENCODER_LATENCY cycles later in the RTL). Every line must start
+    with prev_count at 0: the first line after reset, or any line after a control period."""
+    data, control, ve = (np.asarray(a, dtype=np.int64) for a in (data, control, ve))
+    assert not ve[:-1, -1].any(), "a line may only end in a control period, which resets the disparity"
+    symbols = np.empty(data.shape, dtype=np.int64)
+    count = np.zeros(data.shape[0], dtype=np.int64)
+    control_symbols = CONTROL_SYMBOLS[control]
+    for x in range(data.shape[1]):
+        active = ve[:, x].astype(bool)
+        idx = count * 256 + data[:, x]
+        symbols[:, x] = np.where(active, ENCODE_SYMBOL.take(idx), control_symbols[:, x])
+        count = np.where(active, ENCODE_NEXT_COUNT.take(idx), 0)
+    return symbols
+
+def raster_sync(timing):
+    """(active, hsync, vsync) for every cycle of the raster, as video_sig_gen outputs them.
+    timing is a video_source.VideoTiming or anything with its attributes."""
+    xs = np.arange(timing.total_pixels)[None, :]
+    ys = np.arange(timing.total_lines)[:, None]
+    h_sync_start = timing.active_h_pixels + timing.h_front_porch
+    v_sync_start = timing.active_lines + timing.v_front_porch
+    active = (xs < timing.active_h_pixels) & (ys < timing.active_lines)
+    hsync = np.broadcast_to((xs >= h_sync_start) & (xs < h_sync_start + timing.h_sync_width), active.shape)
+    vsync = np.broadcast_to((ys >= v_sync_start) & (ys < v_sync_start + timing.v_sync_width), active.shape)
+    return active, hsync, vsync
+
+def encode_frame(frame, timing):
+    """(3, total_lines, total_pixels) symbols the three encoders of top_level output for a
+    (active_lines, active_h_pixels) 0xRRGGBB frame, indexed like tmds_10b."""
+    active, hsync, vsync = raster_sync(timing)
+    frame = np.asarray(frame, dtype=np.int64)
+    symbols = []
+    for channel in (BLUE, GREEN, RED):
+        data = np.zeros(active.shape, dtype=np.int64)
+        data[:timing.active_lines, :timing.active_h_pixels] = (frame >> CHANNEL_SHIFTS[channel]) & 0xFF
+        control = (vsync << 1 | hsync) if channel == BLUE else np.zeros(active.shape, dtype=np.int64)
+        symbols.append(encode(data, control, active))
+    return np.stack(symbols)
+
+def first_bad(name, bad, got, expected=None):
+    """Assertion message for the first of the (line, cycle) positions in bad."""
+    ys, xs = np.nonzero(bad)
+    message = f"{name}: {len(ys)} symbols wrong, first at cycle {xs[0]} of line {ys[0]}: got {got[ys[0], xs[0]]:#05x}"
+    if expected is not None:
+        message += f", expected {expected[ys[0], xs[0]]:#05x}"
+    return message
+
+def decode_frame(symbols, timing):
+    """Recover the 0xRRGGBB frame from (3, total_lines, total_pixels) captured tmds_10b
+    symbols, symbol k of each line being the encoding of the pixel at hcount k. Asserts
+    that blanking only carries the right control symbols (blue: {vsync, hsync}), that the
+    active area only carries data symbols, that the running disparity stays within what
+    the encoder can reach, and that each symbol is the one the encoder picks for its data
+    at that disparity."""
+    symbols = np.asarray(symbols, dtype=np.int64)
+    active, hsync, vsync = raster_sync(timing)
+    assert symbols.shape == (3,) + active.shape, f"symbols are {symbols.shape}, expected {(3,) + active.shape}"
+    frame = np.zeros((timing.active_lines, timing.active_h_pixels), dtype=np.int64)
+    names = {BLUE: "blue", GREEN: "green", RED: "red"}
+    for channel in (BLUE, GREEN, RED):
+        name = names[channel]
+        got = symbols[channel]
+        control = (vsync << 1 | hsync) if channel == BLUE else np.zeros(active.shape, dtype=np.int64)
+        expected_control = CONTROL_SYMBOLS[control]
+        bad = ~active & (got != expected_control)
+        assert not bad.any(), first_bad(f"{name} control period", bad, got, expected_control)
+        bad = active & ~IS_DATA_SYMBOL[got]
+        assert not bad.any(), first_bad(f"{name} active area, not a data symbol", bad, got)
+
+        # ones minus zeros sent since the start of each line's active area
+        disparity = np.cumsum(np.where(active, symbol_disparity(got), 0), axis=1)
+        bad = np.abs(disparity) > MAX_DISPARITY
+        assert not bad.any(), first_bad(f"{name} DC balance, running disparity past {MAX_DISPARITY}", bad, got)
+
+        data = np.where(active, DECODE_DATA[got], 0)
+        expected = encode(data, control, active)
+        bad = got != expected
+        assert not bad.any(), first_bad(f"{name} disparity choice", bad, got, expected)
+        frame |= data[:timing.active_lines, :timing.active_h_pixels] << CHANNEL_SHIFTS[channel]
+    return frame
+
+def serialize(symbols):
+    """Bit stream of OSERDESE2 for a symbol stream: tmds_in[0] first."""
+    symbols = np.asarray(symbols, dtype=np.int64).ravel()
+    return ((symbols[:, None] >> np.arange(SYMBOL_BITS)) & 1).astype(np.uint8).ravel()
+
+def deserialize(bits, offset=0):
+    """Symbols of a bit stream, starting offset bits in."""
+    bits = np.asarray(bits, dtype=np.int64)[offset:]
+    bits = bits[:len(bits) // SYMBOL_BITS * SYMBOL_BITS].reshape(-1, SYMBOL_BITS)
+    return bits @ (1 << np.arange(SYMBOL_BITS))
+
+def symbol_alignment(bits):
+    """Offset of the symbol boundary in a bit stream, found the way a receiver does it: the
+    one that sees the most control symbols."""
+    return max(range(SYMBOL_BITS), key=lambda offset: int((CONTROL_CODE[deserialize(bits, offset)] >= 0).sum()))
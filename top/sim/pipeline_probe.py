@@ -0,0 +1,222 @@
+import json
+from pathlib import Path
+import numpy as np
+import cocotb
+from cocotb.triggers import RisingEdge, ReadOnly
+
+# Cycle-level latency measurement for pipelines whose stages are counted by hand. Instead of
+# trusting the comments, PipelineProbe samples named signals once per cycle and the latencies
+# are worked out from the samples after the run:
+#
+#   measure_lag       the lag at which a response follows a reference computed from the
+#                     samples, e.g. fb_red from frame_buff_raw or hcount_out from hcount_in
+#   pulse_latencies   valid_in pulses paired in order with valid_out pulses (or tabulate_in
+#                     with valid_out), for stages with a handshake rather than a fixed pipe
+#   LatencyTable      both across a chain: each row is placed on the raster through the row
+#                     that feeds it, and the sidebands of an alignment group (signals that
+#                     describe the same pixel) must sit at the raster lag of the group's pixel
+#                     data, give or take the skews the bench knows about
+#
+# Samples are taken in the ReadOnly phase after each rising edge, so inputs are what the next
+# edge samples and registered outputs what the last edge stored: a one-register stage
+# measures 1 and combinational logic 0. Unresolved (X/Z) values are stored as UNRESOLVED and
+# never compared.
+
+UNRESOLVED = -1
+
+class PipelineProbe:
+    """Per-cycle samples of {name: handle} on clk, up to max_cycles of them."""
+
+    def __init__(self, clk, signals, max_cycles):
+        self.clk = clk
+        self.names = list(signals)
+        self.handles = list(signals.values())
+        self.samples = np.full((len(self.handles), max_cycles), UNRESOLVED, dtype=np.int64)
+        self.cycles = 0
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        self._task.kill()
+
+    def __getitem__(self, name):
+        return self.samples[self.names.index(name), :self.cycles]
+
+    async def _run(self):
+        clk_edge = RisingEdge(self.clk)
+        while self.cycles < self.samples.shape[1]:
+            await clk_edge
+            await ReadOnly()
+            self.samples[:, self.cycles] = [read(handle) for handle in self.handles]
+            self.cycles += 1
+
+def read(handle):
+    try:
+        return handle.value.integer
+    except ValueError:
+        return UNRESOLVED
+
+def held(mask, before, after):
+    """True where mask is true on every cycle from `before` cycles earlier to `after` later,
+    for comparing one input of a composite signal while the others keep still."""
+    mask = np.asarray(mask, dtype=bool)
+    out = mask.copy()
+    for d in range(1, before + 1):
+        out[:d] = False
+        out[d:] &= mask[:-d]
+    for d in range(1, after + 1):
+        out[-d:] = False
+        out[:-d] &= mask[d:]
+    return out
+
+def measure_lag(reference, response, max_lag, where=None):
+    """The smallest lag L at which response[t + L] == reference[t] on every compared cycle t,
+    those in `where` (all by default) with both sides resolved. Returns lag (None if no lag
+    up to max_lag matches throughout), matched (the fraction of cycles agreeing at the lag,
+    or at the best one) and compared (how many cycles that was)."""
+    reference = np.asarray(reference, dtype=np.int64)
+    response = np.asarray(response, dtype=np.int64)
+    n = min(len(reference), len(response))
+    where = np.ones(n, dtype=bool) if where is None else np.asarray(where, dtype=bool)[:n]
+    best = {"lag": None, "best_lag": None, "matched": 0.0, "compared": 0}
+    for lag in range(min(max_lag, n - 1) + 1):
+        ref, res = reference[:n - lag], response[lag:n]
+        keep = where[:n - lag] & (ref != UNRESOLVED) & (res != UNRESOLVED)
+        compared = int(keep.sum())
+        if not compared:
+            continue
+        matched = float(np.mean(ref[keep] == res[keep]))
+        if matched == 1.0:
+            return {"lag": lag, "matched": 1.0, "compared": compared}
+        if matched > best["matched"]:
+            best.update(best_lag=lag, matched=matched, compared=compared)
+    return best
+
+def pulse_latencies(valid_in, valid_out):
+    """Cycles from each valid_in pulse to the valid_out pulse that answers it, pairing them in
+    order. Returns the latencies and how many inputs were still unanswered at the end; a
+    negative latency means an output came before anything asked for it."""
+    starts = np.flatnonzero(np.asarray(valid_in) == 1)
+    ends = np.flatnonzero(np.asarray(valid_out) == 1)
+    count = min(len(starts), len(ends))
+    return ends[:count] - starts[:count], len(starts) - count
+
+class LatencyTable:
+    """Latency rows across a chain, keyed by "stage.signal", and alignment groups over them."""
+
+    def __init__(self):
+        self.rows = {}
+        self.groups = {} # group -> (pixel data row, rows that should sit at its raster lag)
+
+    def lag(self, name, reference, response, max_lag, expected, after=None, where=None):
+        """A row measured with measure_lag. expected is the hand-counted latency; after names
+        the row that produced the reference, whose raster lag this row's adds to."""
+        row = measure_lag(reference, response, max_lag, where)
+        row.update(kind="lag", expected=expected, after=after)
+        row["raster_lag"] = self._raster_lag(row["lag"], after)
+        self.rows[name] = row
+        return row
+
+    def pulses(self, name, valid_in, valid_out, expected=None, after=None):
+        """A row measured with pulse_latencies. expected, if given, is a fixed latency every
+        pulse must take. per_cycle is the throughput, outputs per sampled cycle."""
+        latencies, in_flight = pulse_latencies(valid_in, valid_out)
+        row = {"kind": "pulses", "expected": expected, "after": after, "count": len(latencies),
+               "in_flight": in_flight, "per_cycle": len(latencies) / max(len(valid_out), 1), "lag": None}
+        if len(latencies):
+            row.update(min=int(latencies.min()), mean=float(latencies.mean()), max=int(latencies.max()))
+            if row["min"] == row["max"]:
+                row["lag"] = row["min"]
+        row["raster_lag"] = self._raster_lag(row["lag"], after)
+        self.rows[name] = row
+        return row
+
+    def _raster_lag(self, lag, after):
+        upstream = self.rows[after]["raster_lag"] if after else 0
+        return None if lag is None or upstream is None else upstream + lag
+
+    def align(self, group, data, sidebands):
+        """Declare that the sideband rows describe the same pixel as the data row."""
+        self.groups[group] = (data, list(sidebands))
+
+    def skew(self, group, name):
+        """Cycles the row sits behind its group's pixel data on the raster, None if unknown."""
+        data = self.rows[self.groups[group][0]]["raster_lag"]
+        lag = self.rows[name]["raster_lag"]
+        return None if lag is None or data is None else lag - data
+
+    def failures(self, known_skew=None):
+        """Everything wrong with the table: latency_failures() and skew_failures()."""
+        return self.latency_failures() + self.skew_failures(known_skew)
+
+    def latency_failures(self):
+        """Latencies other than the hand count, signals that follow no single lag, and pulses
+        never answered or answered early."""
+        problems = []
+        for name, row in self.rows.items():
+            if row["kind"] == "lag":
+                if not row["compared"]:
+                    problems.append(f"{name} was never exercised")
+                elif row["lag"] is None:
+                    problems.append(f"{name} follows its input at no single lag, best {row['best_lag']} "
+                                    f"agrees on {100 * row['matched']:.1f}% of {row['compared']} cycles")
+                elif row["expected"] is not None and row["lag"] != row["expected"]:
+                    problems.append(f"{name} takes {row['lag']} cycles, counted as {row['expected']}")
+            elif not row["count"]:
+                problems.append(f"{name} never answered")
+            elif row["min"] < 0:
+                problems.append(f"{name} answered before it was asked")
+            elif row["expected"] is not None and (row["min"], row["max"]) != (row["expected"],) * 2:
+                problems.append(f"{name} takes {row['min']} to {row['max']} cycles, counted as {row['expected']}")
+        return problems
+
+    def skew_failures(self, known_skew=None):
+        """Sidebands whose skew from their group's data is not the one in known_skew
+        ({group: {name: cycles}}), 0 for any not in it."""
+        known_skew = known_skew or {}
+        problems = []
+        for group, (data, sidebands) in self.groups.items():
+            known = known_skew.get(group, {})
+            for name in sidebands:
+                skew = self.skew(group, name)
+                if skew is None:
+                    problems.append(f"{name} has no fixed raster lag to align in {group}")
+                elif skew != known.get(name, 0):
+                    problems.append(f"{name} is {skew:+d} cycles off {data} in {group}, expected "
+                                    f"{known.get(name, 0):+d}" + (" (a fix? update the known skews)" if name in known else ""))
+        return problems
+
+    def report(self, log, path=None, known_skew=None):
+        """Log the latency rows and the alignment groups, write them to path as JSON, and
+        return failures()."""
+        known_skew = known_skew or {}
+        log.info(f"{'stage.signal':<46} {'latency':>9} {'counted':>7} {'raster':>6}  checked")
+        for name, row in self.rows.items():
+            if row["kind"] == "lag":
+                latency = "-" if row["lag"] is None else str(row["lag"])
+                checked = f"{row['compared']} cycles" + ("" if row["lag"] is not None else
+                                                         f", best {row['best_lag']} at {100 * row['matched']:.1f}%")
+            else:
+                latency = "-" if not row["count"] else (str(row["min"]) if row["min"] == row["max"]
+                                                        else f"{row['min']}-{row['max']}")
+                checked = f"{row['count']} pulses, {row['per_cycle']:.4f}/cycle" + \
+                          (f", {row['in_flight']} in flight" if row["in_flight"] else "")
+            counted = "" if row["expected"] is None else str(row["expected"])
+            raster = "-" if row["raster_lag"] is None else str(row["raster_lag"])
+            log.info(f"{name:<46} {latency:>9} {counted:>7} {raster:>6}  {checked}")
+        skews = {}
+        for group, (data, sidebands) in self.groups.items():
+            known = known_skew.get(group, {})
+            skews[group] = {name: self.skew(group, name) for name in sidebands}
+            log.info(f"{group}: aligned to {data}")
+            for name, skew in skews[group].items():
+                text = "?" if skew is None else f"{skew:+d}"
+                log.info(f"  {name:<44} {text:>4}" + (f"  known {known[name]:+d}" if name in known else ""))
+        problems = self.failures(known_skew)
+        if path:
+            with open(Path(path), "w") as f:
+                json.dump({"rows": self.rows, "groups": self.groups, "skew": skews, "known_skew": known_skew,
+                           "failures": problems}, f, indent=2)
+        return problems
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from wave_policy import RUN_RESULTS_GLOB
+
+# Runs every top/sim/test_*.py bench at once, each as its own simulator process in an
+# isolated run directory, and merges the results into one JSON and one JUnit report.
+#
+#   python3 top/sim/run_regression.py            # everything, one worker per core
+#   python3 top/sim/run_regression.py -k parallax -j 2
+
+SIM_PATH = Path(__file__).resolve().parent
+DEFAULT_OUT = SIM_PATH / "regression"
+SIM_BUILD = "sim_build" # what the runners build and test in, relative to their cwd
+
+def discover_benches(pattern=None):
+    """Every testbench script in top/sim, optionally filtered by a substring."""
+    benches = sorted(SIM_PATH.glob("test_*.py"))
+    if pattern:
+        benches = [bench for bench in benches if pattern in bench.stem]
+    return benches
+
+def prepare_run_dir(run_dir):
+    """Isolated cwd for one bench. It is kept between runs so the build cache still hits.
+    Seed it with the memory init files the benches $readmemh from their test directory, clear
+    the last run's results and return its sim_build."""
+    sim_build = run_dir / SIM_BUILD
+    sim_build.mkdir(parents=True, exist_ok=True)
+    for mem_file in (SIM_PATH / SIM_BUILD).glob("*.mem"):
+        shutil.copy(mem_file, sim_build / mem_file.name)
+    for results_file in [sim_build / "results.xml", *sim_build.glob(RUN_RESULTS_GLOB)]:
+        results_file.unlink(missing_ok=True)
+    return sim_build
+
+def results_files(sim_build):
+    """Every results file a bench wrote: one per run_tests call, in call order. A bench that
+    never went through run_tests only has results.xml."""
+    return sorted(sim_build.glob(RUN_RESULTS_GLOB)) or [sim_build / "results.xml"]
+
+def parse_results(results_file):
+    """Test cases from a cocotb results.xml, or [] if the simulation never wrote one."""
+    if not results_file.is_file():
+        return []
+    cases = []
+    for case in ET.parse(results_file).iter("testcase"):
+        failed = case.find("failure") is not None or case.find("error") is not None
+        skipped = case.find("skipped") is not None
+        cases.append({
+            "name": case.get("name"),
+            "status": "failed" if failed else "skipped" if skipped else "passed",
+            "wall_time_s": float(case.get("time", 0)),
+            "sim_time_ns": float(case.get("sim_time_ns", 0)),
+            "element": case,
+        })
+    return cases
+
+def run_bench(bench, out_dir):
+    """Run one bench's runner script in its own directory and collect its results."""
+    run_dir = out_dir / bench.stem
+    sim_build = prepare_run_dir(run_dir)
+
+    start = time.perf_counter()
+    with open(run_dir / "log.txt", "w") as log:
+        proc = subprocess.run([sys.executable, str(bench)], cwd=run_dir, stdout=log, stderr=subprocess.STDOUT)
+    wall_time = time.perf_counter() - start
+
+    cases = [case for results_file in results_files(sim_build) for case in parse_results(results_file)]
+    passed = proc.returncode == 0 and len(cases) > 0 and all(case["status"] != "failed" for case in cases)
+    return {
+        "bench": bench.stem,
+        "passed": passed,
+        "returncode": proc.returncode,
+        "wall_time_s": wall_time,
+        "sim_time_ns": sum(case["sim_time_ns"] for case in cases),
+        "log": str(run_dir / "log.txt"),
+        "tests": cases,
+    }
+
+def write_json(results, path, wall_time):
+    report = {
+        "passed": all(result["passed"] for result in results),
+        "wall_time_s": wall_time,
+        "benches": [
+            {**result, "tests": [{k: v for k, v in case.items() if k != "element"} for case in result["tests"]]}
+            for result in results
+        ],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+def write_junit(results, path):
+    suites = ET.Element("testsuites")
+    for result in results:
+        cases = result["tests"]
+        suite = ET.SubElement(suites, "testsuite", {
+            "name": result["bench"],
+            "tests": str(max(len(cases), 1)),
+            "failures": str(sum(case["status"] == "failed" for case in cases)),
+            "errors": "0" if cases else "1",
+            "time": f"{result['wall_time_s']:.3f}",
+            "sim_time_ns": f"{result['sim_time_ns']:.0f}",
+        })
+        for case in cases:
+            suite.append(case["element"])
+        if not cases:
+            # the simulator crashed or failed to build before any test reported
+            case = ET.SubElement(suite, "testcase", {"name": "build", "classname": result["bench"]})
+            ET.SubElement(case, "error", {"message": f"no results, see {result['log']}"})
+    ET.ElementTree(suites).write(path, encoding="utf-8", xml_declaration=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all top/sim cocotb benches in parallel.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="benches to run at once")
+    parser.add_argument("-k", dest="pattern", help="only run benches whose name contains this")
+    parser.add_argument("-o", "--out", type=Path, default=DEFAULT_OUT, help="directory for run dirs and reports")
+    args = parser.parse_args()
+
+    benches = discover_benches(args.pattern)
+    if not benches:
+        print("No benches found")
+        return 1
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    # each bench is its own simulator subprocess, the threads just wait on them
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(lambda bench: run_bench(bench, args.out.resolve()), benches))
+    wall_time = time.perf_counter() - start
+
+    write_json(results, args.out / "report.json", wall_time)
+    write_junit(results, args.out / "report.xml")
+
+    for result in results:
+        status = "PASS" if result["passed"] else "FAIL"
+        print(f"{status}  {result['bench']:<32} {result['wall_time_s']:8.1f}s wall {result['sim_time_ns'] / 1e6:10.3f}ms sim")
+    slowest = max(result["wall_time_s"] for result in results)
+    print(f"{len(results)} benches in {wall_time:.1f}s (slowest bench {slowest:.1f}s), reports in {args.out}")
+    return 0 if all(result["passed"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
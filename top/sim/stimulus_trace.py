@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import shutil
+from contextlib import nullcontext
+from pathlib import Path
+import numpy as np
+
+# Record/replay of bench transactions, so stimulus and the model's expected outputs can be
+# generated once (by a bench with TRACE_RECORD=1 or by scripts/make_traces.py) and replayed
+# against the RTL without running any model. A trace is a directory:
+#
+#   <name>.trace/meta.json     fields, transaction count, chunk files, and an info dict of
+#                              whatever the expected values depend on (parameters, seeds,
+#                              the hash of a memory init file)
+#   <name>.trace/00000.npz     one array per field, transactions along the first axis
+#
+# Every transaction has the same fields, each with a fixed dtype and shape and a role: "input"
+# for what is driven, "expected" for what the DUT must produce. Chunks are written and read
+# one at a time, so a corpus of any size takes one chunk of memory.
+#
+#   TRACE_RECORD=1 python3 test_parallax_over.py       # also write traces/<test>.trace
+#   TRACE_REPLAY=traces/corpus.trace python3 test_parallax_over.py
+#
+# Relative paths are taken from top/sim, since the tests themselves run inside sim_build.
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+CHUNK_TRANSACTIONS = 256
+SIM_DIR = Path(__file__).resolve().parent
+TRACE_DIR = SIM_DIR / os.getenv("TRACE_DIR", "traces")
+
+def file_hash(path):
+    """sha1 of a file, for recording which memory init file expected values came from."""
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+class TraceWriter:
+    """Writes transactions to a new trace at path. fields maps each field name to
+    (role, dtype, shape); use it as a context manager or call close()."""
+
+    def __init__(self, path, fields, info=None, chunk_transactions=CHUNK_TRANSACTIONS):
+        self.path = Path(path)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        self.path.mkdir(parents=True)
+        self.fields = {name: {"role": role, "dtype": np.dtype(dtype).str, "shape": list(shape)}
+                       for name, (role, dtype, shape) in fields.items()}
+        self.info = info or {}
+        self.chunk_transactions = chunk_transactions
+        self.chunks = []
+        self.count = 0
+        self._pending = {name: [] for name in self.fields}
+
+    def append(self, **values):
+        """One transaction: a value for every field."""
+        assert values.keys() == self.fields.keys(), \
+            f"transaction has fields {sorted(values)}, trace has {sorted(self.fields)}"
+        for name, value in values.items():
+            field = self.fields[name]
+            value = np.asarray(value, dtype=field["dtype"])
+            assert list(value.shape) == field["shape"], f"{name} is {value.shape}, trace has {field['shape']}"
+            self._pending[name].append(value)
+        self.count += 1
+        if self.count % self.chunk_transactions == 0:
+            self._flush()
+
+    def _flush(self):
+        if not any(self._pending.values()):
+            return
+        chunk = f"{len(self.chunks):05d}.npz"
+        np.savez_compressed(self.path / chunk, **{name: np.stack(values) for name, values in self._pending.items()})
+        self.chunks.append(chunk)
+        self._pending = {name: [] for name in self.fields}
+
+    def close(self):
+        self._flush()
+        meta = {"format": FORMAT_VERSION, "count": self.count, "fields": self.fields, "chunks": self.chunks,
+                "info": self.info}
+        with open(self.path / META_FILE, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TraceReader:
+    """A trace written by TraceWriter, read a chunk at a time."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            meta = json.load(f)
+        assert meta["format"] == FORMAT_VERSION, f"{path} is trace format {meta['format']}, expected {FORMAT_VERSION}"
+        self.count = meta["count"]
+        self.fields = meta["fields"]
+        self.chunks = meta["chunks"]
+        self.info = meta["info"]
+
+    def __len__(self):
+        return self.count
+
+    def names(self, role):
+        return [name for name, field in self.fields.items() if field["role"] == role]
+
+    def check_info(self, **expected):
+        """Fail unless the trace was made for these parameters, so a trace is never replayed
+        against a configuration its expected values do not hold for."""
+        wrong = {key: (self.info.get(key), value) for key, value in expected.items() if self.info.get(key) != value}
+        assert not wrong, f"{self.path} was recorded for " + ", ".join(
+            f"{key}={recorded!r} (this bench has {value!r})" for key, (recorded, value) in wrong.items())
+
+    def iter_chunks(self):
+        """{field: array} per chunk, transactions along the first axis."""
+        for chunk in self.chunks:
+            with np.load(self.path / chunk) as data:
+                yield {name: data[name] for name in self.fields}
+
+    def __iter__(self):
+        """One {field: value} per transaction; scalar fields come out as plain Python values."""
+        for chunk in self.iter_chunks():
+            for k in range(len(next(iter(chunk.values())))):
+                yield {name: values[k].item() if values[k].ndim == 0 else values[k] for name, values in chunk.items()}
+
+def recorder(name, fields, info=None, chunk_transactions=CHUNK_TRANSACTIONS):
+    """A TraceWriter for TRACE_DIR/<name>.trace when TRACE_RECORD is set, otherwise a context
+    that yields None, so a bench can always write `with recorder(...) as trace:`."""
+    if not os.getenv("TRACE_RECORD"):
+        return nullcontext()
+    return TraceWriter(TRACE_DIR / f"{name}.trace", fields, info, chunk_transactions)
+
+def replay_trace():
+    """The TraceReader named by TRACE_REPLAY, or None when it is not set."""
+    path = os.getenv("TRACE_REPLAY")
+    return TraceReader(SIM_DIR / path) if path else None
+
+async def replay(trace, run, log, max_reported=10):
+    """Stream a trace through the DUT. run(transaction) drives one transaction and returns
+    {expected field: observed value}; every expected field is compared with the trace, and
+    the first max_reported mismatches are logged. Returns the list of (index, field,
+    expected, observed) mismatches."""
+    expected_names = trace.names("expected")
+    mismatches = []
+    for index, transaction in enumerate(trace):
+        observed = await run(transaction)
+        for name in expected_names:
+            want, got = transaction[name], observed[name]
+            if not np.array_equal(np.asarray(want), np.asarray(got)):
+                if len(mismatches) < max_reported:
+                    log.error(f"Transaction {index}: {name} is {np.asarray(got).tolist()}, "
+                              f"trace expects {np.asarray(want).tolist()}")
+                mismatches.append((index, name, want, got))
+    log.info(f"Replayed {len(trace)} transactions from {trace.path}, {len(mismatches)} mismatches")
+    return mismatches
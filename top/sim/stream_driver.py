@@ -0,0 +1,62 @@
+import time
+import numpy as np
+from cocotb.triggers import RisingEdge, Timer
+
+# Frame-at-a-time stimulus for modules that take one (x_in, y_in, valid_in) point per cycle,
+# like moving_frame_k_means. Driving a pixel per await makes the Python <-> simulator
+# round trip the bottleneck, so this driver only wakes up where the inputs matter.
+# changes() does the same for benches that wake up every cycle but only write what changed.
+
+def changes(values):
+    """(index, value) wherever the input differs from the one before it, so a driver only
+    writes a handle on the cycles its value changes."""
+    values = np.asarray(values, dtype=np.int64)
+    idx = np.flatnonzero(np.diff(values, prepend=values[0] - 1))
+    return dict(zip(idx.tolist(), values[idx].tolist()))
+
+async def skip_cycles(clk_edge, num_cycles, clock_period_ns):
+    """Wait num_cycles rising edges. Long waits use one Timer plus one edge instead of
+    a wake-up per cycle; the Timer lands half a period before the last edge."""
+    if num_cycles <= 2:
+        for _ in range(num_cycles):
+            await clk_edge
+        return
+    await Timer(int((num_cycles - 0.5) * clock_period_ns * 1000), units="ps")
+    await clk_edge
+
+async def stream_frame(dut, valid, stride=1, clock_period_ns=10):
+    """Feed one frame to the DUT in raster order, one pixel per clock cycle.
+
+    valid is a (rows, cols) bool mask sampled every `stride` pixels. Runs of invalid pixels
+    are skipped with valid_in held low since the DUT ignores x_in/y_in while valid_in is 0, so
+    the number of wake-ups scales with the valid pixels rather than the frame size.
+    Must be called right after a rising edge. Returns the achieved simulated cycles/second.
+    """
+    clk_edge = RisingEdge(dut.clk_in) # reuse one trigger instead of building one per cycle
+    x_in, y_in, valid_in = dut.x_in, dut.y_in, dut.valid_in
+
+    rows, cols = valid.shape
+    flat_idx = np.flatnonzero(valid)
+    # plain python ints are much cheaper to assign to handles than numpy scalars
+    xs = ((flat_idx % cols) * stride).tolist()
+    ys = ((flat_idx // cols) * stride).tolist()
+    gaps = (np.diff(flat_idx, prepend=-1) - 1).tolist() # invalid pixels before each valid one
+    tail = rows * cols - (int(flat_idx[-1]) + 1 if flat_idx.size else 0)
+
+    start = time.perf_counter()
+    valid_in.value = 0
+    for x, y, gap in zip(xs, ys, gaps):
+        if gap:
+            valid_in.value = 0
+            await skip_cycles(clk_edge, gap, clock_period_ns)
+        x_in.value = x
+        y_in.value = y
+        valid_in.value = 1
+        await clk_edge
+    valid_in.value = 0
+    await skip_cycles(clk_edge, tail, clock_period_ns)
+    elapsed = time.perf_counter() - start
+
+    cycles_per_second = rows * cols / elapsed if elapsed > 0 else float("inf")
+    dut._log.info(f"Streamed {rows}x{cols} frame ({flat_idx.size} valid) at {cycles_per_second:.0f} cycles/s")
+    return cycles_per_second
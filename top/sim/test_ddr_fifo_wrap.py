@@ -0,0 +1,397 @@
+import cocotb
+import os
+import sys
+import json
+import logging
+import shutil
+from collections import deque
+from pathlib import Path
+from cocotb.triggers import FallingEdge, ReadOnly, RisingEdge, with_timeout
+from cocotb.result import SimTimeoutError
+from cocotb.utils import get_sim_time
+from cocotb.runner import get_results, get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, results_file, run_tests
+from stream_driver import skip_cycles
+
+# Clock-ratio stress sweep for the two ddr_fifo_wrap crossings in top_level, each run in
+# ddr_fifo_sim_test with the traffic that actually goes through it:
+#
+#   camera   clk_camera -> clk_ui. The stacker offers a chunk every 8 camera pixels and holds
+#            it until taken, but top_level ignores its pixel_tready, so a chunk still waiting
+#            when the next one is due costs pixels (counted as a dropped beat). The traffic
+#            generator only takes writes between read bursts and MIG refreshes.
+#   display  clk_ui -> clk_pixel. The traffic generator issues reads while prog_full is low
+#            and fewer than MAX_CMD_QUEUE are unanswered, and the MIG returns them
+#            read_latency cycles later with no way to wait, so data that finds the FIFO full
+#            is dropped. The unstacker takes a chunk every 8 active pixels of the 720p raster.
+#
+# Every beat carries its sequence number, so what comes out of the FIFO is checked against
+# what went in for lost, duplicated or reordered beats; those always fail the test. Drops at
+# the sender and underflow at the receiver are what the sweep measures, and only fail at the
+# 720p60 operating points. Running this file sweeps clock ratios, read latency and clock
+# phase and prints a margin report (ddr_fifo_margin.json in sim_build):
+#
+#   FIFO_SWEEP=full (default)   every point
+#   FIFO_SWEEP=nominal          just the two 720p60 crossings
+#   FIFO_LINES=12               720p lines of traffic per point
+#
+# Last full sweep (Verilator, 12 lines): no beat lost, duplicated or reordered anywhere. The
+# camera crossing peaks at 3 of 128 words at 720p60 and only overflows with the UI at a quarter
+# speed or less and 90% of it spent reading. The display crossing peaks at 123 of 128, 5 words
+# from overflow, at every UI clock from 74.25 to 81.25 MHz, and underflows once the read
+# latency is 64 UI cycles. The wait for the first beat after reset is counted separately, as
+# startup cycles, since the unstacker starts before the FIFO has been filled.
+
+CAMERA_PERIOD_PS = 5000 # clk_camera, 200 MHz
+UI_PERIOD_PS = 12308 # clk_ui, 81.25 MHz
+PIXEL_PERIOD_PS = 13468 # clk_pixel, 74.25 MHz
+DEPTH = 128
+PROGFULL_DEPTH = 12
+CHUNK_PIXELS = 8
+CAMERA_PIXEL_CYCLES = 8 # clk_camera cycles per pixel from pixel_reconstruct
+MAX_CMD_QUEUE = 8 # traffic_generator's limit on unanswered reads
+REFRESH_INTERVAL = 634 # UI cycles, as mig_ui
+REFRESH_CYCLES = 24
+ACTIVE_H_PIXELS, TOTAL_PIXELS = 1280, 1650
+DRAIN_CYCLES_PER_BEAT = 100 # receiver cycles allowed per beat still in the FIFO at the end
+
+CROSSING = os.getenv("FIFO_CROSSING", "display")
+SENDER_PERIOD_PS = int(os.getenv("FIFO_SENDER_PERIOD_PS", str(UI_PERIOD_PS)))
+RECEIVER_PERIOD_PS = int(os.getenv("FIFO_RECEIVER_PERIOD_PS", str(PIXEL_PERIOD_PS)))
+RECEIVER_PHASE_PS = int(os.getenv("FIFO_RECEIVER_PHASE_PS", "0"))
+READ_LATENCY = int(os.getenv("FIFO_READ_LATENCY", "24"))
+ARBITER_BUSY = float(os.getenv("FIFO_ARBITER_BUSY", "0.1")) # share of UI cycles spent reading, camera crossing
+ARBITER_BURST = 32 # UI cycles per read burst
+NOMINAL = os.getenv("FIFO_NOMINAL", "0") == "1"
+LINES = int(os.getenv("FIFO_LINES", "12"))
+RESULT_FILE = os.getenv("FIFO_RESULT_FILE", "ddr_fifo_result.json")
+SWEEP = os.getenv("FIFO_SWEEP", "full")
+
+def cycle_at(period_ps, phase_ps=0):
+    """Whole cycles of a clock since its first edge; exact on its falling edges."""
+    return int((get_sim_time("ps") - phase_ps) // period_ps)
+
+def arbiter_busy(cycle, busy=ARBITER_BUSY, burst=ARBITER_BURST):
+    """Whether traffic_generator is away from the camera FIFO on this UI cycle: reading in
+    bursts that take `busy` of the time, or stalled by a MIG refresh."""
+    reading = busy > 0 and cycle % max(int(burst / busy), burst) < burst
+    return reading or cycle % REFRESH_INTERVAL < REFRESH_CYCLES
+
+async def reset_fifo(dut):
+    dut.sender_rst.value = 1
+    dut.sender_axis_tvalid.value = 0
+    dut.sender_axis_tdata.value = 0
+    dut.sender_axis_tlast.value = 0
+    dut.receiver_axis_tready.value = 0
+    for _ in range(8):
+        await FallingEdge(dut.receiver_clk)
+    await FallingEdge(dut.sender_clk)
+    dut.sender_rst.value = 0
+    for _ in range(8):
+        await FallingEdge(dut.receiver_clk)
+
+async def send_stacker_chunks(dut, num_beats, stats):
+    """The stacker: beat k offered at sender cycle 8 * CAMERA_PIXEL_CYCLES * k and held until
+    taken; a beat that comes due while the previous one waits is dropped."""
+    clk_edge = FallingEdge(dut.sender_clk)
+    period_ns = SENDER_PERIOD_PS / 1000
+    tvalid, tdata, tready = dut.sender_axis_tvalid, dut.sender_axis_tdata, dut.sender_axis_tready
+    interval = CHUNK_PIXELS * CAMERA_PIXEL_CYCLES
+    await clk_edge
+    start = cycle_at(SENDER_PERIOD_PS)
+    pending = None
+    k = 0
+    while k < num_beats or pending is not None:
+        if k < num_beats and cycle_at(SENDER_PERIOD_PS) >= start + k * interval:
+            if pending is None:
+                tdata.value = k
+                pending = k
+            else:
+                stats["dropped"] += 1
+            stats["offered"] += 1
+            k += 1
+        tvalid.value = pending is not None
+        if pending is None:
+            if k < num_beats:
+                await skip_cycles(clk_edge, start + k * interval - cycle_at(SENDER_PERIOD_PS), period_ns)
+            continue
+        await ReadOnly()
+        if tready.value.integer:
+            stats["accepted"].append(pending)
+            pending = None
+        await clk_edge
+    tvalid.value = 0
+
+async def take_arbitrated(dut, received):
+    """traffic_generator's write side: tready except while arbiter_busy. Runs until killed."""
+    clk_edge = FallingEdge(dut.receiver_clk)
+    tvalid, tdata, tready = dut.receiver_axis_tvalid, dut.receiver_axis_tdata, dut.receiver_axis_tready
+    while True:
+        await clk_edge
+        ready = not arbiter_busy(cycle_at(RECEIVER_PERIOD_PS, RECEIVER_PHASE_PS))
+        tready.value = ready
+        await ReadOnly()
+        if not tvalid.value.integer:
+            if ready:
+                await RisingEdge(tvalid)
+            continue
+        if ready:
+            received.append(tdata.value.integer)
+
+async def drain(dut, received, count):
+    while len(received) < count:
+        await FallingEdge(dut.receiver_clk)
+
+async def send_read_data(dut, stats):
+    """traffic_generator's read side and the MIG behind it: a read issued on any cycle with
+    prog_full low and fewer than MAX_CMD_QUEUE unanswered, except during refresh, and its data
+    offered for one cycle read_latency cycles later whether the FIFO is ready or not. A
+    dropped beat is never answered, so once MAX_CMD_QUEUE are lost the reads stop, as in the
+    RTL; that is recorded as deadlocked. Runs until killed."""
+    clk_edge = FallingEdge(dut.sender_clk)
+    tvalid, tdata, tready, prog_full = (dut.sender_axis_tvalid, dut.sender_axis_tdata,
+                                        dut.sender_axis_tready, dut.sender_axis_prog_full)
+    in_flight = deque() # cycle each issued read's data is due
+    requested = answered = returned = 0
+    while True:
+        await clk_edge
+        cycle = cycle_at(SENDER_PERIOD_PS)
+        returning = bool(in_flight) and in_flight[0] <= cycle
+        if returning:
+            in_flight.popleft()
+            tdata.value = returned
+        tvalid.value = returning
+        can_request = requested - answered < MAX_CMD_QUEUE
+        if can_request and not prog_full.value.integer and cycle % REFRESH_INTERVAL >= REFRESH_CYCLES:
+            in_flight.append(cycle + 1 + READ_LATENCY)
+            requested += 1
+        await ReadOnly()
+        if returning:
+            stats["offered"] += 1
+            if tready.value.integer:
+                stats["accepted"].append(returned)
+                answered += 1
+            else:
+                stats["dropped"] += 1
+            returned += 1
+        elif not in_flight and not can_request:
+            stats["deadlocked"] = True
+            return
+        elif not in_flight and prog_full.value.integer:
+            await FallingEdge(prog_full)
+
+async def take_unstacker(dut, received, stats, lines):
+    """The unstacker under top_level's raster: a chunk taken every CHUNK_PIXELS active pixels.
+    If the FIFO is empty it keeps tready up until data comes, counting underflow cycles, and
+    gives up if the reads have deadlocked. The wait for the very first beat after reset is the
+    FIFO filling, not underflow, and is counted as startup cycles."""
+    clk_edge = FallingEdge(dut.receiver_clk)
+    period_ns = RECEIVER_PERIOD_PS / 1000
+    tvalid, tdata, tready = dut.receiver_axis_tvalid, dut.receiver_axis_tdata, dut.receiver_axis_tready
+    await clk_edge
+    for _ in range(lines):
+        line_start = cycle_at(RECEIVER_PERIOD_PS, RECEIVER_PHASE_PS)
+        for slot in range(ACTIVE_H_PIXELS // CHUNK_PIXELS):
+            due = line_start + slot * CHUNK_PIXELS
+            await skip_cycles(clk_edge, due - cycle_at(RECEIVER_PERIOD_PS, RECEIVER_PHASE_PS), period_ns)
+            tready.value = 1
+            while True:
+                await ReadOnly()
+                valid = tvalid.value.integer
+                if valid:
+                    received.append(tdata.value.integer)
+                await clk_edge
+                if valid:
+                    break
+                stats["underflow_cycles" if received else "startup_cycles"] += 1
+                if stats["deadlocked"]:
+                    return
+            tready.value = 0
+        await skip_cycles(clk_edge, line_start + TOTAL_PIXELS - cycle_at(RECEIVER_PERIOD_PS, RECEIVER_PHASE_PS), period_ns)
+
+def fifo_counters(dut):
+    fifo = dut.fifo.xpm_fifo_axis_inst
+    return {
+        "peak_occupancy": fifo.peak_occupancy.value.integer,
+        "prog_full_count": fifo.prog_full_count.value.integer,
+        "blocked_count": fifo.blocked_count.value.integer,
+    }
+
+@cocotb.test()
+async def test_crossing(dut):
+    """One crossing at one clock ratio: no beat lost, duplicated or reordered inside the FIFO,
+    and at the 720p60 operating point none dropped at the sender and no underflow."""
+    await reset_fifo(dut)
+    stats = {"offered": 0, "accepted": [], "dropped": 0, "startup_cycles": 0, "underflow_cycles": 0,
+             "deadlocked": False}
+    received = []
+    window_ps = LINES * TOTAL_PIXELS * PIXEL_PERIOD_PS
+    if CROSSING == "camera":
+        num_beats = window_ps // (SENDER_PERIOD_PS * CHUNK_PIXELS * CAMERA_PIXEL_CYCLES)
+        taker = cocotb.start_soon(take_arbitrated(dut, received))
+        await send_stacker_chunks(dut, num_beats, stats)
+        # a beat lost inside the FIFO would otherwise leave this waiting forever
+        queued = len(stats["accepted"]) - len(received)
+        try:
+            await with_timeout(drain(dut, received, len(stats["accepted"])),
+                               DRAIN_CYCLES_PER_BEAT * max(queued, 1) * RECEIVER_PERIOD_PS, "ps")
+        except SimTimeoutError:
+            pass # reported by the checks below
+        taker.kill()
+    else:
+        sender = cocotb.start_soon(send_read_data(dut, stats))
+        await take_unstacker(dut, received, stats, LINES)
+        sender.kill()
+
+    accepted = stats["accepted"]
+    duplicated = len(received) - len(set(received))
+    result = {
+        "crossing": CROSSING,
+        "nominal": NOMINAL,
+        "sender_mhz": 1e6 / SENDER_PERIOD_PS,
+        "receiver_mhz": 1e6 / RECEIVER_PERIOD_PS,
+        "receiver_phase_ps": RECEIVER_PHASE_PS,
+        "read_latency": READ_LATENCY if CROSSING == "display" else None,
+        "arbiter_busy": ARBITER_BUSY if CROSSING == "camera" else None,
+        "depth": DEPTH,
+        "prog_full_thresh": DEPTH - PROGFULL_DEPTH,
+        "offered": stats["offered"],
+        "accepted": len(accepted),
+        "received": len(received),
+        "dropped": stats["dropped"],
+        "duplicated": duplicated,
+        "startup_cycles": stats["startup_cycles"],
+        "underflow_cycles": stats["underflow_cycles"],
+        "deadlocked": stats["deadlocked"],
+        **fifo_counters(dut),
+    }
+    result["margin"] = DEPTH - result["peak_occupancy"]
+    with open(RESULT_FILE, "w") as f:
+        json.dump(result, f, indent=2)
+    dut._log.info(f"{CROSSING}: {result['sender_mhz']:.2f} -> {result['receiver_mhz']:.2f} MHz, "
+                  f"peak {result['peak_occupancy']}/{DEPTH}, prog_full {result['prog_full_count']}x, "
+                  f"{result['dropped']} dropped, {result['underflow_cycles']} underflow cycles")
+
+    # received may stop short of accepted in the display crossing, whatever is still queued
+    assert duplicated == 0, f"{duplicated} beats came out of the FIFO twice"
+    bad = [i for i, (got, sent) in enumerate(zip(received, accepted)) if got != sent]
+    assert not bad, f"Beat {bad[0]} out of the FIFO is {received[bad[0]]}, {accepted[bad[0]]} went in; {len(bad)} differ"
+    assert len(received) <= len(accepted), f"{len(received)} beats out of the FIFO, {len(accepted)} went in"
+    if CROSSING == "camera":
+        assert len(received) == len(accepted), f"{len(accepted) - len(received)} beats lost in the FIFO"
+    if NOMINAL:
+        assert result["dropped"] == 0, f"{result['dropped']} beats dropped at 720p60"
+        assert result["underflow_cycles"] == 0, f"Display underflowed for {result['underflow_cycles']} cycles at 720p60"
+
+def even_ps(period_ps):
+    return 2 * round(period_ps / 2)
+
+def sweep_points(level=SWEEP):
+    """(name, HDL parameters, test environment) for each point of the sweep."""
+    points = []
+    def add(name, crossing, sender_ps, receiver_ps, nominal=False, phase_ps=0, **env):
+        params = {"SENDER_PERIOD_PS": even_ps(sender_ps), "RECEIVER_PERIOD_PS": even_ps(receiver_ps),
+                  "RECEIVER_PHASE_PS": phase_ps, "DEPTH": DEPTH, "PROGFULL_DEPTH": PROGFULL_DEPTH}
+        env = {"FIFO_CROSSING": crossing, "FIFO_NOMINAL": "1" if nominal else "0",
+               "FIFO_SENDER_PERIOD_PS": str(params["SENDER_PERIOD_PS"]),
+               "FIFO_RECEIVER_PERIOD_PS": str(params["RECEIVER_PERIOD_PS"]),
+               "FIFO_RECEIVER_PHASE_PS": str(phase_ps), "FIFO_LINES": str(LINES),
+               "FIFO_RESULT_FILE": f"ddr_fifo_{name}.json", **{k: str(v) for k, v in env.items()}}
+        points.append((name, params, env))
+
+    add("camera_720p60", "camera", CAMERA_PERIOD_PS, UI_PERIOD_PS, nominal=True, FIFO_ARBITER_BUSY=0.1)
+    add("display_720p60", "display", UI_PERIOD_PS, PIXEL_PERIOD_PS, nominal=True, FIFO_READ_LATENCY=24)
+    if level == "nominal":
+        return points
+    # camera: a slower UI clock and a traffic generator that reads more of the time
+    for slowdown in (1, 2, 4, 8):
+        for busy in (0.1, 0.5, 0.9):
+            if (slowdown, busy) != (1, 0.1):
+                add(f"camera_ui_x{slowdown}_busy{int(100 * busy)}", "camera", CAMERA_PERIOD_PS,
+                    UI_PERIOD_PS * slowdown, FIFO_ARBITER_BUSY=busy)
+    # display: UI clock closer to the pixel clock, slower MIG reads, and the clock phase
+    for ui_mhz in (81.25, 78, 76, 74.25):
+        for latency in (24, 64):
+            for phase in (0, PIXEL_PERIOD_PS // 2):
+                if (ui_mhz, latency, phase) != (81.25, 24, 0):
+                    add(f"display_ui{ui_mhz:g}_lat{latency}_ph{phase}", "display", 1e6 / ui_mhz,
+                        PIXEL_PERIOD_PS, phase_ps=phase, FIFO_READ_LATENCY=latency)
+    return points
+
+def margin_report(results):
+    """Print how close each crossing got to overflow, 720p60 rows first."""
+    print(f"{'point':<34} {'MHz in->out':>15} {'peak':>8} {'thresh':>6} {'prog_full':>9} {'margin':>6} "
+          f"{'dropped':>7} {'underflow':>9}")
+    for name, result in sorted(results.items(), key=lambda item: (not item[1]["nominal"], item[0])):
+        flag = "  720p60" if result["nominal"] else ""
+        if result["deadlocked"]:
+            flag += "  reads deadlocked"
+        print(f"{name:<34} {result['sender_mhz']:6.2f}->{result['receiver_mhz']:6.2f} "
+              f"{result['peak_occupancy']:4d}/{result['depth']:<3d} {result['prog_full_thresh']:6d} "
+              f"{result['prog_full_count']:9d} {result['margin']:6d} {result['dropped']:7d} "
+              f"{result['underflow_cycles']:9d}{flag}")
+    for crossing in ("camera", "display"):
+        rows = [r for r in results.values() if r["crossing"] == crossing and r["nominal"]]
+        for r in rows:
+            print(f"{crossing} at 720p60: peak {r['peak_occupancy']} of {r['depth']} words, "
+                  f"{r['margin']} words ({100 * r['margin'] / r['depth']:.0f}%) from overflow")
+
+def is_runner():
+    """DDR FIFO Wrap Clock Sweep."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "sim" / "hdl" / "ddr_fifo_sim_test.sv"]
+    sources += [proj_path / "sim" / "hdl" / "xpm_fifo_axis.sv"]
+    sources += [proj_path / "hdl" / "ddr_fifo_wrap.sv"]
+    build_test_args = ["-Wall"]
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    results, failed = {}, []
+    for name, parameters, env in sweep_points():
+        cached_build(
+            runner,
+            sources=sources,
+            hdl_toplevel="ddr_fifo_sim_test",
+            build_args=build_test_args,
+            parameters=parameters,
+            timescale = ('1ns','1ps'),
+            waves=build_waves()
+        )
+        run_test_args = []
+        run_results = results_file(runner, "sim_build")
+        result_file = Path("sim_build") / env["FIFO_RESULT_FILE"]
+        # a point that dies before writing either must not pick up the previous point's
+        run_results.unlink(missing_ok=True)
+        result_file.unlink(missing_ok=True)
+        try:
+            run_tests(
+                runner,
+                test_dir="sim_build",
+                hdl_toplevel="ddr_fifo_sim_test",
+                test_module="test_ddr_fifo_wrap",
+                test_args=run_test_args,
+                extra_env=env
+            )
+        except SystemExit:
+            pass # counted from the point's own copy of the results below
+        point_results = Path("sim_build") / f"results_{name}.xml"
+        if run_results.is_file():
+            shutil.copyfile(run_results, point_results)
+            num_tests, num_failed = get_results(point_results)
+        else:
+            num_tests, num_failed = 0, 0 # the simulator never got to write one
+        if num_failed or not num_tests:
+            failed.append(name)
+        if result_file.is_file():
+            results[name] = json.loads(result_file.read_text())
+    with open(Path("sim_build") / "ddr_fifo_margin.json", "w") as f:
+        json.dump(results, f, indent=2)
+    margin_report(results)
+    if failed:
+        raise SystemExit(f"ERROR: {len(failed)} sweep points failed: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    is_runner()
@@ -0,0 +1,268 @@
+import cocotb
+import os
+import sys
+import json
+import time
+import random
+import logging
+from pathlib import Path
+from cocotb.triggers import FallingEdge, ReadOnly, Timer, with_timeout
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from mig_ui import MigStandIn, READ_LATENCY, REFRESH_CYCLES
+from stream_driver import skip_cycles
+from video_source import VideoTiming
+
+# Full 1280x720 RGB565 frames through top_level's DRAM frame buffer (frame_buffer_sim_test):
+# camera pixels into the stacker, the real FIFOs and traffic_generator around a MigStandIn,
+# and the unstacker read out by video_sig_gen's raster. Frame k is base + k * FRAME_STEP for
+# a random base, so every pixel of every frame differs from the same pixel of the others.
+#
+#   FRAMEBUFFER_FRAMES=2         camera frames to write
+#   FRAMEBUFFER_PIXEL_CYCLES=8   clk_camera cycles per camera pixel; 8 is the OV5640's 50 MHz PCLK
+#                                at two bytes a pixel, 1 sends pixels back to back
+#   MIG_READ_LATENCY, MIG_REFRESH_CYCLES, MIG_STALL_PROBABILITY   MigStandIn's stalls
+#
+# Writes a frame_buffer_report.json of bandwidth, stalls and FIFO occupancy next to results.xml.
+
+CAMERA_PERIOD_PS = 5000 # clk_camera, 200 MHz
+UI_PERIOD_PS = 12308 # clk_ui, 81.25 MHz
+PIXEL_PERIOD_PS = 13468 # clk_pixel, 74.25 MHz
+WIDTH, HEIGHT = 1280, 720
+PIXELS_PER_CHUNK = 8
+FRAME_PIXELS = WIDTH * HEIGHT
+FRAME_CHUNKS = FRAME_PIXELS // PIXELS_PER_CHUNK
+FRAME_STEP = 0x9E37 # odd, so frames repeat a pixel value only every 65536 frames
+TIMING = VideoTiming()
+NUM_FRAMES = int(os.getenv("FRAMEBUFFER_FRAMES", "2"))
+PIXEL_CYCLES = int(os.getenv("FRAMEBUFFER_PIXEL_CYCLES", "8"))
+MIG_READ_LATENCY = int(os.getenv("MIG_READ_LATENCY", str(READ_LATENCY)))
+MIG_REFRESH_CYCLES = int(os.getenv("MIG_REFRESH_CYCLES", str(REFRESH_CYCLES)))
+MIG_STALL_PROBABILITY = float(os.getenv("MIG_STALL_PROBABILITY", "0"))
+REPORT_FILE = "frame_buffer_report.json"
+FIFOS = ["camera_data_fifo", "pdfifo"]
+
+def to_chunks(frame):
+    """The 128-bit words the stacker makes of a frame, first pixel in the low 16 bits."""
+    raw = np.ascontiguousarray(frame, dtype="<u2").tobytes()
+    return [int.from_bytes(raw[i:i + 16], "little") for i in range(0, len(raw), 16)]
+
+def from_chunks(chunks):
+    """The pixels the unstacker makes of a list of 128-bit words."""
+    raw = b"".join(chunk.to_bytes(16, "little") for chunk in chunks)
+    return np.frombuffer(raw, dtype="<u2").astype(np.int64)
+
+async def drive_camera(dut, frames, pixel_cycles):
+    """Send frames to the stacker a pixel every pixel_cycles, tlast on each frame's last
+    pixel, ignoring camera_tready like top_level does. Returns how many pixels were sent
+    while it was low, which top_level would have lost."""
+    clk_edge = FallingEdge(dut.clk_camera)
+    period_ns = CAMERA_PERIOD_PS / 1000
+    valid, pixel, tlast, tready = dut.camera_valid, dut.camera_pixel, dut.camera_tlast, dut.camera_tready
+    dropped = 0
+    start = time.perf_counter()
+    await clk_edge
+    for frame in frames:
+        pixels = frame.ravel().tolist()
+        for p in pixels[:-1]:
+            dropped += not tready.value.integer
+            pixel.value = p
+            valid.value = 1
+            await clk_edge
+            if pixel_cycles > 1:
+                valid.value = 0
+                await skip_cycles(clk_edge, pixel_cycles - 1, period_ns)
+        dropped += not tready.value.integer
+        pixel.value = pixels[-1]
+        valid.value = 1
+        tlast.value = 1
+        await clk_edge
+        valid.value = 0
+        tlast.value = 0
+        await skip_cycles(clk_edge, pixel_cycles - 1, period_ns)
+    dut._log.info(f"Sent {len(frames)} camera frames at {len(frames) * FRAME_PIXELS / (time.perf_counter() - start):.0f} pixels/s")
+    return dropped
+
+async def capture_display(dut, frames):
+    """Append (pixels, valid, consumed) for each 720p frame the HDMI side shows: what
+    frame_buff_tdata/tvalid hold at each active pixel, and whether the unstacker handed that
+    pixel over (frame_buff_tready). Start it on the clk_pixel falling edge that releases
+    the reset, so the first pixel the unstacker hands over is seen."""
+    clk_edge = FallingEdge(dut.clk_pixel)
+    period_ns = PIXEL_PERIOD_PS / 1000
+    hcount, vcount = dut.hcount_hdmi, dut.vcount_hdmi
+    tdata, tvalid, tready = dut.frame_buff_tdata, dut.frame_buff_tvalid, dut.frame_buff_tready
+    h_blank = TIMING.total_pixels - WIDTH
+    v_blank = (TIMING.total_lines - HEIGHT) * TIMING.total_pixels
+    await ReadOnly()
+    position = vcount.value.integer * TIMING.total_pixels + hcount.value.integer
+    await skip_cycles(clk_edge, (TIMING.frame_cycles - position) % TIMING.frame_cycles, period_ns)
+    while True:
+        assert (hcount.value.integer, vcount.value.integer) == (0, 0), "Display capture lost the raster"
+        pixels, valid, consumed = [], [], []
+        for y in range(HEIGHT):
+            for x in range(WIDTH):
+                pixels.append(tdata.value.integer)
+                valid.append(tvalid.value.integer)
+                consumed.append(tready.value.integer)
+                await clk_edge
+            await skip_cycles(clk_edge, h_blank + (v_blank if y == HEIGHT - 1 else 0), period_ns)
+        valid = np.array(valid, dtype=bool).reshape(HEIGHT, WIDTH)
+        frames.append((np.array(pixels, dtype=np.int64).reshape(HEIGHT, WIDTH), valid,
+                       valid & np.array(consumed, dtype=bool).reshape(HEIGHT, WIDTH)))
+
+def fifo_report(dut, log):
+    """Peak occupancy, prog_full assertions and blocked beats of each ddr_fifo_wrap."""
+    report = {}
+    for name in FIFOS:
+        fifo = getattr(dut, name).xpm_fifo_axis_inst
+        report[name] = {
+            "peak_occupancy": fifo.peak_occupancy.value.integer,
+            "prog_full_count": fifo.prog_full_count.value.integer,
+            "blocked_count": fifo.blocked_count.value.integer,
+        }
+        log.info(f"{name}: peak occupancy {report[name]['peak_occupancy']}, prog_full went high "
+                 f"{report[name]['prog_full_count']} times, {report[name]['blocked_count']} cycles blocked")
+    return report
+
+def check_writes(mig, frames):
+    """Each camera frame reached DRAM as FRAME_CHUNKS writes to consecutive addresses from 0."""
+    assert len(mig.writes) == len(frames) * FRAME_CHUNKS, \
+        f"{len(mig.writes)} writes for {len(frames)} frames of {FRAME_CHUNKS} chunks"
+    addrs = np.array([addr for _, addr, _, _ in mig.writes]).reshape(len(frames), FRAME_CHUNKS)
+    for k, frame in enumerate(frames):
+        bad = np.flatnonzero(addrs[k] != np.arange(FRAME_CHUNKS) * PIXELS_PER_CHUNK)
+        assert len(bad) == 0, f"Frame {k}: chunk {bad[0]} written to {addrs[k, bad[0]]:#x}, {len(bad)} chunks misplaced"
+        data = [d for _, _, d, _ in mig.writes[k * FRAME_CHUNKS:(k + 1) * FRAME_CHUNKS]]
+        bad = [j for j, (got, chunk) in enumerate(zip(data, to_chunks(frame))) if got != chunk]
+        assert not bad, f"Frame {k}: {len(bad)} chunks written with the wrong data, first chunk {bad[0]}"
+
+def check_display(mig, shown, frames):
+    """Everything the unstacker handed over is the read data in order, and from the first
+    frame that starts on a frame boundary on, every display frame is one whole read pass
+    over the buffer, never shows an older camera frame at a pixel than the display frame
+    before it, and the last one is the last camera frame. Returns the aligned frame count."""
+    addrs = np.array([addr for _, addr, _, _ in mig.reads])
+    bad = np.flatnonzero(addrs != np.arange(len(addrs)) % FRAME_CHUNKS * PIXELS_PER_CHUNK)
+    assert len(bad) == 0, f"Read {bad[0]} went to {addrs[bad[0]]:#x}, out of order"
+    read_pixels = from_chunks([data for _, _, data, _ in mig.reads])
+    read_tags = np.array([-1 if tag is None else tag for _, _, _, tag in mig.reads])
+
+    handed = np.concatenate([pixels[consumed] for pixels, _, consumed in shown])
+    assert len(handed) <= len(read_pixels), f"Display took {len(handed)} pixels, only {len(read_pixels)} were read"
+    bad = np.flatnonzero(handed != read_pixels[:len(handed)])
+    assert len(bad) == 0, (f"Pixel {bad[0]} handed to the display is {handed[bad[0]]:#06x}, "
+                           f"read {read_pixels[bad[0]]:#06x} from DRAM; {len(bad)} differ")
+
+    before = np.cumsum([0] + [consumed.sum() for _, _, consumed in shown])
+    aligned = [d for d, (_, _, consumed) in enumerate(shown) if consumed.all() and before[d] % FRAME_PIXELS == 0]
+    assert aligned, "No display frame started on a frame boundary"
+    first = aligned[0]
+    prev_tags = None
+    for d in range(first, len(shown)):
+        pixels, valid, consumed = shown[d]
+        assert valid.all(), f"Display frame {d}: {np.count_nonzero(~valid)} active pixels with no data (underflow)"
+        assert consumed.all(), f"Display frame {d}: the unstacker held {np.count_nonzero(~consumed)} pixels, tlast is misaligned"
+        assert before[d] % FRAME_PIXELS == 0, f"Display frame {d} starts {before[d] % FRAME_PIXELS} pixels into a read pass"
+        chunk = before[d] // PIXELS_PER_CHUNK
+        tags = read_tags[chunk:chunk + FRAME_CHUNKS]
+        if prev_tags is not None:
+            older = np.flatnonzero(tags < prev_tags)
+            assert len(older) == 0, (f"Display frame {d} shows chunk {older[0]} from camera frame {tags[older[0]]} "
+                                     f"after frame {prev_tags[older[0]]}")
+        prev_tags = tags
+    assert (prev_tags == len(frames) - 1).all(), "Last display frame is not all from the last camera frame"
+    bad = shown[-1][0] != frames[-1]
+    ys, xs = np.nonzero(bad)
+    assert not bad.any(), (f"Last display frame: {len(ys)} pixels differ from the last camera frame, "
+                           f"first ({xs[0]}, {ys[0]}): {shown[-1][0][ys[0], xs[0]]:#06x} instead of {frames[-1][ys[0], xs[0]]:#06x}")
+    return len(shown) - first
+
+@cocotb.test()
+async def test_frames(dut):
+    """Camera frames through the DRAM frame buffer come out intact and in order."""
+    rng = np.random.default_rng(random.getrandbits(32))
+    base = rng.integers(0, 1 << 16, size=(HEIGHT, WIDTH))
+    frames = [(base + k * FRAME_STEP) & 0xFFFF for k in range(NUM_FRAMES)]
+
+    dut.rst_in.value = 1
+    dut.camera_valid.value = 0
+    dut.camera_tlast.value = 0
+    dut.camera_pixel.value = 0
+    mig = MigStandIn(dut, dut.clk_ui, UI_PERIOD_PS, read_latency=MIG_READ_LATENCY, refresh_cycles=MIG_REFRESH_CYCLES,
+                     stall_probability=MIG_STALL_PROBABILITY, seed=random.getrandbits(32))
+    mig.tag_writes = lambda index, addr, data: index // FRAME_CHUNKS # which camera frame
+    await mig.reset()
+    await FallingEdge(dut.clk_pixel)
+    dut.rst_in.value = 0
+    shown = []
+    cocotb.start_soon(capture_display(dut, shown))
+    mig.start()
+
+    start = time.perf_counter()
+    dropped = await drive_camera(dut, frames, PIXEL_CYCLES)
+    assert dropped == 0, f"{dropped} camera pixels sent while the stacker was not ready"
+    # the last chunks still have to get through the camera FIFO
+    async def writes_done():
+        while len(mig.writes) < NUM_FRAMES * FRAME_CHUNKS:
+            await Timer(10, units="us")
+    await with_timeout(writes_done(), 1, "ms")
+    # a display frame that reads the buffer entirely after the last write
+    settled = len(shown)
+    while len(shown) < settled + 2:
+        await Timer(1, units="ms")
+    dut._log.info(f"Simulated {NUM_FRAMES} camera and {len(shown)} display frames in {time.perf_counter() - start:.0f}s")
+
+    report = {"mig": mig.bandwidth(dut._log), "fifos": fifo_report(dut, dut._log)}
+    report["display_frames"] = len(shown)
+    report["camera_pixel_cycles"] = PIXEL_CYCLES
+    with open(REPORT_FILE, "w") as f:
+        json.dump(report, f, indent=2)
+
+    assert mig.stats["dropped_reads"] == 0, f"{mig.stats['dropped_reads']} reads came back with the read FIFO full"
+    check_writes(mig, frames)
+    aligned = check_display(mig, shown, frames)
+    dut._log.info(f"{aligned} display frames aligned to the buffer, the last one the last camera frame")
+
+def is_runner():
+    """Frame Buffer Testing."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "sim" / "hdl" / "frame_buffer_sim_test.sv"]
+    sources += [proj_path / "sim" / "hdl" / "xpm_fifo_axis.sv"]
+    sources += [proj_path / "hdl" / "stacker.sv"]
+    sources += [proj_path / "hdl" / "ddr_fifo_wrap.sv"]
+    sources += [proj_path / "hdl" / "traffic_generator.sv"]
+    sources += [proj_path / "hdl" / "evt_counter.sv"]
+    sources += [proj_path / "hdl" / "unstacker.sv"]
+    sources += [proj_path / "hdl" / "video_sig_gen.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {'CAMERA_PERIOD_PS': CAMERA_PERIOD_PS, 'UI_PERIOD_PS': UI_PERIOD_PS, 'PIXEL_PERIOD_PS': PIXEL_PERIOD_PS}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="frame_buffer_sim_test",
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps'),
+        waves=build_waves()
+    )
+    run_test_args = []
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="frame_buffer_sim_test",
+        test_module="test_frame_buffer",
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
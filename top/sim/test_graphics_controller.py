@@ -8,80 +8,120 @@ from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner
-import random
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+import numpy as np
+from video_source import VideoTiming, drive_frame
+from frame_scoreboard import FrameCapture, check_frame
 
 ACTIVE_H_PIXELS = 1280
 ACTIVE_LINES = 720
+TIMING = VideoTiming(ACTIVE_H_PIXELS, active_lines=ACTIVE_LINES)
 
-@cocotb.test()
-async def test_a(dut):
-    """cocotb test for image_sprite"""
-    assert False, "Test bench has not been updated"
-    dut._log.info("Starting...")
+GAME_OVER, GAME_IN_PROGRESS, GAME_WIN = 0, 1, 2
+NUM_PLAYERS = 2
+WALL_DEPTH = 62
+PLAYER_DEPTHS = [60, 40, 70, 10]
+
+def scene():
+    """Deterministic in-game inputs: a colour gradient from the camera, a checkerboard wall
+    with a hole in the middle and three players, colliding wherever they overlap the wall."""
+    y, x = np.mgrid[0:ACTIVE_LINES, 0:ACTIVE_H_PIXELS]
+    pixel_in = ((x >> 3) << 16) | ((y >> 2) << 8) | 0x40
+    hole = (abs(x - 640) < 200) & (abs(y - 400) < 250)
+    is_wall = ((x // 160 + y // 120) % 2 == 0) & ~hole
+    centers = [(350, 400), (640, 420), (930, 380)]
+    is_player = np.zeros_like(is_wall)
+    pixel_player_num = np.zeros_like(x)
+    for p, (cx, cy) in enumerate(centers):
+        body = ((x - cx) / 90.0) ** 2 + ((y - cy) / 220.0) ** 2 <= 1
+        is_player |= body
+        pixel_player_num[body] = p
+    return {
+        "pixel_in": pixel_in,
+        "is_wall": is_wall,
+        "is_player": is_player,
+        "is_collision": is_player & is_wall,
+        "pixel_player_num": pixel_player_num,
+    }
+
+async def reset(dut):
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    dut.rst_in.value = 0
-    await ClockCycles(dut.clk_in,1)
     dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,5)
+    dut.hcount_in.value = 0
+    dut.vcount_in.value = 0
+    dut.wall_depth.value = WALL_DEPTH
+    dut.num_players.value = NUM_PLAYERS
+    for p, depth in enumerate(PLAYER_DEPTHS):
+        dut.player_depths[p].value = depth
+    for name in scene():
+        getattr(dut, name).value = 0
+    await ClockCycles(dut.clk_in, 5)
+    await FallingEdge(dut.clk_in)
     dut.rst_in.value = 0
-    await RisingEdge(dut.clk_in)
+    await FallingEdge(dut.clk_in)
+
+async def capture_frame(dut, game_state, sideband=None):
+    """One full frame of pixel_out. The output is combinational, so it is read on the same
+    falling edge the next pixel is driven on."""
+    dut.game_state_in.value = game_state
+    capture = FrameCapture(dut.pixel_out, ACTIVE_H_PIXELS, ACTIVE_LINES)
+    await drive_frame(dut, TIMING, sideband, clk_edge=FallingEdge(dut.clk_in), valid=None,
+                      skip_blanking=True, capture=capture)
+    return capture.frame
 
-    # Go through all the values from 0 to ACTIVE_H_PIXELS and ACTIVE_LINES
-    # and check that the output is as expected f
-    
-    dut.h_count_in.value = 0
-    dut.v_count_in.value = 0
-    dut.pixel_in.value = 0
-    dut.is_wall.value = 0
-    dut.wall_color.value = 0
-    await ClockCycles(dut.clk_in,1)
+@cocotb.test()
+async def test_game_over(dut):
+    """The game over screen replaces the whole frame"""
+    await reset(dut)
+    frame = await capture_frame(dut, GAME_OVER, scene())
+    check_frame(dut._log, "graphics_game_over", frame)
 
-    for j in range(0, ACTIVE_LINES, 16):
-        for i in range(0, ACTIVE_H_PIXELS, 16):
-            dut.h_count_in.value = i
-            dut.v_count_in.value = j
-            pixel_in = random.randint(0,2**16-1)
-            dut.pixel_in.value = pixel_in
-            is_wall = random.randint(0,1)
-            dut.is_wall.value = is_wall
-            wall_color = random.randint(0,2**16-1)
-            dut.wall_color.value = wall_color
-            await RisingEdge(dut.clk_in)
-            if is_wall:
-                assert dut.pixel_out.value == wall_color
-            else:
-                assert dut.pixel_out.value == pixel_in
-            await ClockCycles(dut.clk_in,1)
+@cocotb.test()
+async def test_game_win(dut):
+    """The win screen replaces the whole frame"""
+    await reset(dut)
+    frame = await capture_frame(dut, GAME_WIN, scene())
+    check_frame(dut._log, "graphics_game_win", frame)
+
+@cocotb.test()
+async def test_in_progress(dut):
+    """Wall depth sprite over collisions over the wall over the players over the camera"""
+    await reset(dut)
+    frame = await capture_frame(dut, GAME_IN_PROGRESS, scene())
+    check_frame(dut._log, "graphics_in_progress", frame)
 
-    
 def is_runner():
     """Graphics Controller Testing."""
     hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
     sim = os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
     sys.path.append(str(proj_path / "sim" / "model"))
-    sources = [proj_path / "hdl" / "graphics_controller.sv"]
+    sources = [proj_path / "hdl" / "graphics_controller.sv",
+               proj_path / "hdl" / "wall_depth_sprite.sv",
+               proj_path / "hdl" / "game_over_sprite.sv",
+               proj_path / "hdl" / "game_win_sprite.sv"]
     build_test_args = ["-Wall"]
     parameters = {'ACTIVE_H_PIXELS':ACTIVE_H_PIXELS,'ACTIVE_LINES':ACTIVE_LINES}
     sys.path.append(str(proj_path / "sim"))
     runner = get_runner(sim)
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel="graphics_controller",
-        always=True,
         build_args=build_test_args,
         parameters=parameters,
         timescale = ('1ns','1ps'),
-        waves=True
+        waves=build_waves()
     )
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel="graphics_controller",
         test_module="test_graphics_controller",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
     is_runner()
-
@@ -8,446 +8,152 @@ from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
 import random
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from kmeans_model import NUM_CENTROIDS, initial_centroids, frame_points, kmeans_step
+from stream_driver import stream_frame
+from stimulus_trace import recorder, replay_trace, replay
 
 ACTIVE_H_PIXELS = 1280
 ACTIVE_LINES = 720
+STRIDE = int(os.getenv("KMEANS_STRIDE", "4")) # send every 4th pixel in x and y by default, KMEANS_STRIDE=1 for full frames
 
-@cocotb.test()
-async def test_one_player(dut):
-    """cocotb test for moving frame k means with one player. Should just be center of mass."""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    dut.rst_in.value = 0
-    await ClockCycles(dut.clk_in,1)
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,5)
-    dut.rst_in.value = 0
-    await RisingEdge(dut.clk_in)
-    dut.num_players.value = 0
-
-    # Go through all values from 0 to 1280 and 0 to 720 and randomly assign it value_in 1 or 0
-    # keep internal track of the center of mass for comparison
+TRACE_CHUNK_FRAMES = 16 # a KMEANS_STRIDE=1 frame is ~1MB of valid bits before compression
 
-    for num_tests in range(0, 3):
-        x_sum = 0
-        y_sum = 0
-        total = 0
+def trace_fields(stride=STRIDE):
+    """One transaction per frame; reset marks the frames that start from a freshly reset DUT."""
+    return {"reset": ("input", np.bool_, ()),
+            "num_players": ("input", np.uint8, ()),
+            "valid": ("input", np.bool_, (ACTIVE_LINES // stride, ACTIVE_H_PIXELS // stride)),
+            "x_out": ("expected", np.uint16, (NUM_CENTROIDS,)),
+            "y_out": ("expected", np.uint16, (NUM_CENTROIDS,))}
 
-        for j in range(0, ACTIVE_LINES, 4):
-            for i in range(0, ACTIVE_H_PIXELS, 4):
-                dut.x_in.value = i
-                dut.y_in.value = j
-                valid_in = random.randint(0,1)
-                total += valid_in
-                dut.valid_in.value = valid_in
-                x_sum += valid_in * i
-                y_sum += valid_in * j
-                await ClockCycles(dut.clk_in,1)
+def trace_info(stride=STRIDE, **info):
+    return dict(dut="moving_frame_k_means", stride=stride, width=ACTIVE_H_PIXELS, height=ACTIVE_LINES, **info)
 
-        dut.tabulate_in.value = 1
-        dut.valid_in.value = 0
-        await ClockCycles(dut.clk_in,1)
-        dut.tabulate_in.value = 0
-        await with_timeout(RisingEdge(dut.valid_out), 100000, "ns")
-        await ClockCycles(dut.clk_in,1)
-        
-        expected_x = x_sum // total
-        expected_y = y_sum // total
-
-        assert dut.valid_out.value == 1, f"Expected valid_out to be 1, got {dut.valid_out.value} on trial {num_tests}"
-        assert dut.x_out[0].value == expected_x, f"Expected x_out[0] to be {expected_x}, got {dut.x_out[0].value.integer} on trial {num_tests}"
-        assert dut.y_out[0].value == expected_y, f"Expected y_out[0] to be {expected_y}, got {dut.y_out[0].value.integer} on trial {num_tests}"
-
-        await ClockCycles(dut.clk_in,1)
-        assert dut.valid_out.value == 0
-
-        await ClockCycles(dut.clk_in,200)
-
-def manhattan_distance(x1, y1, x2, y2):
-    return abs(x1 - x2) + abs(y1 - y2)
-
-@cocotb.test()
-async def test_two_players(dut):
-    """cocotb test for moving frame k means with two player. Tracking two centroids."""
+async def reset_dut(dut):
+    """Start the clock and reset the DUT; all centroids come out of reset at (0, 0)."""
     dut._log.info("Starting...")
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    await apply_reset(dut)
+
+async def apply_reset(dut):
     dut.rst_in.value = 0
     await ClockCycles(dut.clk_in,1)
     dut.rst_in.value = 1
     await ClockCycles(dut.clk_in,5)
     dut.rst_in.value = 0
     await RisingEdge(dut.clk_in)
-    dut.num_players.value = 1 # two players
-
-    # initialize two centroids
-    # assumes both are initialized to 0 and that all centroids will go to player 1 on the first iteration
-
-    centroid_1_x = 0
-    centroid_1_y = 0
-    centroid_2_x = 0
-    centroid_2_y = 0
-
-    for num_tests in range(0,5):
-        sum_x_1 = 0
-        sum_y_1 = 0
-        sum_x_2 = 0
-        sum_y_2 = 0
-        total_1 = 0
-        total_2 = 0
 
-        for j in range(0, ACTIVE_LINES, 4):
-            for i in range(0, ACTIVE_H_PIXELS, 4):
-                dut.x_in.value = i
-                dut.y_in.value = j
-                valid_in = random.randint(0,1)
-                dut.valid_in.value = valid_in
-                if manhattan_distance(centroid_1_x, centroid_1_y, i, j) <= manhattan_distance(centroid_2_x, centroid_2_y, i, j):
-                    sum_x_1 += valid_in * i
-                    sum_y_1 += valid_in * j
-                    total_1 += valid_in
-                else:
-                    sum_x_2 += valid_in * i
-                    sum_y_2 += valid_in * j
-                    total_2 += valid_in
-                await ClockCycles(dut.clk_in,1)
+def random_frame(rng, stride=STRIDE):
+    """Randomly assign valid_in 1 or 0 to every sampled pixel of the frame."""
+    return rng.integers(0, 2, size=(ACTIVE_LINES // stride, ACTIVE_H_PIXELS // stride)).astype(bool)
 
-        dut.tabulate_in.value = 1
-        dut.valid_in.value = 0
-        await ClockCycles(dut.clk_in,1)
-        dut.tabulate_in.value = 0
-        await with_timeout(RisingEdge(dut.valid_out), 100000, "ns")
-        await ClockCycles(dut.clk_in,1)
+async def drive_frame(dut, valid, stride=STRIDE):
+    """Stream one frame to the DUT a pixel per cycle, then tabulate."""
+    await stream_frame(dut, valid, stride)
 
-        centroid_1_x = 0 if total_1 == 0 else sum_x_1 // total_1
-        centroid_1_y = 0 if total_1 == 0 else sum_y_1 // total_1
-        centroid_2_x = 0 if total_2 == 0 else sum_x_2 // total_2
-        centroid_2_y = 0 if total_2 == 0 else sum_y_2 // total_2
-
-        # print("Expected Centroid 1:", centroid_1_x, centroid_1_y)
-        # print("Expected Centroid 2:", centroid_2_x, centroid_2_y)
+    dut.tabulate_in.value = 1
+    dut.valid_in.value = 0
+    await ClockCycles(dut.clk_in,1)
+    dut.tabulate_in.value = 0
+
+def kmeans_transactions(rng, num_trials, choose_num_players, stride=STRIDE):
+    """num_trials random frames from reset with the golden model's centroids after each.
+    choose_num_players(trial) gives the num_players input (players - 1) for each frame."""
+    centroids = initial_centroids()
+    for trial in range(num_trials):
+        num_players = choose_num_players(trial)
+        valid = random_frame(rng, stride)
+        xs, ys = frame_points(valid, stride)
+        centroids = kmeans_step(xs, ys, centroids, num_players)
+        yield {"reset": trial == 0, "num_players": num_players, "valid": valid,
+               "x_out": centroids[:, 0].copy(), "y_out": centroids[:, 1].copy()}
+
+async def run_frame(dut, num_players, valid, stride=STRIDE):
+    """Drive one frame and return the centroids from the valid_out pulse that answers it."""
+    dut.num_players.value = num_players
+    await drive_frame(dut, valid, stride)
+    await with_timeout(RisingEdge(dut.valid_out), 100000, "ns")
+    await ClockCycles(dut.clk_in,1)
 
-        assert dut.valid_out.value == 1, f"Expected valid_out to be 1, got {dut.valid_out.value} on trial {num_tests}"
-        assert dut.x_out[0].value == centroid_1_x, f"Expected x_out[0] to be {centroid_1_x}, got {dut.x_out[0].value.integer} on trial {num_tests}"
-        assert dut.y_out[0].value == centroid_1_y, f"Expected y_out[0] to be {centroid_1_y}, got {dut.y_out[0].value.integer} on trial {num_tests}"
+    assert dut.valid_out.value == 1, f"Expected valid_out to be 1, got {dut.valid_out.value}"
+    observed = {"x_out": [dut.x_out[p].value.integer for p in range(NUM_CENTROIDS)],
+                "y_out": [dut.y_out[p].value.integer for p in range(NUM_CENTROIDS)]}
 
-        assert dut.x_out[1].value == centroid_2_x, f"Expected x_out[1] to be {centroid_2_x}, got {dut.x_out[1].value.integer} on trial {num_tests}"
-        assert dut.y_out[1].value == centroid_2_y, f"Expected y_out[1] to be {centroid_2_y}, got {dut.y_out[1].value.integer} on trial {num_tests}"
+    await ClockCycles(dut.clk_in,1)
+    assert dut.valid_out.value == 0
+
+    await ClockCycles(dut.clk_in,200)
+    return observed
+
+async def run_trials(dut, num_trials, choose_num_players, name):
+    """Drive num_trials random frames and check every centroid against the golden model,
+    recording them to traces/<name>.trace with TRACE_RECORD=1."""
+    # seed numpy from cocotb's seeded random so RANDOM_SEED reproduces a run
+    seed = random.getrandbits(32)
+    rng = np.random.default_rng(seed)
+
+    with recorder(name, trace_fields(), trace_info(seed=seed), TRACE_CHUNK_FRAMES) as trace:
+        for num_tests, transaction in enumerate(kmeans_transactions(rng, num_trials, choose_num_players)):
+            observed = await run_frame(dut, transaction["num_players"], transaction["valid"])
+            for p in range(NUM_CENTROIDS):
+                expected_x, expected_y = transaction["x_out"][p], transaction["y_out"][p]
+                assert observed["x_out"][p] == expected_x, f"Expected x_out[{p}] to be {expected_x}, got {observed['x_out'][p]} on trial {num_tests}"
+                assert observed["y_out"][p] == expected_y, f"Expected y_out[{p}] to be {expected_y}, got {observed['y_out'][p]} on trial {num_tests}"
+            if trace:
+                trace.append(**transaction)
 
-        await ClockCycles(dut.clk_in,1)
-        assert dut.valid_out.value == 0
-        await ClockCycles(dut.clk_in,4)
-    
-        await ClockCycles(dut.clk_in,200)
+@cocotb.test()
+async def test_one_player(dut):
+    """cocotb test for moving frame k means with one player. Should just be center of mass."""
+    await reset_dut(dut)
+    await run_trials(dut, 3, lambda trial: 0, "kmeans_one_player")
 
+@cocotb.test()
+async def test_two_players(dut):
+    """cocotb test for moving frame k means with two player. Tracking two centroids."""
+    await reset_dut(dut)
+    await run_trials(dut, 5, lambda trial: 1, "kmeans_two_players")
 
 @cocotb.test()
 async def test_three_players(dut):
     """cocotb test for moving frame k means with three players. Tracking three centroids."""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    dut.rst_in.value = 0
-    await ClockCycles(dut.clk_in,1)
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,5)
-    dut.rst_in.value = 0
-    await RisingEdge(dut.clk_in)
-    dut.num_players.value = 2 # three players
-
-    # initialize three centroids
-    # assumes both are initialized to 0 and that all centroids will go to player 1 on the first iteration
-
-    centroid_1_x = 0
-    centroid_1_y = 0
-    centroid_2_x = 0
-    centroid_2_y = 0
-    centroid_3_x = 0
-    centroid_3_y = 0
-
-    for num_tests in range(0,5):
-        sum_x_1 = 0
-        sum_y_1 = 0
-        sum_x_2 = 0
-        sum_y_2 = 0
-        sum_x_3 = 0
-        sum_y_3 = 0
-        total_1 = 0
-        total_2 = 0
-        total_3 = 0
-
-        for j in range(0, ACTIVE_LINES, 4):
-            for i in range(0, ACTIVE_H_PIXELS, 4):
-                dut.x_in.value = i
-                dut.y_in.value = j
-                valid_in = random.randint(0,1)
-                dut.valid_in.value = valid_in
-                distance_1 = manhattan_distance(centroid_1_x, centroid_1_y, i, j)
-                distance_2 = manhattan_distance(centroid_2_x, centroid_2_y, i, j)
-                distance_3 = manhattan_distance(centroid_3_x, centroid_3_y, i, j)
-                if distance_1 <= distance_2 and distance_1 <= distance_3:
-                    sum_x_1 += valid_in * i
-                    sum_y_1 += valid_in * j
-                    total_1 += valid_in
-                elif distance_2 <= distance_1 and distance_2 <= distance_3:
-                    sum_x_2 += valid_in * i
-                    sum_y_2 += valid_in * j
-                    total_2 += valid_in
-                else:
-                    sum_x_3 += valid_in * i
-                    sum_y_3 += valid_in * j
-                    total_3 += valid_in
-                await ClockCycles(dut.clk_in,1)
-
-        dut.tabulate_in.value = 1
-        dut.valid_in.value = 0
-        await ClockCycles(dut.clk_in,1)
-        dut.tabulate_in.value = 0
-        await with_timeout(RisingEdge(dut.valid_out), 100000, "ns")
-        await ClockCycles(dut.clk_in,1)
-
-        centroid_1_x = 0 if total_1 == 0 else sum_x_1 // total_1
-        centroid_1_y = 0 if total_1 == 0 else sum_y_1 // total_1
-        centroid_2_x = 0 if total_2 == 0 else sum_x_2 // total_2
-        centroid_2_y = 0 if total_2 == 0 else sum_y_2 // total_2
-        centroid_3_x = 0 if total_3 == 0 else sum_x_3 // total_3
-        centroid_3_y = 0 if total_3 == 0 else sum_y_3 // total_3
-
-        # print("Expected Centroid 1:", centroid_1_x, centroid_1_y)
-        # print("Expected Centroid 2:", centroid_2_x, centroid_2_y)
-
-        assert dut.valid_out.value == 1, f"Expected valid_out to be 1, got {dut.valid_out.value} on trial {num_tests}"
-        assert dut.x_out[0].value == centroid_1_x, f"Expected x_out[0] to be {centroid_1_x}, got {dut.x_out[0].value.integer} on trial {num_tests}"
-        assert dut.y_out[0].value == centroid_1_y, f"Expected y_out[0] to be {centroid_1_y}, got {dut.y_out[0].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[1].value == centroid_2_x, f"Expected x_out[1] to be {centroid_2_x}, got {dut.x_out[1].value.integer} on trial {num_tests}"
-        assert dut.y_out[1].value == centroid_2_y, f"Expected y_out[1] to be {centroid_2_y}, got {dut.y_out[1].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[2].value == centroid_3_x, f"Expected x_out[2] to be {centroid_3_x}, got {dut.x_out[2].value.integer} on trial {num_tests}"
-        assert dut.y_out[2].value == centroid_3_y, f"Expected y_out[2] to be {centroid_3_y}, got {dut.y_out[2].value.integer} on trial {num_tests}"
-
-        await ClockCycles(dut.clk_in,1)
-        assert dut.valid_out.value == 0
-        await ClockCycles(dut.clk_in,4)
-
-        await ClockCycles(dut.clk_in,200)
+    await reset_dut(dut)
+    await run_trials(dut, 5, lambda trial: 2, "kmeans_three_players")
 
 @cocotb.test()
 async def test_four_players(dut):
     """cocotb test for moving frame k means with four players. Tracking four centroids."""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    dut.rst_in.value = 0
-    await ClockCycles(dut.clk_in,1)
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,5)
-    dut.rst_in.value = 0
-    await RisingEdge(dut.clk_in)
-    dut.num_players.value = 3 # four players
-
-    # Initialize four players
-    # assumes both are initialized to 0 and that all centroids will go to player 1 on the first iteration
-
-    centroid_1_x = 0
-    centroid_1_y = 0
-    centroid_2_x = 0
-    centroid_2_y = 0
-    centroid_3_x = 0
-    centroid_3_y = 0
-    centroid_4_x = 0
-    centroid_4_y = 0
-
-    for num_tests in range(0,5):
-        sum_x_1 = 0
-        sum_y_1 = 0
-        sum_x_2 = 0
-        sum_y_2 = 0
-        sum_x_3 = 0
-        sum_y_3 = 0
-        sum_x_4 = 0
-        sum_y_4 = 0
-        total_1 = 0
-        total_2 = 0
-        total_3 = 0
-        total_4 = 0
-
-        for j in range(0, ACTIVE_LINES, 4):
-            for i in range(0, ACTIVE_H_PIXELS, 4):
-                dut.x_in.value = i
-                dut.y_in.value = j
-                valid_in = random.randint(0,1)
-                dut.valid_in.value = valid_in
-                distance_1 = manhattan_distance(centroid_1_x, centroid_1_y, i, j)
-                distance_2 = manhattan_distance(centroid_2_x, centroid_2_y, i, j)
-                distance_3 = manhattan_distance(centroid_3_x, centroid_3_y, i, j)
-                distance_4 = manhattan_distance(centroid_4_x, centroid_4_y, i, j)
-                if distance_1 <= distance_2 and distance_1 <= distance_3 and distance_1 <= distance_4: 
-                    sum_x_1 += valid_in * i
-                    sum_y_1 += valid_in * j
-                    total_1 += valid_in
-                elif distance_2 <= distance_1 and distance_2 <= distance_3 and distance_2 <= distance_4:
-                    sum_x_2 += valid_in * i
-                    sum_y_2 += valid_in * j
-                    total_2 += valid_in
-                elif distance_3 <= distance_1 and distance_3 <= distance_2 and distance_3 <= distance_4:
-                    sum_x_3 += valid_in * i
-                    sum_y_3 += valid_in * j
-                    total_3 += valid_in
-                else:
-                    sum_x_4 += valid_in * i
-                    sum_y_4 += valid_in * j
-                    total_4 += valid_in
-                await ClockCycles(dut.clk_in,1)
-
-        dut.tabulate_in.value = 1
-        dut.valid_in.value = 0
-        await ClockCycles(dut.clk_in,1)
-        dut.tabulate_in.value = 0
-        await with_timeout(RisingEdge(dut.valid_out), 100000, "ns")
-        await ClockCycles(dut.clk_in,1)
-
-        centroid_1_x = 0 if total_1 == 0 else sum_x_1 // total_1
-        centroid_1_y = 0 if total_1 == 0 else sum_y_1 // total_1
-        centroid_2_x = 0 if total_2 == 0 else sum_x_2 // total_2
-        centroid_2_y = 0 if total_2 == 0 else sum_y_2 // total_2
-        centroid_3_x = 0 if total_3 == 0 else sum_x_3 // total_3
-        centroid_3_y = 0 if total_3 == 0 else sum_y_3 // total_3
-        centroid_4_x = 0 if total_4 == 0 else sum_x_4 // total_4
-        centroid_4_y = 0 if total_4 == 0 else sum_y_4 // total_4
-
-        # print("Expected Centroid 1:", centroid_1_x, centroid_1_y)
-        # print("Expected Centroid 2:", centroid_2_x, centroid_2_y)
-
-        assert dut.valid_out.value == 1, f"Expected valid_out to be 1, got {dut.valid_out.value} on trial {num_tests}"
-        assert dut.x_out[0].value == centroid_1_x, f"Expected x_out[0] to be {centroid_1_x}, got {dut.x_out[0].value.integer} on trial {num_tests}"
-        assert dut.y_out[0].value == centroid_1_y, f"Expected y_out[0] to be {centroid_1_y}, got {dut.y_out[0].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[1].value == centroid_2_x, f"Expected x_out[1] to be {centroid_2_x}, got {dut.x_out[1].value.integer} on trial {num_tests}"
-        assert dut.y_out[1].value == centroid_2_y, f"Expected y_out[1] to be {centroid_2_y}, got {dut.y_out[1].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[2].value == centroid_3_x, f"Expected x_out[2] to be {centroid_3_x}, got {dut.x_out[2].value.integer} on trial {num_tests}"
-        assert dut.y_out[2].value == centroid_3_y, f"Expected y_out[2] to be {centroid_3_y}, got {dut.y_out[2].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[3].value == centroid_4_x, f"Expected x_out[3] to be {centroid_4_x}, got {dut.x_out[3].value.integer} on trial {num_tests}"
-        assert dut.y_out[3].value == centroid_4_y, f"Expected y_out[3] to be {centroid_4_y}, got {dut.y_out[3].value.integer} on trial {num_tests}"
-
-        await ClockCycles(dut.clk_in,1)
-        assert dut.valid_out.value == 0
-        await ClockCycles(dut.clk_in,4)
-
-        await ClockCycles(dut.clk_in,200)
+    await reset_dut(dut)
+    await run_trials(dut, 5, lambda trial: 3, "kmeans_four_players")
 
 @cocotb.test()
 async def test_changing_players(dut):
     """cocotb test for moving frame k means with changing player counts. Tracking variable number of centroids."""
-    dut._log.info("Starting...")
-    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-    dut.rst_in.value = 0
-    await ClockCycles(dut.clk_in,1)
-    dut.rst_in.value = 1
-    await ClockCycles(dut.clk_in,5)
-    dut.rst_in.value = 0
-    await RisingEdge(dut.clk_in)
-    num_players = 3 # four players
-    dut.num_players.value = num_players # four players
-
-    # Initialize four players
-    # assumes both are initialized to 0 and that all centroids will go to player 1 on the first iteration
-
-    centroid_1_x = 0
-    centroid_1_y = 0
-    centroid_2_x = 0
-    centroid_2_y = 0
-    centroid_3_x = 0
-    centroid_3_y = 0
-    centroid_4_x = 0
-    centroid_4_y = 0
-
-    for num_tests in range(0,20):
-        sum_x_1 = 0
-        sum_y_1 = 0
-        sum_x_2 = 0
-        sum_y_2 = 0
-        sum_x_3 = 0
-        sum_y_3 = 0
-        sum_x_4 = 0
-        sum_y_4 = 0
-        total_1 = 0
-        total_2 = 0
-        total_3 = 0
-        total_4 = 0
-        num_players = random.randint(0,3)
-        dut.num_players.value = num_players
-
-        for j in range(0, ACTIVE_LINES, 4):
-            for i in range(0, ACTIVE_H_PIXELS, 4):
-                dut.x_in.value = i
-                dut.y_in.value = j
-                valid_in = random.randint(0,1)
-                dut.valid_in.value = valid_in
-                distance_1 = manhattan_distance(centroid_1_x, centroid_1_y, i, j)
-                distance_2 = manhattan_distance(centroid_2_x, centroid_2_y, i, j)
-                distance_3 = manhattan_distance(centroid_3_x, centroid_3_y, i, j)
-                distance_4 = manhattan_distance(centroid_4_x, centroid_4_y, i, j)
-                if num_players == 0 or (distance_1 <= distance_2 and (num_players <= 1 or (distance_1 <= distance_3 and (num_players <= 2 or (distance_1 <= distance_4))))): 
-                    sum_x_1 += valid_in * i
-                    sum_y_1 += valid_in * j
-                    total_1 += valid_in
-                elif distance_2 <= distance_1 and (num_players <= 1 or (distance_2 <= distance_3 and (num_players <= 2 or (distance_2 <= distance_4)))):
-                    sum_x_2 += valid_in * i
-                    sum_y_2 += valid_in * j
-                    total_2 += valid_in
-                elif distance_3 <= distance_1 and distance_3 <= distance_2 and (num_players <= 2 or (distance_3 <= distance_4)):
-                    sum_x_3 += valid_in * i
-                    sum_y_3 += valid_in * j
-                    total_3 += valid_in
-                else:
-                    sum_x_4 += valid_in * i
-                    sum_y_4 += valid_in * j
-                    total_4 += valid_in
-                await ClockCycles(dut.clk_in,1)
-
-        dut.tabulate_in.value = 1
-        dut.valid_in.value = 0
-        await ClockCycles(dut.clk_in,1)
-        dut.tabulate_in.value = 0
-        await with_timeout(RisingEdge(dut.valid_out), 100000, "ns")
-        await ClockCycles(dut.clk_in,1)
-
-        centroid_1_x = 0 if total_1 == 0 else sum_x_1 // total_1
-        centroid_1_y = 0 if total_1 == 0 else sum_y_1 // total_1
-        centroid_2_x = 0 if total_2 == 0 else sum_x_2 // total_2
-        centroid_2_y = 0 if total_2 == 0 else sum_y_2 // total_2
-        centroid_3_x = 0 if total_3 == 0 else sum_x_3 // total_3
-        centroid_3_y = 0 if total_3 == 0 else sum_y_3 // total_3
-        centroid_4_x = 0 if total_4 == 0 else sum_x_4 // total_4
-        centroid_4_y = 0 if total_4 == 0 else sum_y_4 // total_4
-
-        # print("Expected Centroid 1:", centroid_1_x, centroid_1_y)
-        # print("Expected Centroid 2:", centroid_2_x, centroid_2_y)
-
-        assert dut.valid_out.value == 1, f"Expected valid_out to be 1, got {dut.valid_out.value} on trial {num_tests}"
-        assert dut.x_out[0].value == centroid_1_x, f"Expected x_out[0] to be {centroid_1_x}, got {dut.x_out[0].value.integer} on trial {num_tests}"
-        assert dut.y_out[0].value == centroid_1_y, f"Expected y_out[0] to be {centroid_1_y}, got {dut.y_out[0].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[1].value == centroid_2_x, f"Expected x_out[1] to be {centroid_2_x}, got {dut.x_out[1].value.integer} on trial {num_tests}"
-        assert dut.y_out[1].value == centroid_2_y, f"Expected y_out[1] to be {centroid_2_y}, got {dut.y_out[1].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[2].value == centroid_3_x, f"Expected x_out[2] to be {centroid_3_x}, got {dut.x_out[2].value.integer} on trial {num_tests}"
-        assert dut.y_out[2].value == centroid_3_y, f"Expected y_out[2] to be {centroid_3_y}, got {dut.y_out[2].value.integer} on trial {num_tests}"
-
-        assert dut.x_out[3].value == centroid_4_x, f"Expected x_out[3] to be {centroid_4_x}, got {dut.x_out[3].value.integer} on trial {num_tests}"
-        assert dut.y_out[3].value == centroid_4_y, f"Expected y_out[3] to be {centroid_4_y}, got {dut.y_out[3].value.integer} on trial {num_tests}"
-
-        await ClockCycles(dut.clk_in,1)
-        assert dut.valid_out.value == 0
-        await ClockCycles(dut.clk_in,4)
-
-        await ClockCycles(dut.clk_in,200)
+    await reset_dut(dut)
+    await run_trials(dut, 20, lambda trial: random.randint(0,3), "kmeans_changing_players")
 
+@cocotb.test(skip=not os.getenv("TRACE_REPLAY"))
+async def test_replay_trace(dut):
+    """Replay the recorded frames in TRACE_REPLAY without running the model."""
+    trace = replay_trace()
+    trace.check_info(dut="moving_frame_k_means", width=ACTIVE_H_PIXELS, height=ACTIVE_LINES)
+    stride = trace.info["stride"]
+    await reset_dut(dut)
 
+    async def run(transaction):
+        if transaction["reset"]:
+            await apply_reset(dut)
+        return await run_frame(dut, transaction["num_players"], transaction["valid"], stride)
 
+    mismatches = await replay(trace, run, dut._log)
+    assert not mismatches, f"{len(mismatches)} centroid mismatches replaying {trace.path}"
 
-    
 def is_runner():
     """K Means Moving Frame Testing."""
     hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
@@ -461,21 +167,22 @@ def is_runner():
     parameters = {}
     sys.path.append(str(proj_path / "sim"))
     runner = get_runner(sim)
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel="moving_frame_k_means",
-        always=True,
         build_args=build_test_args,
         parameters=parameters,
         timescale = ('1ns','1ps'),
-        waves=True
+        waves=build_waves()
     )
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel="moving_frame_k_means",
         test_module="test_moving_frame_k_means",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
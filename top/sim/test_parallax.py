@@ -8,6 +8,9 @@ from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly, with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+from latency_stats import wait_for_valid, report_latency
 import random
 
 # Parameters matching those in parallax.sv
@@ -17,11 +20,39 @@ PIXEL_DENSITY = RESOLUTION_WIDTH / SENSOR_WIDTH
 FOCAL_LENGTH = 0.1295276
 BASELINE_DISTANCE = 6
 
+# parallax.sv feeds the real valued scale to divider.sv, which rounds it to an integer and
+# subtracts the disparity once per cycle
+DIVIDEND = round(FOCAL_LENGTH * BASELINE_DISTANCE * PIXEL_DENSITY)
+DEPTH_TIMEOUT_CYCLES = DIVIDEND + 16
+NUM_LATENCY_TRIALS = 200
+
+LATENCIES = [] # ((x1, x2), cycles) for every depth computed in this module
+
 def get_expected_depth(x1, x2):
     # using formula Z (depth in inches) = (Focal Length * Baseline Distance * Pixel Density) / (x_1 - x_2)
     if x1 == x2: return 0xFF 
     return int((FOCAL_LENGTH * BASELINE_DISTANCE * PIXEL_DENSITY) / abs(x1 - x2))
 
+def depth_latency_bound(x1, x2):
+    """Cycles from the edge that samples data_valid_in to depth_valid_out: one for the input
+    register, one to start the divider, one per subtraction, one to finish and one for depth_out."""
+    if x1 == x2: return 1
+    return DIVIDEND // abs(x1 - x2) + 4
+
+async def compute_depth(dut, x1, x2):
+    """Pulse data_valid_in with (x1, x2) and wait for the result. Returns the latency in cycles,
+    with the sim left in the ReadOnly phase of the edge where depth_out updated."""
+    dut.x_1_in.value = x1
+    dut.x_2_in.value = x2
+    dut.data_valid_in.value = 1
+    await RisingEdge(dut.clk_in)
+    dut.data_valid_in.value = 0
+    cycles = await wait_for_valid(dut.clk_in, dut.depth_valid_out, DEPTH_TIMEOUT_CYCLES)
+    LATENCIES.append(((x1, x2), cycles))
+    bound = depth_latency_bound(x1, x2)
+    assert cycles <= bound, f"Depth for x1={x1}, x2={x2} took {cycles} cycles, expected at most {bound}"
+    return cycles
+
 @cocotb.test()
 async def test_parallax_basic(dut):
     """Test basic functionality of parallax depth calculation"""
@@ -47,20 +78,14 @@ async def test_parallax_basic(dut):
     ]
 
     for x1, x2, disparity in test_cases:
-        dut.x_1_in.value = x1
-        dut.x_2_in.value = x2
-        dut.data_valid_in.value = 1
-        await RisingEdge(dut.clk_in)
-        dut.data_valid_in.value = 0
-        await ClockCycles(dut.clk_in, 3000)
-        await RisingEdge(dut.clk_in)
-        await RisingEdge(dut.clk_in)
-        
+        await compute_depth(dut, x1, x2)
+
         if disparity == 0:
             assert dut.depth_out.value == 0xFF, f"Expected 0xFF for zero disparity, got {dut.depth_out.value}"
         else:
             # Depth should be inversely proportional to disparity
             assert dut.depth_out.value.integer > 0, f"Depth should be positive, got {dut.depth_out.value} for x1={x1}, x2={x2}"
+        await RisingEdge(dut.clk_in)
 
 @cocotb.test()
 async def test_parallax_edge_cases(dut):
@@ -76,28 +101,34 @@ async def test_parallax_edge_cases(dut):
     await RisingEdge(dut.clk_in)
 
     # Test maximum disparity
-    dut.x_1_in.value = 0xFFF  # Maximum 12-bit value
-    dut.x_2_in.value = 0
-    dut.data_valid_in.value = 1
-    await RisingEdge(dut.clk_in)
-    dut.data_valid_in.value = 0
-    await ClockCycles(dut.clk_in, 3000)
-    await RisingEdge(dut.clk_in)
-    await RisingEdge(dut.clk_in)
+    await compute_depth(dut, 0xFFF, 0)  # Maximum 12-bit value
     expected_depth = get_expected_depth(0xFFF, 0)
     assert dut.depth_out.value.integer == expected_depth, f"Expected {expected_depth} for maximum disparity, got {dut.depth_out.value.integer}"
 
     # Test minimum disparity
-    dut.x_1_in.value = 0
-    dut.x_2_in.value = 0xFFF  # Maximum 12-bit value
-    dut.data_valid_in.value = 1
-    await RisingEdge(dut.clk_in)
-    dut.data_valid_in.value = 0
-    await ClockCycles(dut.clk_in, 3000)
     await RisingEdge(dut.clk_in)
+    await compute_depth(dut, 0, 0xFFF)  # Maximum 12-bit value
     expected_depth = get_expected_depth(0, 0xFFF)
     assert dut.depth_out.value.integer == expected_depth, f"Expected {expected_depth} for minimum disparity, got {dut.depth_out.value.integer}"
 
+@cocotb.test()
+async def test_parallax_latency(dut):
+    """Sweep random operand pairs and report the depth latency histogram for the whole module"""
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.rst_in.value = 1
+    dut.data_valid_in.value = 0
+    await ClockCycles(dut.clk_in, 5)
+    dut.rst_in.value = 0
+    await RisingEdge(dut.clk_in)
+
+    # small disparities are the slow ones, so make sure they show up alongside random pairs
+    pairs = [(x, x - d) for x, d in zip(random.sample(range(64, RESOLUTION_WIDTH), 16), range(16))]
+    pairs += [(random.randrange(RESOLUTION_WIDTH), random.randrange(RESOLUTION_WIDTH)) for _ in range(NUM_LATENCY_TRIALS)]
+    for x1, x2 in pairs:
+        await compute_depth(dut, x1, x2)
+        await RisingEdge(dut.clk_in)
+
+    report_latency(dut._log, "parallax", LATENCIES)
 
 def test_runner():
     """Parallax module testing."""
@@ -126,23 +157,24 @@ def test_runner():
     
     # Get and configure runner
     runner = get_runner(sim)
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel="parallax",
-        always=True,
         build_args=build_test_args,
         parameters=parameters,
         timescale=('1ns', '1ps'),
-        waves=True
+        waves=build_waves()
     )
     
     # Run tests
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel="parallax",
         test_module="test_parallax",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
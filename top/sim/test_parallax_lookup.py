@@ -0,0 +1,140 @@
+import cocotb
+import os
+import sys
+import random
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, RisingEdge
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+from latency_stats import wait_for_valid, report_latency
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "scripts"))
+from gen_depth_lut import DEPTH_LUT_SIZE, MAX_DEPTH, depth_lut, write_depth_lut
+
+# Parameters matching those in parallax.sv
+RESOLUTION_WIDTH = 1280
+SENSOR_WIDTH = 0.334646
+PIXEL_DENSITY = RESOLUTION_WIDTH / SENSOR_WIDTH
+FOCAL_LENGTH = 0.1295276
+BASELINE_DISTANCE = 6
+
+LOOKUP_LATENCY = 2 # input register + ROM read, for all four players at once
+NUM_TRIALS = 500
+
+LATENCIES = []
+
+def get_expected_depth(x1, x2):
+    # using formula Z (depth in inches) = (Focal Length * Baseline Distance * Pixel Density) / (x_1 - x_2)
+    if x1 == x2: return 0xFF
+    return int((FOCAL_LENGTH * BASELINE_DISTANCE * PIXEL_DENSITY) / abs(x1 - x2))
+
+def get_expected_lut_depth(x1, x2):
+    # the ROM saturates depths that do not fit in 8 bits
+    if x1 == x2: return 0xFF
+    return min(get_expected_depth(x1, x2), MAX_DEPTH)
+
+def closest_centroid(x, y, xs_2, ys_2, num_players):
+    """Same rules as parallax_over: Manhattan distance, first num_players + 1 centroids, lowest index wins ties."""
+    dists = [abs(x - xs_2[c]) + abs(y - ys_2[c]) for c in range(num_players + 1)]
+    return dists.index(min(dists))
+
+async def reset(dut):
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.rst_in.value = 1
+    dut.data_valid_in.value = 0
+    dut.num_players.value = 0
+    await ClockCycles(dut.clk_in, 5)
+    dut.rst_in.value = 0
+    await RisingEdge(dut.clk_in)
+
+async def lookup(dut, num_players, xs_1, ys_1, xs_2, ys_2):
+    """Send one set of centroids and wait for all four depths, which must arrive together."""
+    dut.num_players.value = num_players
+    for p in range(4):
+        dut.x_in_1[p].value = xs_1[p]
+        dut.y_in_1[p].value = ys_1[p]
+        dut.x_in_2[p].value = xs_2[p]
+        dut.y_in_2[p].value = ys_2[p]
+    dut.data_valid_in.value = 1
+    await RisingEdge(dut.clk_in)
+    dut.data_valid_in.value = 0
+    cycles = await wait_for_valid(dut.clk_in, dut.depth_valid_out, LOOKUP_LATENCY + 1, mask=0b1111)
+    LATENCIES.append((list(xs_1) + list(xs_2), cycles))
+    assert cycles == LOOKUP_LATENCY, f"Depths took {cycles} cycles, expected {LOOKUP_LATENCY}"
+    assert dut.depth_valid_out.value.integer == 0b1111, f"Depths were not valid on the same cycle: {dut.depth_valid_out.value}"
+    return [dut.depth_out[p].value.integer for p in range(4)]
+
+@cocotb.test()
+async def test_lookup_all_disparities(dut):
+    """Every disparity the ROM holds, four at a time against a single centroid at x = 0"""
+    await reset(dut)
+    zeros = [0] * 4
+    for start in range(0, DEPTH_LUT_SIZE, 4):
+        disparities = list(range(start, start + 4))
+        depths = await lookup(dut, 0, disparities, zeros, zeros, zeros)
+        for d, depth in zip(disparities, depths):
+            expected = get_expected_lut_depth(d, 0)
+            assert depth == expected, f"Disparity {d}: got depth {depth}, expected {expected}"
+        await RisingEdge(dut.clk_in)
+
+@cocotb.test()
+async def test_lookup_matching(dut):
+    """Random centroids and player counts, each player matched to its closest centroid in the other camera"""
+    await reset(dut)
+    for _ in range(NUM_TRIALS):
+        num_players = random.randint(0, 3)
+        xs_1 = [random.randrange(RESOLUTION_WIDTH) for _ in range(4)]
+        ys_1 = [random.randrange(720) for _ in range(4)]
+        xs_2 = [random.randrange(RESOLUTION_WIDTH) for _ in range(4)]
+        ys_2 = [random.randrange(720) for _ in range(4)]
+        depths = await lookup(dut, num_players, xs_1, ys_1, xs_2, ys_2)
+        for p in range(4):
+            c = closest_centroid(xs_1[p], ys_1[p], xs_2, ys_2, num_players)
+            expected = get_expected_lut_depth(xs_1[p], xs_2[c])
+            assert depths[p] == expected, f"Player {p + 1} depth mismatch: got {depths[p]}, expected {expected} (centroid {c})"
+        await RisingEdge(dut.clk_in)
+
+    report_latency(dut._log, "parallax_lookup", LATENCIES)
+
+def test_runner():
+    """parallax_over in USE_DEPTH_LUT mode."""
+    proj_path = Path(__file__).resolve().parent.parent
+    sim = os.getenv("SIM", "icarus")
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sys.path.append(str(proj_path / "sim"))
+
+    # the ROM is read at simulation start from the test directory, generate it for these parameters
+    Path("sim_build").mkdir(exist_ok=True)
+    write_depth_lut(depth_lut(RESOLUTION_WIDTH, SENSOR_WIDTH, FOCAL_LENGTH, BASELINE_DISTANCE),
+                    str(Path("sim_build").resolve() / "depth_lut.mem"))
+
+    sources = [proj_path / "hdl" / "parallax_over.sv", proj_path / "hdl" / "parallax.sv", proj_path / "hdl" / "divider.sv"]
+    parameters = {
+        'RESOLUTION_WIDTH': RESOLUTION_WIDTH,
+        'SENSOR_WIDTH': SENSOR_WIDTH,
+        'FOCAL_LENGTH': FOCAL_LENGTH,
+        'BASELINE_DISTANCE': BASELINE_DISTANCE,
+        'USE_DEPTH_LUT': 1,
+    }
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="parallax_over",
+        build_args=["-Wall"],
+        parameters=parameters,
+        timescale=('1ns', '1ps'),
+        waves=build_waves()
+    )
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="parallax_over",
+        test_module="test_parallax_lookup",
+        test_args=[]
+    )
+
+if __name__ == "__main__":
+    test_runner()
@@ -8,7 +8,15 @@ from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly, with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+from latency_stats import wait_for_valid, report_latency
+from stimulus_trace import recorder, replay_trace, replay
 import random
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from camera_pipeline_model import match_depths
 
 RESOLUTION_WIDTH = 1280
 SENSOR_WIDTH = 0.334646
@@ -16,21 +24,80 @@ PIXEL_DENSITY = RESOLUTION_WIDTH / SENSOR_WIDTH
 FOCAL_LENGTH = 0.1295276
 BASELINE_DISTANCE = 6
 
+DIVIDEND = round(FOCAL_LENGTH * BASELINE_DISTANCE * PIXEL_DENSITY) # what divider.sv sees
+DEPTH_TIMEOUT_CYCLES = DIVIDEND + 16
+ALL_DEPTHS = 0b1111
+
+LATENCIES = [] # (operands, cycles until all four depths are valid)
+
+MAX_DISPARITY = 200 # random centroid pairs are shifted up to this many pixels between cameras
+
+# one transaction per data_valid_in pulse: both cameras' centroids and the depths they give
+TRACE_FIELDS = {
+    "num_players": ("input", np.uint8, ()),
+    "x_in_1": ("input", np.uint16, (4,)),
+    "y_in_1": ("input", np.uint16, (4,)),
+    "x_in_2": ("input", np.uint16, (4,)),
+    "y_in_2": ("input", np.uint16, (4,)),
+    "depth_out": ("expected", np.uint8, (4,)),
+}
+TRACE_INFO = {"dut": "parallax_over", "dividend": DIVIDEND}
+
 def get_expected_depth(x1, x2):
     # using formula Z (depth in inches) = (Focal Length * Baseline Distance * Pixel Density) / (x_1 - x_2)
     if x1 == x2: return 0xFF 
     return int((FOCAL_LENGTH * BASELINE_DISTANCE * PIXEL_DENSITY) / abs(x1 - x2))
 
-@cocotb.test()
-async def test_parallax_over_basic(dut):
+def depth_latency_bound(player, x1, x2):
+    """Cycles from the edge that samples data_valid_in to depth_valid_out[player]: parallax unit
+    `player` starts player + 1 cycles in, then takes one cycle per subtraction plus four."""
+    if x1 == x2: return player + 2
+    return player + 1 + DIVIDEND // abs(x1 - x2) + 4
+
+def parallax_transactions(rng, count):
+    """count random centroid sets, the second camera's a shuffled copy of the first shifted by
+    1 to MAX_DISPARITY pixels, with the depths camera_pipeline_model expects."""
+    for _ in range(count):
+        num_players = int(rng.integers(0, 4))
+        x1 = rng.integers(MAX_DISPARITY, RESOLUTION_WIDTH, size=4)
+        y1 = rng.integers(0, 720, size=4)
+        order = rng.permutation(4)
+        x2 = x1[order] - rng.integers(1, MAX_DISPARITY + 1, size=4)
+        y2 = np.clip(y1[order] + rng.integers(-4, 5, size=4), 0, 719)
+        depths = match_depths(np.stack([x1, y1], axis=1), np.stack([x2, y2], axis=1), num_players, DIVIDEND)
+        yield {"num_players": num_players, "x_in_1": x1, "y_in_1": y1, "x_in_2": x2, "y_in_2": y2,
+               "depth_out": depths}
+
+async def reset_dut(dut):
     cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
     dut.rst_in.value = 1
     dut.data_valid_in.value = 0
-    dut.num_players.value = 3 # its x-1 the number of players you want to test. So this is 2.
     await ClockCycles(dut.clk_in, 5)
     dut.rst_in.value = 0
     await RisingEdge(dut.clk_in)
 
+async def run_depths(dut, transaction):
+    """Pulse data_valid_in with one transaction's centroids and wait for all four depths.
+    Returns the depths and the cycles they took."""
+    dut.num_players.value = int(transaction["num_players"])
+    for p in range(4):
+        dut.x_in_1[p].value = int(transaction["x_in_1"][p])
+        dut.y_in_1[p].value = int(transaction["y_in_1"][p])
+        dut.x_in_2[p].value = int(transaction["x_in_2"][p])
+        dut.y_in_2[p].value = int(transaction["y_in_2"][p])
+    dut.data_valid_in.value = 1
+    await RisingEdge(dut.clk_in)
+    dut.data_valid_in.value = 0
+    cycles = await wait_for_valid(dut.clk_in, dut.depth_valid_out, DEPTH_TIMEOUT_CYCLES, mask=ALL_DEPTHS)
+    depths = [dut.depth_out[p].value.integer for p in range(4)]
+    await RisingEdge(dut.clk_in)
+    return {"depth_out": depths}, cycles
+
+@cocotb.test()
+async def test_parallax_over_basic(dut):
+    await reset_dut(dut)
+    dut.num_players.value = 3 # its x-1 the number of players you want to test. So this is 2.
+
     # Example test: 2 players
     # Set centroids in board 1
     x1_vals = [300, 100, 200, 400] # 0 to 3, 1 to 2, 2 to 0, and 3 to 1 
@@ -60,8 +127,12 @@ async def test_parallax_over_basic(dut):
     await RisingEdge(dut.clk_in)
     dut.data_valid_in.value = 0
 
-    # Wait a lot of cycles to let parallax finish
-    await ClockCycles(dut.clk_in, 10000)
+    # Wait for all four parallax units to finish
+    cycles = await wait_for_valid(dut.clk_in, dut.depth_valid_out, DEPTH_TIMEOUT_CYCLES, mask=ALL_DEPTHS)
+    pairs = [(x1_vals[0], x2_vals[3]), (x1_vals[1], x2_vals[2]), (x1_vals[2], x2_vals[1]), (x1_vals[3], x2_vals[0])]
+    LATENCIES.append((x1_vals + x2_vals, cycles))
+    bound = max(depth_latency_bound(player, x1, x2) for player, (x1, x2) in enumerate(pairs))
+    assert cycles <= bound, f"Depths took {cycles} cycles, expected at most {bound}"
 
     # Check results
     # depth_out[0] corresponds to first player's matched centroid
@@ -75,6 +146,37 @@ async def test_parallax_over_basic(dut):
     assert dut.depth_out[2].value.integer == expected_2, f"Player 3 depth mismatch: got {dut.depth_out[2].value.integer}, expected {expected_2}"
     assert dut.depth_out[3].value.integer == expected_3, f"Player 4 depth mismatch: got {dut.depth_out[3].value.integer}, expected {expected_3}"
 
+    report_latency(dut._log, "parallax_over", LATENCIES)
+
+@cocotb.test()
+async def test_parallax_over_random(dut):
+    """Random centroid sets for every player count against camera_pipeline_model.match_depths,
+    recorded to traces/parallax_over_random.trace with TRACE_RECORD=1."""
+    await reset_dut(dut)
+    seed = random.getrandbits(32)
+    rng = np.random.default_rng(seed)
+    with recorder("parallax_over_random", TRACE_FIELDS, dict(TRACE_INFO, seed=seed)) as trace:
+        for trial, transaction in enumerate(parallax_transactions(rng, 40)):
+            observed, cycles = await run_depths(dut, transaction)
+            expected = transaction["depth_out"].tolist()
+            assert observed["depth_out"] == expected, f"Trial {trial}: depths {observed['depth_out']}, expected {expected}"
+            if trace:
+                trace.append(**transaction)
+
+@cocotb.test(skip=not os.getenv("TRACE_REPLAY"))
+async def test_replay_trace(dut):
+    """Replay the recorded centroid sets in TRACE_REPLAY without running the model."""
+    trace = replay_trace()
+    trace.check_info(**TRACE_INFO)
+    await reset_dut(dut)
+
+    async def run(transaction):
+        observed, _ = await run_depths(dut, transaction)
+        return observed
+
+    mismatches = await replay(trace, run, dut._log)
+    assert not mismatches, f"{len(mismatches)} depth mismatches replaying {trace.path}"
+
 def test_runner():
     """Parallax module testing."""
     proj_path = Path(__file__).resolve().parent.parent
@@ -95,22 +197,23 @@ def test_runner():
     
     # Get and configure runner
     runner = get_runner(sim)
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel="parallax_over",
-        always=True,
         build_args=build_test_args,
         timescale=('1ns', '1ps'),
-        waves=True
+        waves=build_waves()
     )
     
     # Run tests
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel="parallax_over",
         test_module="test_parallax_over",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
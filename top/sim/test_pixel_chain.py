@@ -0,0 +1,316 @@
+import cocotb
+import os
+import sys
+import logging
+from pathlib import Path
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, RisingEdge
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from camera_pipeline_model import (PIXEL_LAG, RGB_TO_YCRCB_LATENCY, THRESHOLD_LATENCY, CR_BOUNDS, CB_BOUNDS,
+                                   rgb565_channels, rgb_to_ycrcb, chroma_bytes, threshold, green_screen_table)
+from video_source import VideoTiming, drive_video
+from pipeline_probe import UNRESOLVED, PipelineProbe, LatencyTable, held
+
+# Latency table for top_level's clk_pixel chain, run as pixel_chain_sim_test on a small raster.
+# Every stage is measured from the samples against what feeds it and placed on the raster,
+# then the signals that describe the same pixel are checked for alignment:
+#
+#   is_player                       the colour test against the game window test
+#   moving_frame_k_means pipe       valid_in against x_in through the two pipeline stages
+#   game_logic_controller outputs   everything it registers against hcount_out
+#   graphics_controller inputs      what top_level feeds it against hcount_hdmi
+#
+# test_latency_table fails on any stage whose latency is not its hand count, test_known_skew on
+# any sideband that is off its pixel by other than the skews the design has today, listed in
+# KNOWN_SKEW. test_alignment fails on any skew at all: it is marked expect_fail for KNOWN_SKEW,
+# so cocotb reports it as failing once they are fixed. Each test runs the chain itself unless
+# an earlier one in the same simulation already has. The results are written to
+# pixel_chain_latency.json next to results.xml.
+#
+#   CHAIN_FRAMES=3   frames to run, k-means needs two to move its centroids apart
+#
+# Measured under Verilator over 3 frames on wall 3, cycles (and lag behind hcount on the raster):
+#
+#   fb_red/green/blue 1 (1), rgb_to_ycrcb 3 (4), threshold 1 (5), is_player 0 (5)
+#   moving_frame_k_means x_in_pipe_2 2 (2), valid_in_pipe_2 2 (7), player_out 1 (2),
+#   tabulate_in -> valid_out 87 to 99
+#   game_logic_controller hcount/vcount/data_valid/player_depth_out 1 (1), is_person_out 1 (6),
+#   is_wall_out 2 (2), is_collision_out 1 (6) after is_player and 2 (2) after the wall
+#
+# so everything derived from is_player sits 5 cycles behind its pixel and the wall bit 1.
+
+# 80x45 wall mask pixels of 2x2, the size of a walls.mem line, on a raster small enough to probe
+SCREEN_WIDTH = 160
+SCREEN_HEIGHT = 90
+WINDOW_LEFT = 32
+WINDOW_RIGHT = SCREEN_WIDTH - 1 - 32
+WINDOW_BOTTOM = SCREEN_HEIGHT - 1 - 24
+BIT_MASK_DOWN_SAMPLE_FACTOR = 2
+NUM_WALLS = 10
+NUM_PLAYERS = 1 # two centroids, so player_out changes once they separate
+GAME_PLAYERS = 1 # the game picks its wall at the start from num_players: wall 3, solid around holes
+TIMING = VideoTiming(SCREEN_WIDTH, 4, 4, 4, SCREEN_HEIGHT, 1, 1, 1)
+FRAMES = int(os.getenv("CHAIN_FRAMES", "3"))
+LATENCY_FILE = "pixel_chain_latency.json"
+
+GREEN = 0x07E0
+SOLID_LINES = 40 # a solid player band over the window's left and right edges, for the window test
+SOLID_RIGHT = WINDOW_RIGHT + 16
+SPECKLE = 0.5 # below it, pixels are player or green screen at random, for the colour test
+MAX_LAG = 8
+GAME_MAX_LAG = 4 # short enough that the wall holds still over it on most of a line
+
+KMEANS_PIPE = 2
+GAME_LOGIC_LATENCY = 1
+WALL_INDEX_LATENCY = 2
+
+ALIGNMENT = {
+    "is_player": ("top_level.is_player.window", ["top_level.is_player.colour"]),
+    "moving_frame_k_means pipe": ("moving_frame_k_means.x_in_pipe_2", ["moving_frame_k_means.valid_in_pipe_2"]),
+    "game_logic_controller outputs": ("game_logic_controller.hcount_out", [
+        "game_logic_controller.vcount_out", "game_logic_controller.data_valid_out",
+        "game_logic_controller.player_depth_out", "game_logic_controller.is_person_out",
+        "game_logic_controller.is_wall_out", "game_logic_controller.is_collision_out.person",
+        "game_logic_controller.is_collision_out.wall"]),
+    "graphics_controller inputs": ("video_sig_gen.hcount_out", [
+        "moving_frame_k_means.player_out", "game_logic_controller.is_wall_out",
+        "game_logic_controller.is_collision_out.person", "game_logic_controller.is_collision_out.wall"]),
+}
+
+# why test_alignment is expected to fail, {group: {sideband: cycles behind its data}}
+KNOWN_SKEW = {
+    # the colour test trails hcount through the fb registers, rgb_to_ycrcb and the thresholds;
+    # camera_pipeline_model.player_mask shifts the mask by PIXEL_LAG to match
+    "is_player": {"top_level.is_player.colour": PIXEL_LAG},
+    "moving_frame_k_means pipe": {"moving_frame_k_means.valid_in_pipe_2": PIXEL_LAG},
+    # the wall index is registered before the lookup and the lookup again, one more than the
+    # rest; the first pixel of each line reads the index of the blanking pixel before it
+    "game_logic_controller outputs": {
+        "game_logic_controller.is_person_out": PIXEL_LAG,
+        "game_logic_controller.is_wall_out": WALL_INDEX_LATENCY - GAME_LOGIC_LATENCY,
+        "game_logic_controller.is_collision_out.person": PIXEL_LAG,
+        "game_logic_controller.is_collision_out.wall": WALL_INDEX_LATENCY - GAME_LOGIC_LATENCY,
+    },
+    # top_level draws these against hcount_hdmi without delaying it ("TODO: pipeline signals
+    # through game controller", player_out's "With pipelining this is wrong")
+    "graphics_controller inputs": {
+        "moving_frame_k_means.player_out": KMEANS_PIPE,
+        "game_logic_controller.is_wall_out": WALL_INDEX_LATENCY,
+        "game_logic_controller.is_collision_out.person": PIXEL_LAG + GAME_LOGIC_LATENCY,
+        "game_logic_controller.is_collision_out.wall": WALL_INDEX_LATENCY,
+    },
+}
+
+PROBED = [
+    "rst_in", "hcount_in", "vcount_in", "data_valid_in", "frame_buff_raw", "player_depth_in",
+    "fb_red", "fb_green", "fb_blue", "y_full", "cr_full", "cb_full", "cr_mask", "cb_mask", "is_player",
+    "nf_hdmi", "kmeans.valid_in", "kmeans.x_in_pipe_1", "kmeans.x_in_pipe_2", "kmeans.valid_in_pipe_2",
+    "kmeans.closest_centroid", "pixel_player_num", "com_valid_out",
+    "game_controller.game_started", "hcount_out", "vcount_out", "data_valid_out", "player_depth_out",
+    "is_person_out", "pixel_is_wall", "pixel_is_collision",
+]
+
+def handle(dut, path):
+    for name in path.split("."):
+        dut = getattr(dut, name)
+    return dut
+
+def chain_frames(rng, num_frames):
+    """RGB565 frames: a solid band of random player colours over the window's edges, then
+    player colours and green screen at random below it."""
+    not_green = np.flatnonzero(~green_screen_table())
+    assert green_screen_table()[GREEN]
+    frames = np.full((num_frames, SCREEN_HEIGHT, SCREEN_WIDTH), GREEN, dtype=np.int64)
+    frames[:, :SOLID_LINES, :SOLID_RIGHT] = rng.choice(not_green, size=(num_frames, SOLID_LINES, SOLID_RIGHT))
+    speckled = rng.random((num_frames, SCREEN_HEIGHT - SOLID_LINES, SCREEN_WIDTH)) < SPECKLE
+    players = rng.choice(not_green, size=speckled.shape)
+    frames[:, SOLID_LINES:] = np.where(speckled, players, GREEN)
+    return frames
+
+def read_walls(size):
+    """walls.mem as the BRAM holds it, one row of bits per wall in raster order of the
+    down-sampled mask (the RTL indexes it from the far end)."""
+    with open(Path.cwd() / "walls.mem", "r") as f:
+        lines = [line for line in f.read().split() if line]
+    assert all(len(line) * 4 == size for line in lines), f"walls.mem lines are not {size} bits, the mask this raster has"
+    values = [int(line, 16) for line in lines]
+    return np.array([[(v >> (size - 1 - i)) & 1 for i in range(size)] for v in values[:NUM_WALLS]])
+
+def resolved(value, *sources):
+    """value where every source sample was resolved, UNRESOLVED elsewhere."""
+    ok = np.all([np.asarray(s) != UNRESOLVED for s in sources], axis=0)
+    return np.where(ok, value, UNRESOLVED)
+
+def pack(*fields, width=10):
+    """Several samples as one value, so a stage with several outputs is one row."""
+    value = np.zeros_like(fields[0])
+    for field in fields:
+        value = (value << width) | np.maximum(field, 0)
+    return resolved(value, *fields)
+
+def build_table(p, wall_bits):
+    """The latency rows and alignment groups from the probe samples."""
+    table = LatencyTable()
+    hcount, vcount, valid = p["hcount_in"], p["vcount_in"], p["data_valid_in"]
+    raw = p["frame_buff_raw"]
+    table.lag("video_sig_gen.hcount_out", hcount, hcount, 0, 0)
+
+    # colour path, each stage against its own inputs
+    fb = pack(*rgb565_channels(np.maximum(raw, 0)))
+    table.lag("top_level.fb_red/green/blue", resolved(fb, raw), pack(p["fb_red"], p["fb_green"], p["fb_blue"]),
+              MAX_LAG, 1)
+    ycrcb = pack(*rgb_to_ycrcb(*(np.maximum(p[name], 0) for name in ("fb_red", "fb_green", "fb_blue"))))
+    table.lag("rgb_to_ycrcb.y/cr/cb_out", resolved(ycrcb, p["fb_red"], p["fb_green"], p["fb_blue"]),
+              pack(p["y_full"], p["cr_full"], p["cb_full"]), MAX_LAG, RGB_TO_YCRCB_LATENCY,
+              after="top_level.fb_red/green/blue")
+    _, cr, cb = chroma_bytes(*(np.maximum(p[name], 0) for name in ("y_full", "cr_full", "cb_full")))
+    masks = pack(threshold(cr, *CR_BOUNDS).astype(np.int64), threshold(cb, *CB_BOUNDS).astype(np.int64), width=1)
+    # threshold clears its mask in reset, where a two-state simulator has already resolved its input
+    table.lag("threshold.mask_out (cr_mt, cb_mt)", resolved(masks, p["cr_full"], p["cb_full"]),
+              pack(p["cr_mask"], p["cb_mask"], width=1), MAX_LAG, THRESHOLD_LATENCY, after="rgb_to_ycrcb.y/cr/cb_out",
+              where=p["rst_in"] == 0)
+
+    # is_player = colour test & game window, each compared while the other holds at 1
+    not_green = resolved(1 - (p["cr_mask"] & p["cb_mask"]), p["cr_mask"], p["cb_mask"])
+    window = ((hcount >= WINDOW_LEFT) & (hcount <= WINDOW_RIGHT) & (vcount <= WINDOW_BOTTOM)).astype(np.int64)
+    table.lag("top_level.is_player.colour", not_green, p["is_player"], MAX_LAG, 0,
+              after="threshold.mask_out (cr_mt, cb_mt)", where=held(window == 1, 0, MAX_LAG))
+    table.lag("top_level.is_player.window", window, p["is_player"], MAX_LAG, 0,
+              where=held(not_green == 1, MAX_LAG, MAX_LAG))
+
+    # moving_frame_k_means: both pipeline stages and the player it assigns
+    table.lag("moving_frame_k_means.x_in_pipe_1", hcount, p["kmeans.x_in_pipe_1"], MAX_LAG, 1)
+    table.lag("moving_frame_k_means.x_in_pipe_2", hcount, p["kmeans.x_in_pipe_2"], MAX_LAG, KMEANS_PIPE)
+    table.pulses("moving_frame_k_means.valid_in_pipe_2", p["kmeans.valid_in"], p["kmeans.valid_in_pipe_2"],
+                 KMEANS_PIPE, after="top_level.is_player.colour")
+    table.lag("moving_frame_k_means.player_out", p["kmeans.closest_centroid"], p["pixel_player_num"], MAX_LAG, 1,
+              after="moving_frame_k_means.x_in_pipe_1")
+    table.pulses("moving_frame_k_means.tabulate_in -> valid_out", p["nf_hdmi"], p["com_valid_out"])
+
+    # game_logic_controller: the pass-through registers only move while a game is on
+    playing = held(p["game_controller.game_started"] == 1, 1, GAME_MAX_LAG)
+    for name, reference, after in (("hcount_out", hcount, None), ("vcount_out", vcount, None),
+                                   ("data_valid_out", valid, None), ("player_depth_out", p["player_depth_in"], None),
+                                   ("is_person_out", p["is_player"], "top_level.is_player.colour")):
+        table.lag(f"game_logic_controller.{name}", reference, p[name], GAME_MAX_LAG, GAME_LOGIC_LATENCY,
+                  after=after, where=playing)
+
+    # the wall bit of each pixel, from the wall the game picked
+    factor = BIT_MASK_DOWN_SAMPLE_FACTOR
+    mask_width, mask_height = SCREEN_WIDTH // factor, SCREEN_HEIGHT // factor
+    active = (valid == 1) & (hcount < SCREEN_WIDTH) & (vcount < SCREEN_HEIGHT)
+    rows, cols = np.minimum(vcount // factor, mask_height - 1), np.minimum(hcount // factor, mask_width - 1)
+    wall = np.where(active, wall_bits.reshape(mask_height, mask_width)[rows, cols], UNRESOLVED)
+    lines = playing & held(active, 1, GAME_MAX_LAG)
+    table.lag("game_logic_controller.is_wall_out", wall, p["pixel_is_wall"], GAME_MAX_LAG, WALL_INDEX_LATENCY,
+              where=lines)
+    table.lag("game_logic_controller.is_collision_out.person", p["is_player"], p["pixel_is_collision"],
+              GAME_MAX_LAG, GAME_LOGIC_LATENCY, after="top_level.is_player.colour",
+              where=lines & held(wall == 1, WALL_INDEX_LATENCY, GAME_MAX_LAG))
+    table.lag("game_logic_controller.is_collision_out.wall", wall, p["pixel_is_collision"], GAME_MAX_LAG,
+              WALL_INDEX_LATENCY, where=lines & held(p["is_player"] == 1, 1, GAME_MAX_LAG))
+
+    for group, (data, sidebands) in ALIGNMENT.items():
+        table.align(group, data, sidebands)
+    return table
+
+measured = {} # the table of this simulation's run, so the chain is only run once
+
+async def chain_table(dut):
+    """The LatencyTable of one run of the chain, run on first use."""
+    if "table" in measured:
+        return measured["table"]
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.rst_in.value = 1
+    for name in ("hcount_in", "vcount_in", "data_valid_in", "frame_buff_raw", "player_depth_in", "start_game_in"):
+        getattr(dut, name).value = 0
+    dut.num_players.value = GAME_PLAYERS
+    probe = PipelineProbe(dut.clk_in, {name: handle(dut, name) for name in PROBED},
+                          (FRAMES + 1) * TIMING.frame_cycles).start()
+    await ClockCycles(dut.clk_in, 4)
+    dut.rst_in.value = 0
+    await RisingEdge(dut.clk_in)
+    dut.start_game_in.value = 1
+    await RisingEdge(dut.clk_in)
+    dut.start_game_in.value = 0
+    dut.num_players.value = NUM_PLAYERS
+
+    rng = np.random.default_rng(205)
+    frames = chain_frames(rng, FRAMES)
+    depths = rng.integers(0, 256, size=frames.shape)
+    await drive_video(dut, TIMING, FRAMES, {"frame_buff_raw": frames, "player_depth_in": depths})
+    await ClockCycles(dut.clk_in, 2 * MAX_LAG)
+    probe.stop()
+
+    wall_index = dut.game_controller.curr_wall_idx.value.integer
+    size = (SCREEN_WIDTH // BIT_MASK_DOWN_SAMPLE_FACTOR) * (SCREEN_HEIGHT // BIT_MASK_DOWN_SAMPLE_FACTOR)
+    table = build_table(probe, read_walls(size)[wall_index])
+    dut._log.info(f"Latencies over {probe.cycles} cycles, {FRAMES} frames, wall {wall_index}:")
+    table.report(dut._log, LATENCY_FILE, KNOWN_SKEW)
+    measured["table"] = table
+    return table
+
+@cocotb.test()
+async def test_latency_table(dut):
+    """Every stage of the chain takes its hand-counted latency."""
+    table = await chain_table(dut)
+    problems = table.latency_failures()
+    assert not problems, "Pipeline latency problems:\n  " + "\n  ".join(problems)
+
+@cocotb.test()
+async def test_known_skew(dut):
+    """No sideband is off its pixel other than by its KNOWN_SKEW."""
+    table = await chain_table(dut)
+    problems = table.skew_failures(KNOWN_SKEW)
+    assert not problems, "Skews not in KNOWN_SKEW:\n  " + "\n  ".join(problems)
+
+@cocotb.test(expect_fail=True)
+async def test_alignment(dut):
+    """Every sideband describes the same pixel as its group's data. Fails on the skews in
+    KNOWN_SKEW until top_level delays its signals to match; drop expect_fail then."""
+    table = await chain_table(dut)
+    problems = table.skew_failures()
+    assert not problems, "Sidebands off their pixel:\n  " + "\n  ".join(problems)
+
+def is_runner():
+    """Pixel Chain Latency Table."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "sim" / "hdl" / "pixel_chain_sim_test.sv"]
+    sources += [proj_path / "hdl" / name for name in (
+        "rgb_to_ycrcb.sv", "threshold.sv", "moving_frame_k_means.sv", "center_of_mass.sv", "divider.sv",
+        "game_logic_controller.sv", "evt_counter.sv", "evt_counter_dynamic.sv", "wall_bit_mask.sv",
+        "xilinx_single_port_ram_read_first.sv")]
+    build_test_args = ["-Wall"]
+    parameters = {"SCREEN_WIDTH": SCREEN_WIDTH, "SCREEN_HEIGHT": SCREEN_HEIGHT, "WINDOW_LEFT": WINDOW_LEFT,
+                  "WINDOW_RIGHT": WINDOW_RIGHT, "WINDOW_BOTTOM": WINDOW_BOTTOM,
+                  "BIT_MASK_DOWN_SAMPLE_FACTOR": BIT_MASK_DOWN_SAMPLE_FACTOR, "NUM_WALLS": NUM_WALLS}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="pixel_chain_sim_test",
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps'),
+        waves=build_waves()
+    )
+    run_test_args = []
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="pixel_chain_sim_test",
+        test_module="test_pixel_chain",
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
@@ -0,0 +1,128 @@
+import cocotb
+import os
+import sys
+import time
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+from stream_driver import changes
+import random
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from camera_pipeline_model import RGB_TO_YCRCB_LATENCY, rgb565_channels, rgb888_channels, rgb_to_ycrcb
+
+# Exhaustive check of rgb_to_ycrcb against the fixed-point model. Inputs are streamed back
+# to back, one per cycle, and the outputs are only collected during the run and compared in
+# one go afterwards, so a sweep costs a few handle writes and reads per cycle. Every RGB565
+# value (what top_level feeds it) is checked on each run; the 2^24 RGB888 values are split
+# into shards picked with RGB888_SHARD=k/n:
+#
+#   for k in $(seq 0 255); do RGB888_SHARD=$k/256 python3 test_rgb_to_ycrcb.py; done
+
+RGB888_SHARD = os.getenv("RGB888_SHARD", "0/256")
+NUM_RANDOM_10_BIT = 1 << 14
+
+async def start_clock(dut):
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.r_in.value = 0
+    dut.g_in.value = 0
+    dut.b_in.value = 0
+    await ClockCycles(dut.clk_in, RGB_TO_YCRCB_LATENCY + 1)
+    await FallingEdge(dut.clk_in)
+
+async def stream_rgb(dut, r, g, b):
+    """Drive r, g, b one triple per cycle, only writing the channels that change, and return
+    (y, cr, cb) arrays with the output for each input, RGB_TO_YCRCB_LATENCY cycles later."""
+    clk_edge = FallingEdge(dut.clk_in) # inputs change and outputs are read between rising edges
+    inputs = [(dut.r_in, changes(r)), (dut.g_in, changes(g)), (dut.b_in, changes(b))]
+    y_out, cr_out, cb_out = dut.y_out, dut.cr_out, dut.cb_out
+    num_inputs = len(r)
+    got = []
+
+    start = time.perf_counter()
+    for k in range(num_inputs + RGB_TO_YCRCB_LATENCY - 1):
+        for handle, channel in inputs:
+            if k in channel:
+                handle.value = channel[k]
+        await clk_edge
+        got.append((y_out.value.integer, cr_out.value.integer, cb_out.value.integer))
+    elapsed = time.perf_counter() - start
+    dut._log.info(f"Streamed {num_inputs} inputs at {len(got) / elapsed:.0f} cycles/s")
+
+    got = np.array(got[RGB_TO_YCRCB_LATENCY - 1:], dtype=np.int64)
+    return got[:, 0], got[:, 1], got[:, 2]
+
+def check_outputs(name, r, g, b, got):
+    """Compare every output against the model at once and describe the first mismatches."""
+    expected = rgb_to_ycrcb(r, g, b)
+    for channel, got_channel, expected_channel in zip(("y", "cr", "cb"), got, expected):
+        bad = np.flatnonzero(got_channel != expected_channel)
+        examples = ", ".join(f"rgb ({r[k]:#x}, {g[k]:#x}, {b[k]:#x}) gave {got_channel[k]:#x} expected {expected_channel[k]:#x}"
+                             for k in bad[:4])
+        assert len(bad) == 0, f"{name}: {len(bad)} of {len(r)} {channel}_out values wrong: {examples}"
+
+@cocotb.test()
+async def test_rgb565_exhaustive(dut):
+    """Every RGB565 value, widened like top_level's fb_red/green/blue."""
+    await start_clock(dut)
+    r, g, b = rgb565_channels(np.arange(1 << 16))
+    got = await stream_rgb(dut, r, g, b)
+    check_outputs("RGB565", r, g, b, got)
+
+@cocotb.test()
+async def test_rgb888_shard(dut):
+    """One RGB888_SHARD of the 2^24 RGB888 values, red changing slowest."""
+    shard, num_shards = (int(v) for v in RGB888_SHARD.split("/"))
+    assert 0 <= shard < num_shards and (1 << 24) % num_shards == 0, f"bad RGB888_SHARD {RGB888_SHARD}"
+    size = (1 << 24) // num_shards
+    await start_clock(dut)
+    r, g, b = rgb888_channels(np.arange(shard * size, (shard + 1) * size))
+    got = await stream_rgb(dut, r, g, b)
+    check_outputs(f"RGB888 shard {RGB888_SHARD}", r, g, b, got)
+
+@cocotb.test()
+async def test_random_10_bit(dut):
+    """Random full width inputs, which reach the wraparound of the 22-bit sums."""
+    await start_clock(dut)
+    rng = np.random.default_rng(random.getrandbits(32))
+    r, g, b = rng.integers(0, 1 << 10, size=(3, NUM_RANDOM_10_BIT))
+    r[:4], g[:4], b[:4] = [0, 0x3FF, 0x3FF, 0], [0, 0x3FF, 0, 0x3FF], [0, 0x3FF, 0x3FF, 0]
+    got = await stream_rgb(dut, r, g, b)
+    check_outputs("10-bit", r, g, b, got)
+
+def is_runner():
+    """RGB to YCrCb Testing."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "rgb_to_ycrcb.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="rgb_to_ycrcb",
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps'),
+        waves=build_waves()
+    )
+    run_test_args = []
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="rgb_to_ycrcb",
+        test_module="test_rgb_to_ycrcb",
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
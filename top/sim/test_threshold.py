@@ -0,0 +1,92 @@
+import cocotb
+import os
+import sys
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, RisingEdge, FallingEdge
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+import random
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from camera_pipeline_model import CB_BOUNDS, CR_BOUNDS, THRESHOLD_LATENCY, threshold
+
+NUM_RANDOM_BOUNDS = 8
+
+async def reset_dut(dut):
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.pixel_in.value = 0
+    dut.lower_bound_in.value = 0
+    dut.upper_bound_in.value = 0
+    dut.rst_in.value = 1
+    await ClockCycles(dut.clk_in, 5)
+    dut.rst_in.value = 0
+    await FallingEdge(dut.clk_in)
+
+async def sweep_pixels(dut, lower, upper):
+    """Stream every 8-bit pixel back to back with fixed bounds and check mask_out against
+    the model, THRESHOLD_LATENCY cycles later."""
+    dut.lower_bound_in.value = lower
+    dut.upper_bound_in.value = upper
+    pixels = list(range(256))
+    got = []
+    # inputs change on the falling edge, so each read sees the rising edges since the last one
+    for pixel in pixels + [0] * (THRESHOLD_LATENCY - 1):
+        dut.pixel_in.value = pixel
+        await FallingEdge(dut.clk_in)
+        got.append(dut.mask_out.value.integer)
+    got = np.array(got[THRESHOLD_LATENCY - 1:])
+    expected = threshold(pixels, lower, upper).astype(int)
+    bad = np.flatnonzero(got != expected)
+    assert len(bad) == 0, (f"bounds ({lower:#04x}, {upper:#04x}): {len(bad)} pixels differ, first {bad[0]:#04x} "
+                           f"gave {got[bad[0]]}, expected {expected[bad[0]]}")
+
+@cocotb.test()
+async def test_top_level_bounds(dut):
+    """top_level's Cr and Cb bounds, and the bounds that pass everything and nothing."""
+    await reset_dut(dut)
+    assert dut.mask_out.value == 0, "mask_out should be 0 after reset"
+    for lower, upper in [CR_BOUNDS, CB_BOUNDS, (0x00, 0xFF), (0xFF, 0x00), (0x80, 0x80)]:
+        await sweep_pixels(dut, lower, upper)
+
+@cocotb.test()
+async def test_random_bounds(dut):
+    """Random bounds, the lower sometimes above the upper."""
+    await reset_dut(dut)
+    for _ in range(NUM_RANDOM_BOUNDS):
+        await sweep_pixels(dut, random.randrange(256), random.randrange(256))
+
+def is_runner():
+    """Threshold Testing."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "threshold.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="threshold",
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps'),
+        waves=build_waves()
+    )
+    run_test_args = []
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="threshold",
+        test_module="test_threshold",
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
@@ -0,0 +1,163 @@
+import cocotb
+import os
+import sys
+import time
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+from stream_driver import changes
+import random
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from tmds_model import (BLUE, GREEN, RED, CHANNEL_SHIFTS, ENCODER_LATENCY, SYMBOL_BITS, decode_frame, deserialize,
+                        encode, encode_frame, raster_sync, serialize, symbol_alignment)
+from video_source import VideoTiming
+
+# A small raster by default so the three channel passes take seconds; TMDS_FULL_FRAME=1
+# encodes a whole 1650x750 720p raster per channel instead.
+FULL_FRAME = os.getenv("TMDS_FULL_FRAME", "0") == "1"
+TIMING = VideoTiming() if FULL_FRAME else VideoTiming(64, 8, 4, 12, 16, 1, 1, 2)
+NUM_STREAM_CYCLES = 20000
+
+async def reset_dut(dut):
+    """Reset the encoder, clearing its running disparity. The clock has to be running."""
+    dut.data_in.value = 0
+    dut.control_in.value = 0
+    dut.ve_in.value = 0
+    dut.rst_in.value = 1
+    await ClockCycles(dut.clk_in, 5)
+    await FallingEdge(dut.clk_in)
+    dut.rst_in.value = 0
+
+async def stream_symbols(dut, data, control, ve):
+    """Drive data_in, control_in and ve_in one cycle at a time, only writing the ones that
+    change, and return tmds_out for each cycle's inputs as an array."""
+    clk_edge = FallingEdge(dut.clk_in) # inputs change and outputs are read between rising edges
+    inputs = [(dut.data_in, changes(data)), (dut.control_in, changes(control)), (dut.ve_in, changes(ve))]
+    tmds_out = dut.tmds_out
+    got = []
+
+    start = time.perf_counter()
+    for k in range(len(data) + ENCODER_LATENCY - 1):
+        for handle, values in inputs:
+            if k in values:
+                handle.value = values[k]
+        await clk_edge
+        got.append(tmds_out.value.integer)
+    elapsed = time.perf_counter() - start
+    dut._log.info(f"Encoded {len(data)} symbols at {len(got) / elapsed:.0f} cycles/s")
+    return np.array(got[ENCODER_LATENCY - 1:], dtype=np.int64)
+
+def pattern_frame(rng, timing):
+    """Colour bars over the top half, a grey ramp and then noise below."""
+    height, width = timing.active_lines, timing.active_h_pixels
+    bars = np.array([0xFFFFFF, 0xFFFF00, 0x00FFFF, 0x00FF00, 0xFF00FF, 0xFF0000, 0x0000FF, 0x000000])
+    frame = np.empty((height, width), dtype=np.int64)
+    frame[:height // 2] = bars[np.arange(width) * len(bars) // width]
+    ramp = np.arange(width) * 255 // max(width - 1, 1)
+    frame[height // 2:3 * height // 4] = ramp * 0x010101
+    frame[3 * height // 4:] = rng.integers(0, 1 << 24, size=(height - 3 * height // 4, width))
+    return frame
+
+@cocotb.test()
+async def test_random_stream(dut):
+    """Random data in bursts of random length between control periods, against the model."""
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    await reset_dut(dut)
+    rng = np.random.default_rng(random.getrandbits(32))
+    data = rng.integers(0, 256, size=NUM_STREAM_CYCLES)
+    # long bursts walk the disparity around, short ones keep restarting it
+    lengths = rng.integers(1, 200, size=NUM_STREAM_CYCLES // 50)
+    ve = np.concatenate([np.full(n, k % 2) for k, n in enumerate(lengths)])[:NUM_STREAM_CYCLES]
+    ve = np.pad(ve, (0, NUM_STREAM_CYCLES - len(ve)))
+    control = rng.integers(0, 4, size=NUM_STREAM_CYCLES)
+    got = await stream_symbols(dut, data, control, ve)
+
+    expected = encode(data[None], control[None], ve[None])[0]
+    bad = np.flatnonzero(got != expected)
+    assert len(bad) == 0, (f"{len(bad)} symbols differ, first at cycle {bad[0]} (data {data[bad[0]]:#04x}, ve {ve[bad[0]]}): "
+                           f"got {got[bad[0]]:#05x}, expected {expected[bad[0]]:#05x}")
+
+@cocotb.test()
+async def test_frame_decode(dut):
+    """Encode each channel of a frame over the whole raster, one pass per channel like the
+    three encoders of top_level, and decode the captured symbols back to the frame."""
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    rng = np.random.default_rng(random.getrandbits(32))
+    frame = pattern_frame(rng, TIMING)
+    active, hsync, vsync = raster_sync(TIMING)
+    symbols = np.zeros((3,) + active.shape, dtype=np.int64)
+    for channel in (BLUE, GREEN, RED):
+        await reset_dut(dut)
+        data = np.zeros(active.shape, dtype=np.int64)
+        data[:TIMING.active_lines, :TIMING.active_h_pixels] = (frame >> CHANNEL_SHIFTS[channel]) & 0xFF
+        control = (vsync << 1 | hsync) if channel == BLUE else np.zeros(active.shape, dtype=np.int64)
+        got = await stream_symbols(dut, data.ravel(), control.ravel(), active.ravel())
+        symbols[channel] = got.reshape(active.shape)
+
+    start = time.perf_counter()
+    decoded = decode_frame(symbols, TIMING)
+    dut._log.info(f"Decoded {TIMING.total_pixels}x{TIMING.total_lines} raster in {time.perf_counter() - start:.3f}s")
+    bad = decoded != frame
+    ys, xs = np.nonzero(bad)
+    assert not bad.any(), f"{len(ys)} pixels decode wrong, first ({xs[0]}, {ys[0]}): {decoded[ys[0], xs[0]]:#08x} instead of {frame[ys[0], xs[0]]:#08x}"
+
+@cocotb.test()
+async def test_serial_alignment(dut):
+    """Model only: serialize each channel of an encode_frame raster in tmds_serializer's bit
+    order, start the stream at every bit offset, and check symbol_alignment finds the symbol
+    boundary and deserialize gives the symbols (and so the frame) back."""
+    rng = np.random.default_rng(random.getrandbits(32))
+    frame = pattern_frame(rng, TIMING)
+    symbols = encode_frame(frame, TIMING)
+    recovered = np.zeros_like(symbols)
+    for channel in (BLUE, GREEN, RED):
+        bits = serialize(symbols[channel])
+        for offset in range(SYMBOL_BITS):
+            # the receiver starts listening offset bits before a symbol boundary
+            stream = np.concatenate([rng.integers(0, 2, size=offset), bits])
+            found = symbol_alignment(stream)
+            assert found == offset, f"channel {channel}: symbol boundary found {found} bits in, it is {offset}"
+            got = deserialize(stream, found)
+            bad = np.flatnonzero(got != symbols[channel].ravel())
+            assert not len(bad), f"channel {channel}, offset {offset}: {len(bad)} symbols differ, first at {bad[0]}"
+        recovered[channel] = got.reshape(symbols[channel].shape)
+    assert np.array_equal(decode_frame(recovered, TIMING), frame)
+
+def is_runner():
+    """TMDS Encoder Testing."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "tmds_encoder.sv"]
+    sources += [proj_path / "hdl" / "tm_choice.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="tmds_encoder",
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps'),
+        waves=build_waves()
+    )
+    run_test_args = []
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="tmds_encoder",
+        test_module="test_tmds_encoder",
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
@@ -0,0 +1,88 @@
+import cocotb
+import os
+import sys
+import random
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge
+from cocotb.runner import get_runner
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+from uart_link import LINK_DATA_WIDTH, UartDriver, collect_words, frame_bits, scaled_baud_rate
+
+# cycles per UART bit; 16 keeps a word to about 200 cycles, UART_BIT_PERIOD=868 is the real 115200 baud
+BIT_PERIOD = int(os.getenv("UART_BIT_PERIOD", "16"))
+BAUD_RATE = scaled_baud_rate(BIT_PERIOD)
+NUM_WORDS = 32
+
+async def do_setup(dut):
+    """Start the clock with the line idle; uart_receive has no reset of its own."""
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.rst_in.value = 0
+    driver = UartDriver(dut.clk_in, dut.rx_wire_in, BIT_PERIOD)
+    driver.idle()
+    await ClockCycles(dut.clk_in, 2 * BIT_PERIOD)
+    received = []
+    cocotb.start_soon(collect_words(dut.clk_in, dut.new_data_out, dut.data_byte_out, received))
+    return driver, received
+
+@cocotb.test()
+async def test_words(dut):
+    """Random words with a bit of idle line between them."""
+    driver, received = await do_setup(dut)
+    words = [random.randrange(1 << LINK_DATA_WIDTH) for _ in range(NUM_WORDS)]
+    # the receiver is busy for a couple of cycles after the stop bit, so frames sent with
+    # no idle at all between them slowly lose their alignment and drop words
+    await driver.send_words(words, gap_bits=1)
+    await ClockCycles(dut.clk_in, BIT_PERIOD)
+    assert received == words, f"Received {[hex(w) for w in received]}, sent {[hex(w) for w in words]}"
+
+@cocotb.test()
+async def test_start_glitch(dut):
+    """A start bit that goes back high within half a bit is ignored."""
+    driver, received = await do_setup(dut)
+    await driver.send(0, start_cycles=2)
+    await driver.send(0x5A5, gap_bits=1)
+    assert received == [0x5A5], f"Received {[hex(w) for w in received]} around a start glitch, expected [0x5a5]"
+
+@cocotb.test()
+async def test_framing_error(dut):
+    """A frame with a low stop bit is dropped, and the next frame still gets through."""
+    driver, received = await do_setup(dut)
+    await driver.send(0x123, stop_bit=0)
+    await driver.send(0x5A5, gap_bits=1)
+    assert received == [0x5A5], f"Received {[hex(w) for w in received]} around a framing error, expected [0x5a5]"
+
+def is_runner():
+    """UART Receive Testing."""
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "uart_receive.sv"]
+    sources += [proj_path / "hdl" / "counter.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {'BAUD_RATE': BAUD_RATE, 'DATA_WIDTH': LINK_DATA_WIDTH}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    cached_build(
+        runner,
+        sources=sources,
+        hdl_toplevel="uart_receive",
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps'),
+        waves=build_waves()
+    )
+    run_test_args = []
+    run_tests(
+        runner,
+        test_dir="sim_build",
+        hdl_toplevel="uart_receive",
+        test_module="test_uart_receive",
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
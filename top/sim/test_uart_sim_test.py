@@ -7,9 +7,24 @@ from math import log
 import logging
 from pathlib import Path
 from cocotb.clock import Clock
-from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
+from cocotb.triggers import Timer, ClockCycles, Edge, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner, Verilog
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+import json
+from uart_link import LINK_DATA_WIDTH, UartMonitor, collect_words, frame_bits, scaled_baud_rate
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from centroid_link_model import word_timing
+
+# cycles per UART bit; 16 keeps a word to about 200 cycles, UART_BIT_PERIOD=868 is the real 115200 baud
+BIT_PERIOD = int(os.getenv("UART_BIT_PERIOD", "16"))
+BAUD_RATE = scaled_baud_rate(BIT_PERIOD)
+DATA_WIDTH = int(os.getenv("UART_DATA_WIDTH", str(LINK_DATA_WIDTH)))
+WORD_TIMEOUT_CYCLES = 2 * frame_bits(DATA_WIDTH) * BIT_PERIOD
+TIMING_FILE = "uart_timing.json" # test_word_timing's measurements, next to results.xml
+NUM_WORDS = 64
 
 async def do_setup(dut):
     """cocotb test for seven segment controller"""
@@ -25,28 +40,98 @@ async def do_setup(dut):
     dut.rst_in.value = 0 #un reset device
     await FallingEdge(dut.clk_in)
 
-"""
-Example Test Code:
-dut._log.info("Starting...")
-cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
-dut._log.info("Holding reset...")
-dut.rst_in.value = 1
-await ClockCycles(dut.clk_in, 3) #wait three clock cycles
-await  FallingEdge(dut.clk_in)
-dut.rst_in.value = 0 #un reset device
-await ClockCycles(dut.clk_in, 1000) #wait a few clock cycles
-"""
+def start_monitors(dut):
+    """UartMonitor on the line between the transmitter and receiver, plus the words the
+    receiver stores in rx_data_out."""
+    monitor = UartMonitor(dut.clk_in, dut.line, BIT_PERIOD, DATA_WIDTH).start()
+    received = []
+    cocotb.start_soon(collect_words(dut.clk_in, dut.rx_trigger_out, dut.rx_data_out, received, delay_cycles=1))
+    return monitor, received
+
+async def send_word(dut, word):
+    """Trigger a transmit as soon as the transmitter is free. Call on a falling edge."""
+    while dut.busy_out.value != 0:
+        await FallingEdge(dut.clk_in)
+    dut.tx_data_in.value = word
+    dut.tx_trigger_in.value = 1
+    await ClockCycles(dut.clk_in, 1,rising=False)
+    dut.tx_data_in.value = 0b000_0000_0000 # once trigger in is off, don't expect data_in to stay the same!!
+    dut.tx_trigger_in.value = 0
+
 @cocotb.test()
 async def test_a(dut):
     await do_setup(dut)
+    monitor, received = start_monitors(dut)
+
+    expected = 0b101_0101_0101 & ((1 << DATA_WIDTH) - 1)
+    await send_word(dut, expected)
+    word = await with_timeout(monitor.words.get(), WORD_TIMEOUT_CYCLES * 10, "ns")
+    assert word == expected, f"Line carried {word:#x}, expected {expected:#x}"
+    await ClockCycles(dut.clk_in, 2 * BIT_PERIOD)
+    assert received == [expected], f"Receiver stored {[hex(w) for w in received]}, expected [{expected:#x}]"
+    assert not monitor.errors, monitor.errors
+
+@cocotb.test()
+async def test_back_to_back(dut):
+    """Words sent as fast as busy_out allows all arrive, about one frame apart."""
+    await do_setup(dut)
+    monitor, received = start_monitors(dut)
 
-    dut.tx_data_in.value = 0b101_0101_0101
+    words = [random.randrange(1 << DATA_WIDTH) for _ in range(NUM_WORDS)]
+    for word in words:
+        await send_word(dut, word)
+    await ClockCycles(dut.clk_in, WORD_TIMEOUT_CYCLES)
+
+    stats = monitor.report(dut._log)
+    assert not monitor.errors, f"{len(monitor.errors)} bad frames on the line, first: {monitor.errors[0]}"
+    assert [w for _, w in monitor.frames] == words, "Line carried different words than were sent"
+    assert received == words, f"Receiver stored {len(received)} words, {sum(a != b for a, b in zip(received, words))} wrong"
+    # uart_transmit's start bit is a cycle long and it idles a cycle before the next trigger
+    frame_cycles = frame_bits(DATA_WIDTH) * BIT_PERIOD
+    assert frame_cycles <= stats["min_interval"] and stats["max_interval"] <= frame_cycles + 4, \
+        f"Words {stats['min_interval']}-{stats['max_interval']} cycles apart, a frame is {frame_cycles}"
+
+
+@cocotb.test()
+async def test_word_timing(dut):
+    """Measure when a word gets through, counted from the edge that samples the trigger,
+    check it against centroid_link_model.word_timing and write it to TIMING_FILE."""
+    await do_setup(dut)
+    samples = [] # sim time of each data bit uart_receive shifts in
+    async def watch_samples():
+        while True:
+            await Edge(dut.uart_rx_x.num_bits_rxd)
+            if dut.uart_rx_x.num_bits_rxd.value.integer > 0:
+                samples.append(gst("ns"))
+    cocotb.start_soon(watch_samples())
+    idle = [] # sim time busy_out falls, a cycle before the next trigger can be taken
+    async def watch_busy():
+        await FallingEdge(dut.busy_out)
+        idle.append(gst("ns"))
+
+    dut.tx_data_in.value = random.randrange(1 << DATA_WIDTH)
     dut.tx_trigger_in.value = 1
-    await ClockCycles(dut.clk_in, 1,rising=False)
-    dut.tx_data_in.value = 0b000_0000_0000 # once trigger in is off, don't expect data_in to stay the same!!
+    await RisingEdge(dut.clk_in)
+    trigger_ns = gst("ns")
+    cocotb.start_soon(watch_busy())
+    await FallingEdge(dut.clk_in)
     dut.tx_trigger_in.value = 0
-    await ClockCycles(dut.clk_in, 12000)
-    
+    await with_timeout(RisingEdge(dut.rx_trigger_out), WORD_TIMEOUT_CYCLES * 10, "ns")
+    new_data_ns = gst("ns")
+    assert idle, "busy_out still high after the word was received"
+
+    cycles = lambda t: round((t - trigger_ns) / 10)
+    measured = {
+        "busy": cycles(idle[0]) + 1,
+        "new_data": cycles(new_data_ns),
+        "first_sample": cycles(samples[0]),
+        "last_sample": cycles(samples[DATA_WIDTH - 1]),
+    }
+    with open(TIMING_FILE, "w") as f:
+        json.dump({"bit_period": BIT_PERIOD, "data_width": DATA_WIDTH, **measured}, f, indent=2)
+    expected = word_timing(BIT_PERIOD, DATA_WIDTH)
+    dut._log.info(f"Word timing for {BIT_PERIOD} cycles per bit, {DATA_WIDTH} bits: {measured}")
+    assert measured == expected, f"Measured {measured}, centroid_link_model expects {expected}"
 
 def test_runner():
     """Simulate the counter using the Python runner."""
@@ -64,23 +149,24 @@ def test_runner():
         proj_path/"hdl"/"uart_receive.sv",
         proj_path/"hdl"/"counter.sv"]
     build_test_args = ["-Wall"]
-    parameters = {}
+    parameters = {'BAUD_RATE': BAUD_RATE, 'DATA_WIDTH': DATA_WIDTH}
     sys.path.append(str(proj_path / "sim"))
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel=MODULE_NAME,
-        always=True,
         build_args=build_test_args,
         parameters=parameters,
         timescale = ('1ns','1ps'),
-        waves=True
+        waves=build_waves()
     )
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel=MODULE_NAME,
         test_module=f"test_{MODULE_NAME}",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
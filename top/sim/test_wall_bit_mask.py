@@ -10,6 +10,13 @@ from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner, Verilog
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "scripts"))
+from wall_codec import decode_walls, wall_to_int
+
+BRAM_LATENCY = 2 # HIGH_PERFORMANCE read has an output register
 
 async def do_setup(dut):
     """cocotb test for seven segment controller"""
@@ -50,6 +57,26 @@ async def test_a(dut):
     await FallingEdge(dut.clk_in)
     dut.valid_in.value=0
     await ClockCycles(dut.clk_in, 3)
+
+@cocotb.test()
+async def test_all_walls(dut):
+    """Every BRAM entry should match walls.mem as decoded by the wall codec."""
+    cocotb.start_soon(Clock(dut.clk_in, 10, units="ns").start())
+    dut.rst_in.value = 1
+    dut.bitmask_idx.value = 0
+    await ClockCycles(dut.clk_in, 3)
+    await FallingEdge(dut.clk_in)
+    dut.rst_in.value = 0
+
+    # $readmemh resolves walls.mem against the simulator's working directory
+    with open(Path.cwd() / "walls.mem") as f:
+        walls = decode_walls(f.read().split('\n'))
+
+    for idx in range(len(walls)):
+        dut.bitmask_idx.value = idx
+        await ClockCycles(dut.clk_in, BRAM_LATENCY + 1, rising=False)
+        expected = wall_to_int(walls[idx])
+        assert dut.wall_bit_mask.value.integer == expected, f"Wall {idx} does not match walls.mem"
     
 
 def test_runner():
@@ -68,21 +95,22 @@ def test_runner():
     build_test_args = ["-Wall"]
     parameters = {}
     sys.path.append(str(proj_path / "sim"))
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel=MODULE_NAME,
-        always=True,
         build_args=build_test_args,
         parameters=parameters,
         timescale = ('1ns','1ps'),
-        waves=True
+        waves=build_waves()
     )
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel=MODULE_NAME,
         test_module=f"test_{MODULE_NAME}",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
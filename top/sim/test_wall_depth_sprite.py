@@ -10,6 +10,40 @@ from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
 from cocotb.runner import get_runner, Verilog
+from build_cache import cached_build
+from wave_policy import build_waves, run_tests
+import numpy as np
+from video_source import VideoTiming, drive_video
+from frame_scoreboard import FrameCapture
+
+# Placed and sized the way graphics_controller instantiates it
+GOAL_DEPTH = 60
+GOAL_DEPTH_DELTA = 10
+MAX_WALL_DEPTH = 75
+X, Y = 950, 20
+WIDTH, HEIGHT = MAX_WALL_DEPTH * 4, 20
+WALL_COLOR = 0xFF0080
+NUM_PLAYERS = 3
+PLAYER_DEPTHS = [40, 50, 62, 70]
+PLAYER_COLORS = [0x008000, 0x800000, 0x800080, 0xFF8000]
+GOAL_COLOR = 0x000080
+
+def sprite_model(wall_depth, num_players=NUM_PLAYERS, player_depths=PLAYER_DEPTHS):
+    """Expected pixel_out inside the sprite, (HEIGHT, WIDTH). wall_depth is the full frame of
+    wall_depth_in. Player p > 0 is drawn when num_players_in >= p, like the RTL, so with its
+    2-bit num_players_in the fourth player (== 4) never is."""
+    depth = np.arange(WIDTH) >> 2
+    wall = wall_depth[Y:Y + HEIGHT, X:X + WIDTH]
+    expected = np.full((HEIGHT, WIDTH), 0xFFFFFF, dtype=np.int64)
+    goal = (depth == GOAL_DEPTH - GOAL_DEPTH_DELTA) | (depth == GOAL_DEPTH + GOAL_DEPTH_DELTA)
+    expected[:, goal] = GOAL_COLOR
+    drawn = [True, num_players >= 1, num_players >= 2, num_players == 4]
+    # lowest priority first, so the wall and then player 0 end up on top
+    for p in reversed(range(len(player_depths))):
+        if drawn[p]:
+            expected[:, depth == player_depths[p]] = PLAYER_COLORS[p]
+    expected[wall == depth] = WALL_COLOR
+    return expected
 
 async def do_setup(dut):
     """cocotb test for seven segment controller"""
@@ -21,7 +55,9 @@ async def do_setup(dut):
     dut.hcount_in.value = 0
     dut.vcount_in.value = 0
     dut.wall_depth_in.value = 0
-    dut.player_depth_in.value = 0
+    dut.num_players_in.value = NUM_PLAYERS
+    for p, depth in enumerate(PLAYER_DEPTHS):
+        dut.player_depths_in[p].value = depth
     await ClockCycles(dut.clk_in, 3) #wait three clock cycles
     await  FallingEdge(dut.clk_in)
     dut.rst_in.value = 0 #un reset device
@@ -42,14 +78,30 @@ await ClockCycles(dut.clk_in, 1000) #wait a few clock cycles
 async def test_a(dut):
     await do_setup(dut)
 
-    for v in range(1):
-        for h in range(20):
-            dut.hcount_in.value = h
-            dut.vcount_in.value = v
-            dut.wall_depth_in.value = 3
-            dut.player_depth_in.value = 0
-            await FallingEdge(dut.clk_in)   
-    
+    # the first 20 pixels of line 0, no blanking
+    timing = VideoTiming(20, 0, 0, 0, 1, 0, 0, 0)
+    await drive_video(dut, timing, sideband={"wall_depth_in": np.full((1, 20), 3)},
+                      clk_edge=FallingEdge(dut.clk_in), valid=None)
+
+@cocotb.test()
+async def test_full_frame(dut):
+    """A full 720p frame, with a different wall depth on every line of the sprite, checked
+    against sprite_model. Outside the sprite pixel_out is not driven, so only the sprite is compared."""
+    await do_setup(dut)
+    timing = VideoTiming()
+    # the wall on each player (50 and 70 are also the goal bounds), on the goal and at both ends
+    line_depths = np.array([0] + PLAYER_DEPTHS + [GOAL_DEPTH, MAX_WALL_DEPTH - 1])
+    wall_depth = np.repeat(line_depths[np.arange(timing.active_lines) % len(line_depths)], timing.active_h_pixels).reshape(timing.active_lines, -1)
+    capture = FrameCapture(dut.pixel_out, timing.active_h_pixels, timing.active_lines)
+    await drive_video(dut, timing, sideband={"wall_depth_in": wall_depth},
+                      clk_edge=FallingEdge(dut.clk_in), valid=None, skip_blanking=True, capture=capture)
+
+    sprite = capture.frame[Y:Y + HEIGHT, X:X + WIDTH]
+    expected = sprite_model(wall_depth)
+    ys, xs = np.nonzero(sprite != expected)
+    assert not len(ys), (f"{len(ys)} sprite pixels differ from the model, first at ({X + xs[0]}, {Y + ys[0]}): "
+                         f"got {sprite[ys[0], xs[0]]:#08x}, expected {expected[ys[0], xs[0]]:#08x}")
+
 
 def test_runner():
     """Simulate the counter using the Python runner."""
@@ -65,30 +117,32 @@ def test_runner():
         proj_path / "hdl" / f"{MODULE_NAME}.sv"]
     build_test_args = ["-Wall"]
     parameters = {
-        "GOAL_DEPTH": 3,
-        "GOAL_DEPTH_DELTA": 1,
-        "MAX_WALL_DEPTH": 5,
-        "X": 0,
-        "Y": 0,
-        "HEIGHT": 1,
-        "BAR_WIDTH": 1
+        "GOAL_DEPTH": GOAL_DEPTH,
+        "GOAL_DEPTH_DELTA": GOAL_DEPTH_DELTA,
+        "MAX_WALL_DEPTH": MAX_WALL_DEPTH,
+        "X": X,
+        "Y": Y,
+        "HEIGHT": HEIGHT,
+        "WALL_COLOR": WALL_COLOR,
+        "BAR_WIDTH": 5
     }
     sys.path.append(str(proj_path / "sim"))
-    runner.build(
+    cached_build(
+        runner,
         sources=sources,
         hdl_toplevel=MODULE_NAME,
-        always=True,
         build_args=build_test_args,
         parameters=parameters,
         timescale = ('1ns','1ps'),
-        waves=True
+        waves=build_waves()
     )
     run_test_args = []
-    runner.test(
+    run_tests(
+        runner,
+        test_dir="sim_build",
         hdl_toplevel=MODULE_NAME,
         test_module=f"test_{MODULE_NAME}",
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+import cocotb
+from cocotb.queue import Queue
+from cocotb.triggers import ClockCycles, FallingEdge, ReadOnly, RisingEdge
+from cocotb.utils import get_sim_time
+
+# Protocol level stimulus and checking for uart_transmit/uart_receive, the link the
+# SECONDARY board sends its centroids to MAIN over. UartMonitor decodes a line into a queue
+# of words and UartDriver drives one, both sampling/holding in whole clock cycles of the
+# RTL's bit period, so they only wake up once per bit.
+#
+# At top_level's 115200 baud a bit is 868 cycles and an 11-bit word over 11k, so benches
+# scale BAUD_RATE instead: the RTL only ever uses INPUT_CLOCK_FREQ / BAUD_RATE, and with
+# scaled_baud_rate(16) a word takes about 200 cycles.
+
+INPUT_CLOCK_FREQ = 100_000_000 # uart_transmit/uart_receive default
+LINK_BAUD_RATE = 115200 # top_level's UART_BAUD_RATE
+LINK_DATA_WIDTH = 11
+
+def bit_period(baud_rate, clock_freq=INPUT_CLOCK_FREQ):
+    """The RTL's BAUD_BIT_PERIOD in clock cycles."""
+    return clock_freq // baud_rate
+
+def scaled_baud_rate(cycles_per_bit, clock_freq=INPUT_CLOCK_FREQ):
+    """BAUD_RATE parameter that gives a bit period of cycles_per_bit."""
+    baud_rate = clock_freq // cycles_per_bit
+    assert bit_period(baud_rate, clock_freq) == cycles_per_bit, f"no BAUD_RATE gives {cycles_per_bit} cycles per bit"
+    return baud_rate
+
+def frame_bits(data_width):
+    """Start bit, data bits, stop bit."""
+    return data_width + 2
+
+class UartMonitor:
+    """Decodes the frames on a UART line into words, LSB first.
+
+    Each frame is sampled in the middle of its bits, counted in clock cycles from the
+    falling edge of its start bit. A start bit that is not low half a bit in is dropped
+    as a glitch, and a stop bit that is not high is a framing error; both go in errors as
+    (cycle, message) instead of the queue. Call start() once the line is out of reset."""
+
+    def __init__(self, clk, line, bit_period, data_width=LINK_DATA_WIDTH, clock_period_ns=10, name=None):
+        self.clk = clk
+        self.line = line
+        self.bit_period = bit_period
+        self.data_width = data_width
+        self.clock_period_ns = clock_period_ns
+        self.name = name or line._name
+        self.words = Queue()
+        self.frames = [] # (start cycle, word) of every good frame
+        self.errors = [] # (start cycle, message)
+
+    def start(self):
+        self._task = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        self._task.kill()
+
+    def now(self):
+        return int(get_sim_time("ns") // self.clock_period_ns)
+
+    def sample(self):
+        try:
+            return self.line.value.integer
+        except ValueError:
+            return None
+
+    async def _run(self):
+        while True:
+            if self.sample() != 1:
+                await RisingEdge(self.line)
+            await FallingEdge(self.line)
+            start = self.now()
+            await ClockCycles(self.clk, self.bit_period // 2)
+            if self.sample() != 0:
+                self.errors.append((start, f"{self.name}: start bit glitch"))
+                continue
+            word = 0
+            for i in range(self.data_width):
+                await ClockCycles(self.clk, self.bit_period)
+                bit = self.sample()
+                if bit is None:
+                    self.errors.append((start, f"{self.name}: data bit {i} unresolved"))
+                    break
+                word |= bit << i
+            else:
+                await ClockCycles(self.clk, self.bit_period)
+                if self.sample() != 1:
+                    self.errors.append((start, f"{self.name}: framing error, stop bit low after {word:#x}"))
+                    continue
+                self.frames.append((start, word))
+                self.words.put_nowait(word)
+
+    def intervals(self):
+        """Cycles between the start bits of consecutive frames."""
+        starts = [start for start, _ in self.frames]
+        return [b - a for a, b in zip(starts, starts[1:])]
+
+    def throughput(self, clock_freq=INPUT_CLOCK_FREQ):
+        """Word-to-word statistics over the frames seen so far, scaled to clock_freq."""
+        intervals = self.intervals()
+        if not intervals:
+            return {"words": len(self.frames)}
+        mean = sum(intervals) / len(intervals)
+        ideal = frame_bits(self.data_width) * self.bit_period
+        return {
+            "words": len(self.frames),
+            "min_interval": min(intervals),
+            "mean_interval": mean,
+            "max_interval": max(intervals),
+            "words_per_second": clock_freq / mean,
+            "efficiency": ideal / mean, # of the line's time spent in frames
+        }
+
+    def report(self, log, clock_freq=INPUT_CLOCK_FREQ):
+        stats = self.throughput(clock_freq)
+        if "mean_interval" in stats:
+            log.info(f"{self.name}: {stats['words']} words, {stats['mean_interval']:.1f} cycles apart "
+                     f"(min {stats['min_interval']}, max {stats['max_interval']}), "
+                     f"{stats['words_per_second']:.0f} words/s at {clock_freq / 1e6:g} MHz, "
+                     f"{100 * stats['efficiency']:.1f}% of the line busy")
+        for cycle, message in self.errors:
+            log.warning(f"cycle {cycle}: {message}")
+        return stats
+
+class UartDriver:
+    """Drives frames onto a UART line (e.g. a uart_receive's rx_wire_in), holding each bit
+    for bit_period cycles. Start it idle high with idle()."""
+
+    def __init__(self, clk, line, bit_period, data_width=LINK_DATA_WIDTH):
+        self.clk = clk
+        self.line = line
+        self.bit_period = bit_period
+        self.data_width = data_width
+
+    def idle(self):
+        self.line.value = 1
+
+    async def send(self, word, stop_bit=1, start_cycles=None, gap_bits=0):
+        """One frame, then gap_bits of idle line. stop_bit=0 makes a framing error, and
+        start_cycles shorter than a bit makes a start bit glitch with nothing after it."""
+        self.line.value = 0
+        if start_cycles is not None and start_cycles < self.bit_period:
+            await ClockCycles(self.clk, start_cycles)
+            self.line.value = 1
+            await ClockCycles(self.clk, self.bit_period * (1 + gap_bits))
+            return
+        await ClockCycles(self.clk, self.bit_period)
+        for i in range(self.data_width):
+            self.line.value = (word >> i) & 1
+            await ClockCycles(self.clk, self.bit_period)
+        self.line.value = stop_bit
+        await ClockCycles(self.clk, self.bit_period)
+        self.line.value = 1
+        if gap_bits:
+            await ClockCycles(self.clk, self.bit_period * gap_bits)
+
+    async def send_words(self, words, gap_bits=0):
+        for word in words:
+            await self.send(word, gap_bits=gap_bits)
+
+async def collect_words(clk, strobe, data, words, delay_cycles=0):
+    """Append data to words every time strobe pulses, delay_cycles rising edges of clk
+    after it goes high (for a data register loaded by the strobe). Run with start_soon."""
+    while True:
+        await RisingEdge(strobe)
+        for _ in range(delay_cycles):
+            await RisingEdge(clk)
+        await ReadOnly()
+        words.append(data.value.integer)
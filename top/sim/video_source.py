@@ -0,0 +1,144 @@
+import time
+import numpy as np
+from cocotb.triggers import RisingEdge
+from stream_driver import skip_cycles
+
+# Raster stimulus for modules that follow video_sig_gen's hcount/vcount, like
+# game_logic_controller or the sprites. A 720p frame is 1.2M cycles, so the per-cycle
+# work is kept to one hcount assignment and one await: vcount and data_valid change once
+# per line and the sideband inputs (is_person_in, player_depth_in, ...) are only written
+# on the pixels where their value changes, found up front with NumPy.
+
+class VideoTiming:
+    """video_sig_gen's parameters, 1280x720 at 60 fps by default."""
+
+    def __init__(self, active_h_pixels=1280, h_front_porch=110, h_sync_width=40, h_back_porch=220,
+                 active_lines=720, v_front_porch=5, v_sync_width=5, v_back_porch=20):
+        self.active_h_pixels = active_h_pixels
+        self.h_front_porch = h_front_porch
+        self.h_sync_width = h_sync_width
+        self.h_back_porch = h_back_porch
+        self.active_lines = active_lines
+        self.v_front_porch = v_front_porch
+        self.v_sync_width = v_sync_width
+        self.v_back_porch = v_back_porch
+
+    @property
+    def total_pixels(self):
+        return self.active_h_pixels + self.h_front_porch + self.h_sync_width + self.h_back_porch
+
+    @property
+    def total_lines(self):
+        return self.active_lines + self.v_front_porch + self.v_sync_width + self.v_back_porch
+
+    @property
+    def frame_cycles(self):
+        return self.total_pixels * self.total_lines
+
+def line_changes(handles, frames, y):
+    """{x: [(handle, value), ...]} for the pixels of line y where a sideband input changes,
+    x = 0 always being written since blanking leaves every sideband at 0."""
+    changes = {}
+    for handle, frame in zip(handles, frames):
+        row = frame[y]
+        xs = np.flatnonzero(np.diff(row, prepend=row[0] - 1))
+        for x, value in zip(xs.tolist(), row[xs].tolist()):
+            changes.setdefault(x, []).append((handle, value))
+    return changes
+
+async def drive_frame(dut, timing, sideband=None, clk_edge=None, hcount="hcount_in", vcount="vcount_in",
+                      valid="data_valid_in", skip_blanking=False, capture=None, clock_period_ns=10):
+    """Drive one frame in raster order, active lines first and then the vertical blanking,
+    one pixel per cycle on clk_edge (a RisingEdge of clk_in unless given). Must be called
+    right after that edge, and returns right after the edge of the frame's last cycle.
+
+    sideband maps input names to (active_lines, active_h_pixels) arrays of their value at each
+    active pixel, held at 0 during blanking. valid=None for modules without a valid input.
+    skip_blanking waits out the blanking with one Timer, with hcount/vcount parked at the last
+    blanking pixel so the next active pixel still sees the count that came before it.
+    capture is a frame_scoreboard.FrameCapture to read the DUT's output into after each edge.
+    Returns the achieved simulated cycles/second.
+    """
+    clk_edge = clk_edge or RisingEdge(dut.clk_in) # reuse one trigger instead of building one per cycle
+    hcount_in, vcount_in = getattr(dut, hcount), getattr(dut, vcount)
+    valid_in = getattr(dut, valid) if valid else None
+    sideband = sideband or {}
+    handles = [getattr(dut, name) for name in sideband]
+    # plain python ints are much cheaper to assign to handles than numpy scalars
+    frames = [np.asarray(frame).astype(np.int64) for frame in sideband.values()]
+    for frame in frames:
+        assert frame.shape == (timing.active_lines, timing.active_h_pixels), \
+            f"sideband frame is {frame.shape}, expected {(timing.active_lines, timing.active_h_pixels)}"
+    active_x = range(timing.active_h_pixels)
+    blank_x = range(timing.active_h_pixels, timing.total_pixels)
+    h_blank = timing.total_pixels - timing.active_h_pixels
+    # a delayed output finishes each line in the first cycles of the horizontal blanking
+    tail = capture.latency if capture else 0
+    assert tail <= h_blank, f"capture latency {tail} does not fit in {h_blank} cycles of horizontal blanking"
+
+    start = time.perf_counter()
+    for y in range(timing.active_lines):
+        changes = line_changes(handles, frames, y)
+        vcount_in.value = y
+        if valid_in is not None:
+            valid_in.value = 1
+        seen = []
+        for x in active_x:
+            hcount_in.value = x
+            if x in changes:
+                for handle, value in changes[x]:
+                    handle.value = value
+            await clk_edge
+            if capture:
+                seen.append(capture.read())
+
+        if valid_in is not None:
+            valid_in.value = 0
+        for handle in handles:
+            handle.value = 0
+        for x in blank_x[:tail]:
+            hcount_in.value = x
+            await clk_edge
+            seen.append(capture.read())
+        if capture:
+            capture.store_line(y, seen)
+        if skip_blanking and h_blank > tail:
+            hcount_in.value = timing.total_pixels - 1
+            await skip_cycles(clk_edge, h_blank - tail, clock_period_ns)
+        else:
+            for x in blank_x[tail:]:
+                hcount_in.value = x
+                await clk_edge
+
+    v_blank = (timing.total_lines - timing.active_lines) * timing.total_pixels
+    if skip_blanking and v_blank:
+        hcount_in.value = timing.total_pixels - 1
+        vcount_in.value = timing.total_lines - 1
+        await skip_cycles(clk_edge, v_blank, clock_period_ns)
+    else:
+        for y in range(timing.active_lines, timing.total_lines):
+            vcount_in.value = y
+            for x in range(timing.total_pixels):
+                hcount_in.value = x
+                await clk_edge
+    elapsed = time.perf_counter() - start
+
+    cycles_per_second = timing.frame_cycles / elapsed if elapsed > 0 else float("inf")
+    dut._log.debug(f"Drove {timing.active_h_pixels}x{timing.active_lines} frame at {cycles_per_second:.0f} cycles/s")
+    return cycles_per_second
+
+async def drive_video(dut, timing, num_frames=1, sideband=None, **kwargs):
+    """Drive num_frames back to back. sideband arrays may have a leading frame axis to give
+    every frame its own values, and are repeated otherwise. Takes drive_frame's keyword
+    arguments and logs the overall cycles/second, which it returns."""
+    sideband = {name: np.asarray(frames) for name, frames in (sideband or {}).items()}
+    start = time.perf_counter()
+    for k in range(num_frames):
+        frame = {name: frames[k] if frames.ndim == 3 else frames for name, frames in sideband.items()}
+        await drive_frame(dut, timing, frame, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    cycles_per_second = num_frames * timing.frame_cycles / elapsed if elapsed > 0 else float("inf")
+    dut._log.info(f"Drove {num_frames} {timing.active_h_pixels}x{timing.active_lines} frames "
+                  f"({timing.total_pixels}x{timing.total_lines} with blanking) at {cycles_per_second:.0f} cycles/s")
+    return cycles_per_second
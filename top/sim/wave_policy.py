@@ -0,0 +1,120 @@
+import itertools
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from cocotb.runner import get_results
+from build_cache import cached_build
+
+# Waveform policy for the runners, picked with the WAVES environment variable:
+#   WAVES=failure (default)  run without dumping; if a test fails, re-run it with the same seed
+#                            and dump only the last WAVE_WINDOW_CYCLES cycles before the failure
+#   WAVES=on                 always dump the whole run (the old waves=True behaviour)
+#   WAVES=off                never dump
+WAVES = os.getenv("WAVES", "failure")
+WAVE_WINDOW_CYCLES = int(os.getenv("WAVE_WINDOW_CYCLES", "10000"))
+
+DUMP_MODULE = "waveform_window_dump"
+
+# Every run_tests call also keeps a numbered copy of its results, so a runner that calls it
+# more than once (one build per parameter set, a sweep) leaves all of them for run_regression.py.
+RUN_RESULTS = "results_run{:03d}.xml"
+RUN_RESULTS_GLOB = "results_run*.xml"
+_run_index = itertools.count()
+
+def build_waves():
+    """waves= argument for the normal build/test."""
+    return WAVES == "on"
+
+def write_window_dump_module(path, hdl_toplevel):
+    """Like cocotb's own iverilog dump module, but $dumpvars only starts at +dump_start_ns."""
+    path.write_text(
+        f"module {DUMP_MODULE}();\n"
+        "reg [63:0] dump_start_ns;\n"
+        "initial begin\n"
+        '    if (!$value$plusargs("dump_start_ns=%d", dump_start_ns)) dump_start_ns = 0;\n'
+        f'    $dumpfile("{hdl_toplevel}_failure.fst");\n'
+        f"    #(dump_start_ns) $dumpvars(0, {hdl_toplevel});\n"
+        "end\n"
+        "endmodule\n"
+    )
+
+def first_failure(results_file):
+    """(seed, tests up to and including the first failing one, sim time of the failure in ns)."""
+    if not results_file.is_file():
+        return None
+    root = ET.parse(results_file).getroot()
+    seed = None
+    for prop in root.iter("property"):
+        if prop.get("name") == "random_seed":
+            seed = prop.get("value")
+    tests = []
+    elapsed_ns = 0.0
+    for case in root.iter("testcase"):
+        tests.append(case.get("name"))
+        elapsed_ns += float(case.get("sim_time_ns", 0))
+        if case.find("failure") is not None or case.find("error") is not None:
+            return seed, tests, elapsed_ns
+    return None
+
+def capture_failure_window(runner, test_dir, failure, clock_period_ns, **test_kwargs):
+    """Re-run up to the failing test with the same seed, dumping only the window before it.
+    The earlier tests are kept in the re-run because they advance the shared random stream."""
+    seed, tests, failure_ns = failure
+    hdl_toplevel = runner.hdl_toplevel
+    build_kwargs = dict(timescale=runner.timescale, parameters=runner.parameters, build_args=runner.build_args)
+
+    if type(runner).__name__ == "Icarus":
+        dump_source = Path(test_dir).resolve() / f"{DUMP_MODULE}_{hdl_toplevel}.v"
+        write_window_dump_module(dump_source, hdl_toplevel)
+        build_kwargs["build_args"] = build_kwargs["build_args"] + ["-s", DUMP_MODULE]
+        cached_build(runner, sources=runner.sources + [dump_source], hdl_toplevel=hdl_toplevel, waves=False, **build_kwargs)
+        start_ns = max(0, int(failure_ns - WAVE_WINDOW_CYCLES * clock_period_ns))
+        plusargs = ["-fst", f"+dump_start_ns={start_ns}"]
+        waves = False
+        wave_file = Path(test_dir).resolve() / f"{hdl_toplevel}_failure.fst"
+    else:
+        # no windowed dump module for other simulators, fall back to dumping the whole re-run
+        cached_build(runner, sources=runner.sources, hdl_toplevel=hdl_toplevel, waves=True, **build_kwargs)
+        plusargs = []
+        waves = True
+        wave_file = runner.build_dir
+
+    print(f"INFO: Re-running {', '.join(tests)} with seed {seed} to capture waves before the failure at {failure_ns:.0f}ns")
+    # under pytest cocotb picks the results file itself and refuses a results_xml
+    rerun_kwargs = {} if os.getenv("PYTEST_CURRENT_TEST") else {"results_xml": "failure_results.xml"}
+    try:
+        runner.test(test_dir=test_dir, seed=seed, testcase=tests, plusargs=plusargs, waves=waves,
+                    **rerun_kwargs, **test_kwargs)
+    except SystemExit:
+        pass # the re-run is expected to fail again
+    print(f"INFO: Failure waves written to {wave_file}")
+
+def results_file(runner, test_dir):
+    """The results file runner.test just wrote. Under pytest cocotb names it after the pytest
+    test (and the unset results_xml) instead of results.xml."""
+    if os.getenv("PYTEST_CURRENT_TEST"):
+        return Path(test_dir) / f"{runner.current_test_name}.None"
+    return Path(test_dir) / "results.xml"
+
+def run_tests(runner, test_dir="sim_build", clock_period_ns=10, **test_kwargs):
+    """runner.test(...) under the WAVES policy. Takes the same arguments except waves. Returns
+    the results file, copied to the next RUN_RESULTS, and raises SystemExit if any test failed: outside pytest cocotb only
+    returns the file, so a failing run would otherwise exit 0."""
+    try:
+        results = runner.test(test_dir=test_dir, waves=build_waves(), **test_kwargs)
+    except SystemExit:
+        # under pytest cocotb raises on failing tests itself; anything else is a crash
+        results = results_file(runner, test_dir)
+        if not results.is_file():
+            raise
+    shutil.copyfile(results, Path(test_dir) / RUN_RESULTS.format(next(_run_index)))
+    num_tests, num_failed = get_results(Path(results))
+    if not num_failed:
+        return results
+
+    if WAVES == "failure":
+        failure = first_failure(Path(results).resolve())
+        if failure is not None:
+            capture_failure_window(runner, test_dir, failure, clock_period_ns, **test_kwargs)
+    raise SystemExit(f"ERROR: {num_failed} of {num_tests} tests failed, see {results}")
@@ -0,0 +1,688 @@
+import gzip
+import math
+import re
+import struct
+import zlib
+from collections import namedtuple
+from pathlib import Path
+import numpy as np
+
+# Reads the FST dumps the runners write (WAVES=on, or the failure window from wave_policy) and
+# VCD files, so a long run can be checked after the fact instead of in GTKWave. Only the signals
+# asked for are decoded, one block of the dump at a time, so memory depends on how often those
+# signals change rather than on the size of the dump:
+#
+#   wave = open_waveform("sim_build/game_logic_controller.fst")
+#   collisions, spacing = scan(wave, "clk_in", [FrameCounts("is_collision_out", "new_frame"),
+#                                               PulseSpacing("data_valid_out")])
+#   collisions.result()    # cycles with is_collision_out high in each whole frame
+#   spacing.result()       # cycles between consecutive data_valid_out pulses
+#
+# Values are integers with X/Z anywhere in them read as UNRESOLVED, as in pipeline_probe.
+# Signals wider than 63 bits come out as Python ints in object arrays, real signals as floats.
+# FST is read without GTKWave's fstapi, the way frame_scoreboard reads PNGs without Pillow:
+# value change blocks of all three position table formats, packed with zlib, FastLZ or LZ4.
+# The lz4 package is used for LZ4 when installed. Varints, waves and VCD lines are decoded
+# with numpy a block at a time; only multi-bit FST waves with X/Z or mixed record sizes, and
+# X/Z, real or >63 bit VCD values, are decoded a change at a time.
+# On one core that is about 3.5 million value changes a second from FST and 12 MB a second
+# of VCD: a 300000 cycle dump of a few counters takes 0.4 s as FST and 1.5 s as a 17 MB VCD.
+
+UNRESOLVED = -1
+VCD_CHUNK_BYTES = 1 << 24 # bytes of a VCD decoded at a time
+
+Signal = namedtuple("Signal", ["name", "width", "key"]) # key: FST handle or VCD identifier
+
+def open_waveform(path):
+    """An FstFile or VcdFile, by extension."""
+    path = Path(path)
+    if path.suffix == ".fst":
+        return FstFile(path)
+    if path.suffix == ".vcd":
+        return VcdFile(path)
+    raise ValueError(f"{path}: not an .fst or .vcd file")
+
+BIT_VALUES = {"0": 0, "1": 1, "l": 0, "h": 1}
+
+def value_dtype(width, real=False):
+    return np.float64 if real else object if width > 63 else np.int64
+
+def to_values(strings, width):
+    """VCD-style value strings to integers, UNRESOLVED where any bit is not 0 or 1."""
+    if width == 1:
+        return np.array([BIT_VALUES.get(s, UNRESOLVED) for s in strings], dtype=np.int64)
+    out = np.empty(len(strings), dtype=value_dtype(width))
+    for i, s in enumerate(strings):
+        try:
+            out[i] = int(s, 2)
+        except ValueError:
+            s = s.replace("h", "1").replace("l", "0")
+            out[i] = int(s, 2) if s and set(s) <= {"0", "1"} else UNRESOLVED
+    return out
+
+class Waveform:
+    """What FstFile and VcdFile share: the signal table and name lookup."""
+
+    def find(self, name):
+        """The signal named `name`, either in full (top.sub.signal) or by a unique suffix."""
+        if name in self.signals:
+            return self.signals[name]
+        matches = [full for full in self.signals if full.endswith("." + name)]
+        if len(matches) != 1:
+            raise KeyError(f"{name} matches {matches or 'no signal'} in {self.path}")
+        return self.signals[matches[0]]
+
+    def series(self, names):
+        """Every change of each signal over the whole dump as {name: (times, values)}. For
+        signals that change rarely; stream changes() or cycles() for anything per-cycle."""
+        parts = {name: ([], []) for name in names}
+        for chunk in self.changes(names):
+            for name, (times, values) in chunk.items():
+                parts[name][0].append(times)
+                parts[name][1].append(values)
+        return {name: (np.concatenate(times) if times else np.zeros(0, dtype=np.int64),
+                       np.concatenate(values) if values else np.zeros(0, dtype=np.int64))
+                for name, (times, values) in parts.items()}
+
+# ---------------------------------------------------------------------------------------------
+# FST
+
+FST_BL_HDR, FST_BL_VCDATA, FST_BL_BLACKOUT, FST_BL_GEOM, FST_BL_HIER = 0, 1, 2, 3, 4
+FST_BL_VCDATA_DYN_ALIAS, FST_BL_HIER_LZ4, FST_BL_HIER_LZ4DUO, FST_BL_VCDATA_DYN_ALIAS2 = 5, 6, 7, 8
+FST_BL_SKIP = 255
+FST_ST_GEN_ATTRBEGIN, FST_ST_GEN_ATTREND, FST_ST_VCD_SCOPE, FST_ST_VCD_UPSCOPE = 252, 253, 254, 255
+FST_RCV_STR = "xzhuwl-?" # 1-bit non-binary values by code
+FST_RCV_VALUES = np.array([BIT_VALUES.get(c, UNRESOLVED) for c in FST_RCV_STR], dtype=np.int64)
+
+def varints(data, count=None):
+    """The first count (default all) LEB128 unsigned varints in data as a uint64 array."""
+    data = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)[:count]
+    if not len(ends):
+        return np.zeros(0, dtype=np.uint64)
+    data = data[:ends[-1] + 1].astype(np.uint64)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    shifts = 7 * (np.arange(len(data)) - np.repeat(starts, ends - starts + 1))
+    return np.add.reduceat((data & 0x7F) << shifts.astype(np.uint64), starts)
+
+def varint(data, pos):
+    """LEB128 unsigned varint at pos: (value, position after it)."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+def svarint(data, pos):
+    value, end = varint(data, pos)
+    bits = 7 * (end - pos)
+    return (value - (1 << bits) if value >> (bits - 1) & 1 else value), end
+
+def copy_match(out, ref, length):
+    """The length bytes an LZ77 match copies from out[ref:], which may run into the bytes it
+    is producing."""
+    distance = len(out) - ref
+    if distance >= length:
+        return out[ref:ref + length]
+    return (out[ref:] * (length // distance + 1))[:length]
+
+def fastlz_decompress(data, size):
+    level = data[0] >> 5
+    out = bytearray()
+    pos, ctrl = 1, data[0] & 31
+    while True:
+        if ctrl >= 32:
+            length = (ctrl >> 5) - 1
+            ofs = (ctrl & 31) << 8
+            if length == 6:
+                if level == 0:
+                    length += data[pos]
+                    pos += 1
+                else:
+                    while True:
+                        code = data[pos]
+                        pos += 1
+                        length += code
+                        if code != 255:
+                            break
+            code = data[pos]
+            pos += 1
+            ref = len(out) - ofs - code - 1
+            if level and code == 255 and ofs == 31 << 8:
+                ref = len(out) - ((data[pos] << 8) + data[pos + 1]) - 8191 - 1
+                pos += 2
+            out += copy_match(out, ref, length + 3)
+        else:
+            out += data[pos:pos + ctrl + 1]
+            pos += ctrl + 1
+        if pos >= len(data):
+            break
+        ctrl = data[pos]
+        pos += 1
+    assert len(out) == size, f"FastLZ block decoded to {len(out)} bytes, expected {size}"
+    return bytes(out)
+
+def lz4_decompress(data, size):
+    try:
+        import lz4.block
+        return lz4.block.decompress(data, uncompressed_size=size)
+    except ImportError:
+        pass
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        token = data[pos]
+        pos += 1
+        length = token >> 4
+        if length == 15:
+            while True:
+                length += data[pos]
+                pos += 1
+                if data[pos - 1] != 255:
+                    break
+        out += data[pos:pos + length]
+        pos += length
+        if pos >= len(data):
+            break
+        ref = len(out) - (data[pos] | data[pos + 1] << 8)
+        pos += 2
+        length = token & 15
+        if length == 15:
+            while True:
+                length += data[pos]
+                pos += 1
+                if data[pos - 1] != 255:
+                    break
+        out += copy_match(out, ref, length + 4)
+    assert len(out) == size, f"LZ4 block decoded to {len(out)} bytes, expected {size}"
+    return bytes(out)
+
+DECOMPRESS = {ord("Z"): lambda data, size: zlib.decompress(data), ord("F"): fastlz_decompress,
+              ord("4"): lz4_decompress}
+
+class FstFile(Waveform):
+    """An FST dump. Only the block headers are read up front; changes() decodes the value
+    change blocks one at a time."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.blocks = [] # (type, offset of the section after its type byte, section length)
+        with open(self.path, "rb") as f:
+            offset = 0
+            while header := f.read(9):
+                kind, length = header[0], struct.unpack(">Q", header[1:])[0]
+                self.blocks.append((kind, offset + 1, length))
+                offset += 1 + length
+                f.seek(offset)
+            sections = {kind: self._section(f, offset, length) for kind, offset, length in self.blocks
+                        if kind in (FST_BL_HDR, FST_BL_GEOM, FST_BL_HIER, FST_BL_HIER_LZ4, FST_BL_HIER_LZ4DUO)}
+        self.start_time, self.end_time = struct.unpack(">QQ", sections[FST_BL_HDR][8:24])
+        self.timescale = struct.unpack("b", sections[FST_BL_HDR][72:73])[0] # seconds exponent
+        # reals are in the writer's byte order, shown by e stored as a double in the header
+        endian_test = struct.unpack("<d", sections[FST_BL_HDR][24:32])[0]
+        self.double_format = "<d" if abs(endian_test - math.e) < 1e-9 else ">d"
+        self.lengths, self.reals = self._geometry(sections[FST_BL_GEOM])
+        hierarchy = next(self._hierarchy(kind, sections[kind]) for kind in
+                         (FST_BL_HIER, FST_BL_HIER_LZ4, FST_BL_HIER_LZ4DUO) if kind in sections)
+        self.signals = self._signals(hierarchy)
+
+    @staticmethod
+    def _section(f, offset, length):
+        f.seek(offset)
+        return f.read(length)
+
+    def _geometry(self, section):
+        uncompressed, max_handle = struct.unpack(">QQ", section[8:24])
+        data = section[24:]
+        if len(data) != uncompressed:
+            data = zlib.decompress(data)
+        lengths, reals, pos = np.zeros(max_handle + 1, dtype=np.int64), set(), 0
+        for handle in range(1, max_handle + 1):
+            length, pos = varint(data, pos)
+            if length == 0:
+                lengths[handle] = 8
+                reals.add(handle)
+            else:
+                lengths[handle] = 0 if length == 0xFFFFFFFF else length
+        return lengths, reals
+
+    @staticmethod
+    def _hierarchy(kind, section):
+        uncompressed = struct.unpack(">Q", section[8:16])[0]
+        if kind == FST_BL_HIER:
+            return gzip.decompress(section[16:])
+        if kind == FST_BL_HIER_LZ4:
+            return lz4_decompress(section[16:], uncompressed)
+        once = struct.unpack(">Q", section[16:24])[0]
+        return lz4_decompress(lz4_decompress(section[24:], once), uncompressed)
+
+    def _signals(self, data):
+        signals, scopes, pos, handle = {}, [], 0, 0
+        while pos < len(data):
+            tag = data[pos]
+            pos += 1
+            if tag == FST_ST_VCD_SCOPE: # scope type, name, component
+                end = data.index(b"\0", pos + 1)
+                scopes.append(data[pos + 1:end].decode())
+                pos = data.index(b"\0", end + 1) + 1
+            elif tag == FST_ST_VCD_UPSCOPE:
+                scopes.pop()
+            elif tag == FST_ST_GEN_ATTRBEGIN:
+                pos = data.index(b"\0", pos + 2) + 1
+                _, pos = varint(data, pos)
+            elif tag == FST_ST_GEN_ATTREND:
+                pass
+            else: # a variable: type, direction, name, length, alias
+                end = data.index(b"\0", pos + 1)
+                name = data[pos + 1:end].decode()
+                length, pos = varint(data, end + 1)
+                alias, pos = varint(data, pos)
+                if not alias:
+                    handle += 1
+                # Icarus puts the range in the name ("bitmask_idx [3:0]")
+                full = ".".join(scopes + [re.sub(r"\s*\[[^\]]*\]$", "", name)])
+                signals.setdefault(full, Signal(full, length, alias or handle))
+        return signals
+
+    def changes(self, names):
+        """{name: (times, values)} per value change block for each signal in names; the first
+        block starts with every signal's initial value."""
+        signals = [self.find(name) for name in names]
+        first = True
+        with open(self.path, "rb") as f:
+            for kind, offset, length in self.blocks:
+                if kind not in (FST_BL_VCDATA, FST_BL_VCDATA_DYN_ALIAS, FST_BL_VCDATA_DYN_ALIAS2):
+                    continue
+                block = self._section(f, offset, length)
+                yield {name: changes for name, changes in zip(names, self._block(kind, block, signals, first))}
+                first = False
+
+    def _block(self, kind, block, signals, first):
+        start_time = struct.unpack(">Q", block[8:16])[0]
+        pos = 32
+        frame_uncompressed, pos = varint(block, pos)
+        frame_compressed, pos = varint(block, pos)
+        _, pos = varint(block, pos)
+        frame = block[pos:pos + frame_compressed]
+        if frame_compressed != frame_uncompressed:
+            frame = zlib.decompress(frame)
+        pos += frame_compressed
+        _, pos = varint(block, pos)
+        vc_start = pos
+        decompress = DECOMPRESS[block[vc_start]]
+
+        time_uncompressed, time_compressed, time_count = struct.unpack(">QQQ", block[-24:])
+        times = block[-24 - time_compressed:-24]
+        if time_compressed != time_uncompressed:
+            times = zlib.decompress(times)
+        time_table = np.cumsum(varints(times, time_count).astype(np.int64))
+        chain_length = struct.unpack(">Q", block[-32 - time_compressed:-24 - time_compressed])[0]
+        chain_end = len(block) - 32 - time_compressed
+        offsets, lengths = self._position_table(kind, block[chain_end - chain_length:chain_end],
+                                                chain_end - chain_length - vc_start)
+
+        frame_offsets = np.concatenate([[0], np.cumsum(self.lengths[1:])])
+        for signal in signals:
+            width = int(self.lengths[signal.key])
+            real = signal.key in self.reals
+            indices, values = [], []
+            if first:
+                at = frame_offsets[signal.key - 1]
+                indices.append(np.array([-1]))
+                values.append(self._initial(frame[at:at + width], width, real))
+            offset = offsets[signal.key - 1]
+            if offset:
+                data = block[vc_start + offset:vc_start + offset + lengths[signal.key - 1]]
+                uncompressed, skip = varint(data, 0)
+                data = decompress(data[skip:], uncompressed) if uncompressed else data[skip:]
+                wave_indices, wave_values = self._wave(data, width, real)
+                indices.append(wave_indices)
+                values.append(wave_values)
+            if not indices:
+                yield np.zeros(0, dtype=np.int64), np.zeros(0, dtype=value_dtype(width, real))
+                continue
+            indices = np.concatenate(indices)
+            times = np.where(indices < 0, start_time, time_table[np.maximum(indices, 0)] if len(time_table) else 0)
+            yield times.astype(np.int64), np.concatenate(values)
+
+    def _position_table(self, kind, table, table_offset):
+        """Offsets (from the pack type byte) and lengths of each handle's wave data; 0 offset
+        for handles with no changes in the block. The three value change block types differ
+        only in how this table encodes unchanged handles and aliases."""
+        count = len(self.lengths) - 1
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        lengths = np.zeros(count + 1, dtype=np.int64)
+        pos = idx = value = 0
+        prev_idx, prev_alias = None, 0
+        while pos < len(table):
+            if kind == FST_BL_VCDATA_DYN_ALIAS2:
+                if table[pos] & 1:
+                    delta, pos = svarint(table, pos)
+                    delta >>= 1
+                else:
+                    run, pos = varint(table, pos)
+                    idx += run >> 1
+                    continue
+                if delta < 0:
+                    lengths[idx] = prev_alias = delta
+                elif delta == 0:
+                    lengths[idx] = prev_alias
+            else:
+                code, pos = varint(table, pos)
+                if code & 1:
+                    delta = code >> 1
+                elif code or kind == FST_BL_VCDATA:
+                    idx += code >> 1
+                    continue
+                else: # FST_BL_VCDATA_DYN_ALIAS: 0 then the handle this one is an alias of
+                    alias, pos = varint(table, pos)
+                    lengths[idx] = delta = -alias
+            if delta > 0:
+                value += delta
+                offsets[idx] = value
+                if prev_idx is not None:
+                    lengths[prev_idx] = value - offsets[prev_idx]
+                prev_idx = idx
+            idx += 1
+        if prev_idx is not None:
+            lengths[prev_idx] = table_offset - offsets[prev_idx]
+        for i in range(idx):
+            if lengths[i] < 0 and not offsets[i]: # an alias of handle -length
+                source = -lengths[i] - 1
+                offsets[i], lengths[i] = offsets[source], lengths[source]
+        return offsets, lengths
+
+    def _initial(self, data, width, real):
+        if real:
+            return np.array(struct.unpack(self.double_format, data), dtype=np.float64)
+        return to_values([data.decode("latin-1")], width)
+
+    def _packed(self, rows, width, real):
+        """Values from rows of packed bits, most significant first, or of doubles."""
+        if real:
+            return np.frombuffer(rows.tobytes(), dtype=self.double_format)
+        if width > 63:
+            return np.array([int.from_bytes(row.tobytes(), "big") >> (-width % 8) for row in rows], dtype=object)
+        values = np.zeros(len(rows), dtype=np.uint64)
+        for column in rows.T:
+            values = values << np.uint64(8) | column
+        return (values >> np.uint64(-width % 8)).astype(np.int64)
+
+    def _wave(self, data, width, real):
+        """(time table indices, values) of one handle's changes in a block."""
+        if width == 1:
+            # each change is a single varint: delta << 2 | bit << 1, or delta << 4 | code << 1 | 1
+            vli = varints(data).astype(np.int64)
+            binary = (vli & 1) == 0
+            indices = np.cumsum(np.where(binary, vli >> 2, vli >> 4))
+            return indices, np.where(binary, (vli >> 1) & 1, FST_RCV_VALUES[(vli >> 1) & 7])
+        # otherwise delta << 1 | non-binary, then packed bits, a character per bit or a double
+        size = 8 if real else (width + 7) // 8
+        records = np.frombuffer(data, dtype=np.uint8)
+        if len(records) % (size + 1) == 0:
+            records = records.reshape(-1, size + 1)
+            if (records[:, 0] < 0x80).all() and (real or not (records[:, 0] & 1).any()):
+                # every delta fit one byte and every value was binary: fixed size records
+                return np.cumsum(records[:, 0] >> 1, dtype=np.int64), self._packed(records[:, 1:], width, real)
+        indices, values = [], []
+        pos = index = 0
+        while pos < len(data):
+            vli, pos = varint(data, pos)
+            index += vli >> 1
+            if real:
+                values.append(struct.unpack(self.double_format, data[pos:pos + size])[0])
+                pos += size
+            elif vli & 1:
+                values.append(to_values([data[pos:pos + width].decode("latin-1")], width)[0])
+                pos += width
+            else:
+                values.append(int.from_bytes(data[pos:pos + size], "big") >> (-width % 8))
+                pos += size
+            indices.append(index)
+        return np.array(indices, dtype=np.int64), np.array(values, dtype=value_dtype(width, real))
+
+# ---------------------------------------------------------------------------------------------
+# VCD
+
+def parse_digits(data, starts, ends, base):
+    """The numbers written in base between starts and ends in data, a digit position at a time
+    across all of them, and whether each was only digits."""
+    lengths = ends - starts
+    values = np.zeros(len(starts), dtype=np.int64)
+    ok = lengths > 0
+    for j in range(int(lengths.max()) if len(lengths) else 0):
+        has = j < lengths
+        digit = data[np.minimum(starts + j, len(data) - 1)].astype(np.int64) - ord("0")
+        ok &= ~has | ((digit >= 0) & (digit < base))
+        values = np.where(has, values * base + digit, values)
+    return values, ok
+
+VCD_VECTOR_CODES = np.frombuffer(b"bBrR", dtype=np.uint8)
+VCD_SCALAR_CODES = np.frombuffer(b"01xXzZuUwWlLhH-", dtype=np.uint8)
+VCD_BIT_VALUES = np.full(256, UNRESOLVED, dtype=np.int64) # scalar value character to value
+VCD_BIT_VALUES[[ord(c) for c in "0lL"]] = 0
+VCD_BIT_VALUES[[ord(c) for c in "1hH"]] = 1
+
+class VcdFile(Waveform):
+    """A VCD dump, streamed VCD_CHUNK_BYTES at a time."""
+
+    TIMESCALE_UNITS = {"s": 0, "ms": -3, "us": -6, "ns": -9, "ps": -12, "fs": -15}
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.signals = {}
+        self.reals = set()
+        scopes = []
+        with open(self.path) as f:
+            tokens = self._header_tokens(f)
+            for token in tokens:
+                if token == "$scope":
+                    _, name = next(tokens), next(tokens)
+                    scopes.append(name)
+                elif token == "$upscope":
+                    scopes.pop()
+                elif token == "$var":
+                    kind, width, key, name = next(tokens), int(next(tokens)), next(tokens), next(tokens)
+                    full = ".".join(scopes + [name])
+                    self.signals.setdefault(full, Signal(full, width, key))
+                    if kind == "real":
+                        self.reals.add(key)
+                elif token == "$timescale":
+                    scale = ""
+                    while (word := next(tokens)) != "$end":
+                        scale += word
+                    number, unit = re.fullmatch(r"(\d+)(\w+)", scale).groups()
+                    self.timescale = self.TIMESCALE_UNITS[unit] + len(number) - 1
+                elif token == "$enddefinitions":
+                    break
+
+    @staticmethod
+    def _header_tokens(f):
+        for line in f:
+            yield from line.split()
+
+    def changes(self, names, chunk_bytes=VCD_CHUNK_BYTES):
+        """{name: (times, values)} for each signal in names, every chunk_bytes of the dump."""
+        signals = [self.find(name) for name in names]
+        time = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.startswith(b"$enddefinitions"):
+                    break
+            rest = b""
+            while True:
+                data = f.read(chunk_bytes)
+                text = rest + data
+                if data: # whole lines only, the rest goes with the next chunk
+                    cut = text.rfind(b"\n") + 1
+                    text, rest = text[:cut], text[cut:]
+                if text or not data:
+                    chunk, time = self._chunk(text, signals, time)
+                    yield {name: chunk[signal.key] for name, signal in zip(names, signals)}
+                if not data:
+                    return
+
+    def _chunk(self, text, signals, time):
+        """Changes of signals in whole lines of text, and the time at its end. Lines are found,
+        matched to identifiers and parsed with numpy; only wide and X/Z values go through
+        strings."""
+        data = np.frombuffer(text, dtype=np.uint8)
+        ends = np.flatnonzero(data == ord("\n"))
+        starts = np.concatenate([[0], ends + 1])
+        if starts[-1] == len(data):
+            starts = starts[:-1]
+        else: # no newline at the end of the file
+            ends = np.append(ends, len(data))
+        if len(ends):
+            ends = ends - ((ends > starts) & (data[np.maximum(ends - 1, 0)] == ord("\r"))) # CRLF
+        first = data[np.minimum(starts, len(data) - 1)] if len(data) else np.zeros(0, dtype=np.uint8)
+        first = np.where(ends > starts, first, ord("\n"))
+        length = ends - starts
+        stamp_lines = np.flatnonzero(first == ord("#"))
+        stamps, ok = parse_digits(data, starts[stamp_lines] + 1, ends[stamp_lines], 10)
+        assert ok.all(), f"{self.path}: malformed timestamp"
+        vector = np.isin(first, VCD_VECTOR_CODES)
+        scalar = np.isin(first, VCD_SCALAR_CODES)
+
+        chunk = {}
+        for signal in signals:
+            if signal.key in chunk:
+                continue
+            key = np.frombuffer(signal.key.encode(), dtype=np.uint8)
+            k = len(key)
+            # scalar "<value><key>" or vector "<b|r><value> <key>", the key ending the line
+            match = (scalar & (length == k + 1)) | (vector & (length > k + 1) & (data[np.maximum(ends - k - 1, 0)] == ord(" ")))
+            for j in range(k):
+                match &= data[np.maximum(ends - k + j, 0)] == key[j]
+            lines = np.flatnonzero(match)
+            # each change takes the time of the last timestamp line before it
+            before = np.searchsorted(stamp_lines, lines) - 1
+            times = np.where(before >= 0, stamps[np.maximum(before, 0)] if len(stamps) else 0, time)
+
+            real = signal.key in self.reals
+            values = np.empty(len(lines), dtype=value_dtype(signal.width, real))
+            on_vector = vector[lines]
+            values[~on_vector] = VCD_BIT_VALUES[first[lines[~on_vector]]]
+            vector_lines = lines[on_vector]
+            slow = np.ones(len(vector_lines), dtype=bool)
+            if signal.width <= 63 and not real:
+                parsed, ok = parse_digits(data, starts[vector_lines] + 1, ends[vector_lines] - k - 1, 2)
+                vector_values = np.where(ok, parsed, 0)
+                slow = ~ok
+            else:
+                vector_values = np.empty(len(vector_lines), dtype=values.dtype)
+            vector_values[slow] = self._values([text[starts[i] + 1:ends[i] - k - 1].decode()
+                                                for i in vector_lines[slow]], signal)
+            values[on_vector] = vector_values
+            chunk[signal.key] = (times.astype(np.int64), values)
+        return chunk, int(stamps[-1]) if len(stamps) else time
+
+    def _values(self, strings, signal):
+        if signal.key in self.reals:
+            return np.array([float(s) for s in strings], dtype=np.float64)
+        if signal.width == 1 and all(len(s) == 1 for s in strings):
+            return np.array([BIT_VALUES.get(s.lower(), UNRESOLVED) for s in strings], dtype=np.int64)
+        # VCD drops leading zeros and extends x/z to the left
+        strings = [s if len(s) >= signal.width or s[0] == "1" else s[0] * (signal.width - len(s)) + s
+                   if s[0] in "xXzZ" else s for s in strings]
+        return to_values([s.lower() for s in strings], signal.width)
+
+# ---------------------------------------------------------------------------------------------
+# Per-cycle queries
+
+def cycles(wave, clk, names):
+    """Per-cycle samples of names on the rising edges of clk, the same samples PipelineProbe
+    takes: each signal as it is once the edge has settled. Yields {"time": edge times, name:
+    values} a block of the dump at a time."""
+    last = {name: UNRESOLVED for name in names}
+    clk_last = UNRESOLVED
+    for chunk in wave.changes([clk] + [name for name in names if name != clk]):
+        clk_times, clk_values = chunk[clk]
+        previous = np.concatenate([[clk_last], clk_values[:-1]]).astype(np.int64)
+        edges = clk_times[(clk_values == 1) & (previous == 0)]
+        if len(clk_values):
+            clk_last = int(clk_values[-1])
+        out = {"time": edges}
+        for name in names:
+            times, values = chunk[name]
+            idx = np.searchsorted(times, edges, side="right") - 1
+            sampled = values[np.maximum(idx, 0)] if len(values) else np.zeros(len(edges), dtype=values.dtype)
+            out[name] = np.where(idx >= 0, sampled, last[name]) if len(edges) else sampled
+            if len(values):
+                last[name] = values[-1]
+        yield out
+
+def rising(high, before):
+    """Where a per-cycle bool series goes from low to high, given its value on the cycle
+    before the first."""
+    return high & ~np.concatenate([[before], high[:-1]])
+
+class FrameCounts:
+    """Cycles on which signal is 1 in each frame, a frame starting on each rising edge of
+    frame_start (a pulse such as new_frame, or a level such as vsync). result() leaves out the
+    cycles before the first frame start and the unfinished frame at the end."""
+
+    def __init__(self, signal, frame_start):
+        self.signal = signal
+        self.frame_start = frame_start
+        self.names = [signal, frame_start]
+        self.counts = []
+        self.current = None
+        self.start_before = False
+
+    def update(self, chunk):
+        high = chunk[self.signal] == 1
+        starting = chunk[self.frame_start] == 1
+        starts = np.flatnonzero(rising(starting, self.start_before))
+        if len(starting):
+            self.start_before = bool(starting[-1])
+        total = np.concatenate([[0], np.cumsum(high)])
+        bounds = list(starts) + [len(high)]
+        if self.current is not None:
+            self.current += int(total[bounds[0]])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if self.current is not None:
+                self.counts.append(self.current)
+            self.current = int(total[end] - total[start])
+
+    def result(self):
+        return np.array(self.counts, dtype=np.int64)
+
+class PulseSpacing:
+    """Cycles between consecutive rising edges of signal, e.g. valid_out pulses."""
+
+    def __init__(self, signal):
+        self.signal = signal
+        self.names = [signal]
+        self.spacing = []
+        self.cycle = 0
+        self.last_rise = None
+        self.before = False
+
+    def update(self, chunk):
+        high = chunk[self.signal] == 1
+        rises = np.flatnonzero(rising(high, self.before)) + self.cycle
+        if len(high):
+            self.before = bool(high[-1])
+        self.cycle += len(high)
+        if len(rises):
+            if self.last_rise is not None:
+                self.spacing.append(np.diff(np.concatenate([[self.last_rise], rises])))
+            elif len(rises) > 1:
+                self.spacing.append(np.diff(rises))
+            self.last_rise = int(rises[-1])
+
+    def result(self):
+        return np.concatenate(self.spacing) if self.spacing else np.zeros(0, dtype=np.int64)
+
+def scan(wave, clk, queries):
+    """Run every query over the per-cycle samples of one pass through the dump. Returns the
+    queries, whose result() then holds the answers."""
+    names = list(dict.fromkeys(name for query in queries for name in query.names))
+    for chunk in cycles(wave, clk, names):
+        for query in queries:
+            query.update(chunk)
+    return queries
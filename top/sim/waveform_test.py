@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from waveform import cycles, open_waveform
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "scripts"))
+from wall_codec import decode_walls, wall_to_int
+
+# Regression test for waveform.py against the wall_bit_mask dumps kept in fixtures: every
+# wall_bit_mask value decoded from the FST and the VCD (both from hdl/wall_bit_mask_dump.sv)
+# has to be the line of fixtures/walls.mem that bitmask_idx addressed. Plain pytest, no
+# simulator needed, and named so run_regression.py does not take it for a cocotb bench:
+#
+#   pytest waveform_test.py
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+MASK_LAG = 1 # the RAM reads on one edge and registers the output on the next
+
+def walls_mem():
+    with open(FIXTURES / "walls.mem") as f:
+        return [wall_to_int(wall) for wall in decode_walls(f.read().split("\n"))]
+
+def sampled(wave, names):
+    chunks = list(cycles(wave, "clk_in", names))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+@pytest.mark.parametrize("dump", ["wall_bit_mask.fst", "wall_bit_mask.vcd"])
+def test_masks_match_walls_mem(dump):
+    walls = walls_mem()
+    wave = open_waveform(FIXTURES / dump)
+    assert wave.find("wall_bit_mask").width == 3600
+    samples = sampled(wave, ["rst_in", "bitmask_idx", "wall_bit_mask"])
+    rst, idx, masks = samples["rst_in"], samples["bitmask_idx"], samples["wall_bit_mask"]
+
+    checked = set()
+    for n in range(MASK_LAG, len(masks)):
+        addressed = n - MASK_LAG
+        if rst[addressed:n + 1].any() or idx[addressed] < 0:
+            continue
+        line = int(idx[addressed])
+        assert masks[n] == walls[line], f"{dump}: cycle {n} holds {hex(masks[n])[:12]}..., walls.mem line {line} expected"
+        checked.add(line)
+    assert checked, f"{dump}: no wall was read out of reset"
+
+def test_fst_and_vcd_agree_on_walls():
+    """Both dumps decode to the same 3600-bit values, so neither format's wide path drops bits."""
+    fst = set(open_waveform(FIXTURES / "wall_bit_mask.fst").series(["wall_bit_mask"])["wall_bit_mask"][1])
+    vcd = set(open_waveform(FIXTURES / "wall_bit_mask.vcd").series(["wall_bit_mask"])["wall_bit_mask"][1])
+    common = {value for value in fst & vcd if value > 0}
+    assert common == {value for value in fst if value > 0}